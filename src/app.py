@@ -3,6 +3,9 @@ __license__ = "GPLv3"
 
 
 import os
+import time
+
+START = time.time()
 
 CURRENT_DIR = os.path.abspath(os.path.dirname(__file__))
 BASE_DIR = os.path.abspath(os.path.dirname(CURRENT_DIR))
@@ -16,26 +19,62 @@ with open(version_filepath) as version:
 
 import falcon
 import importlib
-import inspect
 import json
 import rdflib
+import requests
 import subprocess
 import sys
+import threading
 from core.resources import bibframe
+from core.utilities import metrics
 import semantic_server.app  as semantic_server
 
 fedora_repo = None
 elastic_search = None
 global fuseki
 
-for name, obj in inspect.getmembers(bibframe):
-    if inspect.isclass(obj):
-        semantic_server.api.add_route(
-            "/{}".format(name),
-            obj(semantic_server.config))
-        semantic_server.api.add_route(
-            "/{}".format(name) + "/{id}",
-            obj(semantic_server.config))
+class BibframeDispatcher(object):
+    """Single route for /{bf_class} and /{bf_class}/{id} that resolves the
+    BIBFRAME resource class on first request and reuses its handler"""
+
+    def __init__(self, config):
+        self.config = config
+        self.handlers = {}
+
+    def __handler__(self, bf_class):
+        handler = self.handlers.get(bf_class)
+        if handler is None:
+            class_ = bibframe.resource_class(bf_class)
+            if class_ is None:
+                raise falcon.HTTPNotFound()
+            handler = self.handlers.setdefault(bf_class, class_(self.config))
+        return handler
+
+    def __dispatch__(self, responder, req, resp, bf_class, **kwargs):
+        handler = self.__handler__(bf_class)
+        if not hasattr(handler, responder):
+            raise falcon.HTTPMethodNotAllowed(
+                [name[3:].upper() for name in dir(handler)
+                 if name.startswith("on_")])
+        getattr(handler, responder)(req, resp, **kwargs)
+
+    def on_get(self, req, resp, bf_class, **kwargs):
+        self.__dispatch__("on_get", req, resp, bf_class, **kwargs)
+
+    def on_head(self, req, resp, bf_class, **kwargs):
+        self.__dispatch__("on_head", req, resp, bf_class, **kwargs)
+
+    def on_post(self, req, resp, bf_class, **kwargs):
+        self.__dispatch__("on_post", req, resp, bf_class, **kwargs)
+
+    def on_put(self, req, resp, bf_class, **kwargs):
+        self.__dispatch__("on_put", req, resp, bf_class, **kwargs)
+
+    def on_patch(self, req, resp, bf_class, **kwargs):
+        self.__dispatch__("on_patch", req, resp, bf_class, **kwargs)
+
+    def on_delete(self, req, resp, bf_class, **kwargs):
+        self.__dispatch__("on_delete", req, resp, bf_class, **kwargs)
 
 
 def start_elastic_search(**kwargs):
@@ -90,39 +129,125 @@ def start_fuseki(**kwargs):
 
 
 def main():
-    print("Running BIBFRAME Datastore")
+    print("Running BIBFRAME Datastore, cold start {:.3f}s "
+          "(vocabulary {:.3f}s)".format(
+              COLD_START_SECONDS,
+              bibframe.VOCABULARY_SECONDS))
     semantic_server.main()
 
+# URLs polled until each service accepts requests
+SERVICE_PROBES = {
+    "elastic-search": "http://localhost:9200/_cluster/health",
+    "fedora4": "http://localhost:8080/rest",
+    "fuseki": "http://localhost:3030/"
+}
+
+def probe(url, timeout=2.0):
+    """Function returns True if a service answers an HTTP GET without a
+    server error"""
+    try:
+        return requests.get(url, timeout=timeout).status_code < 500
+    except requests.exceptions.RequestException:
+        return False
+
 class Services(object):
 
-    def __init__(self):
+    def __init__(self, ready_timeout=300.0, probe_interval=0.5):
         self.elastic_search, self.fedora_repo = None, None
         self.fedora_messenger, self.fuseki = None, None
+        self.ready_timeout = ready_timeout
+        self.probe_interval = probe_interval
+        self.started, self.ready = {}, {}
+        self.probes = []
+        self.lock = threading.Lock()
+
+    def __processes__(self):
+        return {
+            "elastic-search": self.elastic_search,
+            "fedora4": self.fedora_repo,
+            "fuseki": self.fuseki}
+
+    def __launch__(self, name, command, cwd):
+        # Commands shipped in the service's directory are run from there
+        executable = os.path.join(cwd, command[0])
+        if os.path.exists(executable):
+            command = [executable] + command[1:]
+        process = subprocess.Popen(command, cwd=cwd)
+        with self.lock:
+            self.started[name] = time.time()
+            self.ready.pop(name, None)
+        return process
 
     def __start_services__(self):
-        os.chdir(os.path.join(BASE_DIR, "search", "bin"))
-        self.elastic_search = subprocess.Popen(
-            start_elastic_search())
-        os.chdir(os.path.join(BASE_DIR, "triplestore"))
-        self.fuseki = subprocess.Popen(
-            start_fuseki())
-        os.chdir(os.path.join(BASE_DIR, "repository"))
-        self.fedora_repo = subprocess.Popen(
-            start_fedora(memory='1G'))
+        self.elastic_search = self.__launch__(
+            "elastic-search",
+            start_elastic_search(),
+            os.path.join(BASE_DIR, "search", "bin"))
+        self.fuseki = self.__launch__(
+            "fuseki",
+            start_fuseki(),
+            os.path.join(BASE_DIR, "triplestore"))
+        self.fedora_repo = self.__launch__(
+            "fedora4",
+            start_fedora(memory='1G'),
+            os.path.join(BASE_DIR, "repository"))
         #self.fedora_messenger = subprocess.Popen(
         #    start_fedora_messenger())
-      
-
+        self.probes = []
+        for name in SERVICE_PROBES:
+            thread = threading.Thread(
+                target=self.__wait_ready__,
+                args=(name,),
+                daemon=True)
+            thread.start()
+            self.probes.append(thread)
+
+    def __wait_ready__(self, name):
+        process = self.__processes__()[name]
+        deadline = self.started[name] + self.ready_timeout
+        while time.time() < deadline and process.poll() is None:
+            if probe(SERVICE_PROBES[name]):
+                with self.lock:
+                    self.ready[name] = time.time() - self.started[name]
+                print("{} ready in {:.1f}s".format(name, self.ready[name]))
+                return
+            time.sleep(self.probe_interval)
+        print("{} NOT ready, exit code={}".format(name, process.poll()))
+
+    def wait_ready(self):
+        """Method blocks until every service is ready, has exited or has
+        timed out
+
+        Returns:
+            dict: Seconds each ready service took to accept requests
+        """
+        for thread in self.probes:
+            thread.join()
+        return dict(self.ready)
+
+    def status(self):
+        """Method returns each service's pid, whether it is running, ready
+        and answering requests now, its time to ready and its uptime"""
+        now = time.time()
+        services = {}
+        for name, process in self.__processes__().items():
+            if process is None:
+                services[name] = {"running": False, "ready": False}
+                continue
+            running = process.poll() is None
+            services[name] = {
+                "pid": process.pid,
+                "running": running,
+                "returncode": process.returncode,
+                "ready": name in self.ready,
+                "time_to_ready": self.ready.get(name),
+                "healthy": running and probe(SERVICE_PROBES[name], 1.0),
+                "uptime": now - self.started[name] if running else None}
+        return services
 
     def on_get(self, req, resp):
         resp.status = falcon.HTTP_200
-        resp.body = json.dumps({ 'services': {
-            "elastic-search": self.elastic_search.pid or None,
-            "fedora4": self.fedora_repo.pid or None,
-            "fuseki": self.fuseki.pid or None 
-            }
-
-            })
+        resp.body = json.dumps({'services': self.status()})
 
     def on_post(self, req, resp):
         if self.fedora_repo and (self.fuseki or self.elastic_search):
@@ -130,12 +255,10 @@ class Services(object):
                 "Services Already Running",
                 "Elastic Search, Fedora 4, and Fuseki already running")
         self.__start_services__()
+        if req.get_param_as_bool('wait'):
+            self.wait_ready()
         resp.status = falcon.HTTP_201
-        resp.body = json.dumps({"services": {
-            "elastic-search": {"pid": self.elastic_search.pid},
-            "fedora4": {"pid": self.fedora_repo.pid},
-         #   "fedora4-messenger": {"pid": self.fedora_messenger.pid},
-            "fuseki": {"pid": self.fuseki.pid}}})
+        resp.body = json.dumps({'services': self.status()})
 
     def on_delete(self, req, resp):
         if not self.elastic_search and not self.fedora_repo:
@@ -159,8 +282,27 @@ class Services(object):
 
 
 
+class Metrics(object):
+    """Ingest stage latency histograms and error counts in the Prometheus
+    text format"""
+
+    def on_get(self, req, resp):
+        resp.status = falcon.HTTP_200
+        resp.content_type = metrics.CONTENT_TYPE
+        resp.body = metrics.render()
+
+
 # Add Services REST API
 semantic_server.api.add_route("/services", Services())
+semantic_server.api.add_route("/metrics", Metrics())
+
+# BIBFRAME resource classes, added last so fixed routes like /services win
+bibframe_dispatcher = BibframeDispatcher(semantic_server.config)
+semantic_server.api.add_route("/{bf_class}", bibframe_dispatcher)
+semantic_server.api.add_route("/{bf_class}/{id}", bibframe_dispatcher)
+
+# Seconds from the start of this module's import until the routes are ready
+COLD_START_SECONDS = time.time() - START
 
 
 
@@ -0,0 +1,417 @@
+"""
+Name:        fakes
+Purpose:     Lightweight in-process stand-ins for the Fedora 4 REST API and
+             the Elasticsearch calls made by the ingesters, with injected
+             latency, for offline benchmarks
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+import email.utils
+import hashlib
+import http.server
+import json
+import socketserver
+import threading
+import time
+import uuid
+from elasticsearch.exceptions import NotFoundError
+
+FCREPO_CREATED = "<http://fedora.info/definitions/v4/repository#created>"
+FCREPO_UUID = "<http://fedora.info/definitions/v4/repository#uuid>"
+LDP_CONTAINS = "<http://www.w3.org/ns/ldp#contains>"
+NON_RDF_SOURCE = '<http://www.w3.org/ns/ldp#NonRDFSource>;rel="type"'
+XSD_DATETIME = "<http://www.w3.org/2001/XMLSchema#dateTime>"
+SHARDS = {"total": 1, "successful": 1, "skipped": 0, "failed": 0}
+
+def split_update(sparql):
+    """Function splits a SPARQL INSERT DATA update into its prologue and the
+    triples inside INSERT DATA
+
+    Args:
+        sparql(str): SPARQL Update
+
+    Returns:
+        tuple: prologue, triples
+    """
+    start = sparql.find("INSERT DATA")
+    if start < 0:
+        return "", ""
+    return sparql[:start], \
+        sparql[sparql.find("{", start) + 1:sparql.rfind("}")]
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+class FedoraHandler(http.server.BaseHTTPRequestHandler):
+    """Request handler for FakeFedora, resources are kept as the Turtle that
+    was POSTed plus every PATCHed INSERT DATA"""
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, without TCP_NODELAY every
+    # response would wait on a delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def __respond__(self, status, body=b"", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def __begin__(self):
+        fake = self.server.fake
+        fake.count(self.command)
+        if fake.latency:
+            time.sleep(fake.latency)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        path = self.path.split("?")[0].rstrip("/")
+        return fake, body, path
+
+    def do_POST(self):
+        fake, body, path = self.__begin__()
+        if path == "/rest/fcr:tx":
+            return self.__respond__(201, headers={
+                "Location": fake.url("/rest/tx:{}".format(uuid.uuid4()))})
+        if "/fcr:tx/" in path:
+            return self.__respond__(204)
+        parent = fake.resolve(path)
+        if not parent in fake.resources:
+            return self.__respond__(404)
+        identifier = str(uuid.uuid4())
+        child = "/".join([
+            parent,
+            identifier[0:2],
+            identifier[2:4],
+            identifier[4:6],
+            identifier[6:8],
+            identifier])
+        binary = self.headers.get("Content-Type", "").startswith(
+            "application/octet-stream")
+        # Like the JCR uuid, fcrepo:uuid is not the path segment
+        resource = fake.add(child, str(uuid.uuid4()), "" if binary else \
+            body.decode("utf-8"))
+        with fake.lock:
+            fake.children.setdefault(parent, []).append(child)
+        if binary:
+            fake.binaries[child] = body
+            fake.add(child + "/fcr:metadata", resource["uuid"], "")
+        url = fake.url(child)
+        self.__respond__(
+            201,
+            url,
+            fake.headers(resource, {
+                "Location": url,
+                "Content-Type": "text/plain"}))
+
+    def do_PUT(self):
+        fake, body, path = self.__begin__()
+        path = fake.resolve(path)
+        if path in fake.resources:
+            return self.__respond__(409)
+        segments = path.split("/")
+        # Pairtree paths hang off the container four segments up
+        depth = 5 if len(segments) > 6 else 1
+        parent = "/".join(segments[:-depth])
+        resource = fake.add(path, str(uuid.uuid4()), body.decode("utf-8"))
+        with fake.lock:
+            fake.children.setdefault(parent, []).append(path)
+        url = fake.url(path)
+        self.__respond__(
+            201,
+            url,
+            fake.headers(resource, {
+                "Location": url,
+                "Content-Type": "text/plain"}))
+
+    def do_PATCH(self):
+        fake, body, path = self.__begin__()
+        resource = fake.resources.get(fake.resolve(path))
+        if resource is None:
+            return self.__respond__(404)
+        prologue, triples = split_update(body.decode("utf-8"))
+        with fake.lock:
+            resource["turtle"].append(prologue + triples + "\n")
+            resource["modified"] = time.time()
+        self.__respond__(204, headers=fake.headers(resource))
+
+    def do_GET(self):
+        fake, body, path = self.__begin__()
+        path = fake.resolve(path)
+        resource = fake.resources.get(path)
+        if resource is None:
+            return self.__respond__(404)
+        headers = fake.headers(resource)
+        if self.headers.get("If-None-Match") == headers["ETag"]:
+            return self.__respond__(304, headers=headers)
+        if path in fake.binaries:
+            return self.__respond__(
+                200,
+                fake.binaries[path],
+                fake.headers(resource, {
+                    "Content-Type": "application/octet-stream",
+                    "Link": NON_RDF_SOURCE}))
+        created = time.strftime(
+            "%Y-%m-%dT%H:%M:%SZ",
+            time.gmtime(resource["created"]))
+        turtle = "".join(resource["turtle"]) + \
+            '\n<> {} "{}"^^{} ;\n   {} "{}" .\n'.format(
+                FCREPO_CREATED,
+                created,
+                XSD_DATETIME,
+                FCREPO_UUID,
+                resource["uuid"])
+        with fake.lock:
+            children = list(fake.children.get(path, []))
+        turtle += "".join(["<> {} <{}> .\n".format(LDP_CONTAINS, fake.url(child))
+                           for child in children])
+        self.__respond__(
+            200,
+            turtle,
+            fake.headers(resource, {"Content-Type": "text/turtle"}))
+
+    def do_HEAD(self):
+        fake, body, path = self.__begin__()
+        resource = fake.resources.get(fake.resolve(path))
+        if resource is None:
+            return self.__respond__(404)
+        self.__respond__(200, headers=fake.headers(resource))
+
+    def do_DELETE(self):
+        fake, body, path = self.__begin__()
+        with fake.lock:
+            resource = fake.resources.pop(fake.resolve(path), None)
+        self.__respond__(404 if resource is None else 204)
+
+class FakeFedora(object):
+    """In-process HTTP server answering the Fedora 4 REST requests made by
+    FedoraClient, POST, PUT to a new path, PATCH with SPARQL INSERT DATA,
+    GET of Turtle and transactions, after an injected latency
+
+    To use
+
+    >> fedora = FakeFedora(latency=0.005)
+    >> client = FedoraClient(fedora.base_url)
+    >> fedora.stop()
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        """Initializes and starts a FakeFedora
+
+        Args:
+            latency(float): Seconds each request waits before it is handled
+            host(str): Host to listen on
+            port(int): Port to listen on, 0 picks a free port
+        """
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.resources = {}
+        self.binaries = {}
+        self.children = {}
+        self.add("/rest", "root", "")
+        self.server = ThreadingHTTPServer((host, port), FedoraHandler)
+        self.server.fake = self
+        self.base_url = "http://{}:{}".format(*self.server.server_address)
+        self.thread = threading.Thread(
+            target=self.server.serve_forever,
+            daemon=True)
+        self.thread.start()
+
+    def add(self, path, jcr_uuid, turtle):
+        resource = {
+            "uuid": jcr_uuid,
+            "turtle": [turtle],
+            "created": time.time(),
+            "modified": time.time()}
+        with self.lock:
+            self.resources[path] = resource
+        return resource
+
+    def count(self, method):
+        with self.lock:
+            self.requests[method] += 1
+
+    def headers(self, resource, extra=None):
+        headers = {
+            "ETag": 'W/"{}"'.format(hashlib.sha1(
+                "{}{}".format(resource["uuid"],
+                              resource["modified"]).encode()).hexdigest()),
+            "Last-Modified": email.utils.formatdate(
+                resource["modified"],
+                usegmt=True)}
+        headers.update(extra or {})
+        return headers
+
+    def resolve(self, path):
+        """Method removes a transaction segment from a request path"""
+        if path.startswith("/rest/tx:"):
+            parts = path.split("/")
+            return "/".join(parts[:2] + parts[3:])
+        return path
+
+    def url(self, path):
+        return self.base_url + path
+
+    def stop(self):
+        """Method shuts down the server"""
+        self.server.shutdown()
+        self.server.server_close()
+
+class FakeIndices(object):
+
+    def __init__(self, elastic_search):
+        self.elastic_search = elastic_search
+
+    def exists(self, index, **kwargs):
+        return index in self.elastic_search.mappings
+
+    def create(self, index, body=None, **kwargs):
+        self.elastic_search.mappings[index] = body or {}
+        return {"acknowledged": True}
+
+    def get_mapping(self, index=None, **kwargs):
+        body = self.elastic_search.mappings.get(index)
+        if body is None:
+            raise NotFoundError(404, "index_not_found_exception", index)
+        return {index: body}
+
+class FakeElasticsearch(object):
+    """In-process stand-in for the elasticsearch.Elasticsearch calls made by
+    the ingesters, index, search, bulk and msearch. Documents are kept in
+    memory and term, terms, match, match_phrase and bool should queries are
+    matched against their exact field values.
+
+    To use
+
+    >> elastic_search = FakeElasticsearch(latency=0.002)
+    >> GraphIngester(elastic_search=elastic_search, ...)
+    """
+
+    def __init__(self, latency=0.0):
+        """Initializes a FakeElasticsearch
+
+        Args:
+            latency(float): Seconds each call waits before it is handled
+        """
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = collections.Counter()
+        self.documents = {}
+        self.mappings = {}
+        self.indices = FakeIndices(self)
+
+    def __call__(self, method):
+        with self.lock:
+            self.requests[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def __store__(self, index, doc_type, doc_id, body):
+        with self.lock:
+            self.documents[(index, str(doc_id))] = (doc_type, body)
+
+    def __matches__(self, query, source):
+        if "bool" in query:
+            should = query["bool"].get("should", [])
+            return any([self.__matches__(clause, source)
+                        for clause in should])
+        for kind in ["term", "terms", "match", "match_phrase"]:
+            if kind in query:
+                field, value = list(query[kind].items())[0]
+                values = value if kind == "terms" else [value]
+                field = field[:-4] if field.endswith(".raw") else field
+                found = source.get(field, [])
+                if not isinstance(found, list):
+                    found = [found]
+                return any([str(item) in [str(v) for v in values]
+                            for item in found])
+        return "match_all" in query
+
+    def __search__(self, index, body):
+        body = body or {}
+        query = body.get("query", {"match_all": {}})
+        fields = body.get("_source")
+        size = body.get("size", 10)
+        with self.lock:
+            documents = list(self.documents.items())
+        hits = []
+        for (doc_index, doc_id), (doc_type, source) in documents:
+            if index is not None and doc_index != index:
+                continue
+            if not self.__matches__(query, source):
+                continue
+            if isinstance(fields, list):
+                source = dict([(key, value) for key, value in source.items()
+                               if key in fields])
+            hits.append({
+                "_index": doc_index,
+                "_type": doc_type,
+                "_id": doc_id,
+                "_source": source})
+            if len(hits) >= size:
+                break
+        return {
+            "_shards": SHARDS,
+            "hits": {"total": len(hits), "hits": hits}}
+
+    def index(self, index, doc_type=None, id=None, body=None, **kwargs):
+        self("index")
+        self.__store__(index, doc_type, id, body)
+        return {"_id": id, "created": True}
+
+    def search(self, index=None, body=None, **kwargs):
+        self("search")
+        if body is None and "query" in kwargs:
+            body = {"query": kwargs["query"]}
+        if "size" in kwargs:
+            body = dict(body or {}, size=kwargs["size"])
+        result = self.__search__(index, body)
+        if "scroll" in kwargs:
+            # Every hit is returned in the first page of a scroll
+            result["_scroll_id"] = "fake"
+        return result
+
+    def scroll(self, **kwargs):
+        self("scroll")
+        return {
+            "_scroll_id": "fake",
+            "_shards": SHARDS,
+            "hits": {"total": 0, "hits": []}}
+
+    def clear_scroll(self, **kwargs):
+        return {}
+
+    def msearch(self, body, **kwargs):
+        self("msearch")
+        responses = []
+        for header, search in zip(body[::2], body[1::2]):
+            responses.append(self.__search__(header.get("index"), search))
+        return {"responses": responses}
+
+    def bulk(self, body, **kwargs):
+        self("bulk")
+        lines = [line for line in body.split("\n") if line.strip()]
+        items = []
+        for action, document in zip(lines[::2], lines[1::2]):
+            action = json.loads(action)["index"]
+            self.__store__(
+                action["_index"],
+                action.get("_type"),
+                action["_id"],
+                json.loads(document))
+            items.append({"index": {"_id": action["_id"], "status": 201}})
+        return {"errors": False, "items": items}
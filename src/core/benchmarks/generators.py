@@ -0,0 +1,149 @@
+"""
+Name:        generators
+Purpose:     Synthetic BIBFRAME graphs and MARC records of several sizes for
+             ingest benchmarks
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import pymarc
+import random
+import rdflib
+from core.utilities.namespaces import BF, CONTEXT
+
+# Number of works, or MARC records, for each named size
+SIZES = {
+    "small": 100,
+    "medium": 1000,
+    "large": 10000}
+
+WORDS = [
+    "river", "winter", "letters", "history", "garden", "mountain", "songs",
+    "city", "journey", "silver", "ocean", "stories", "light", "northern",
+    "empire", "machine", "voices", "field", "glass", "harvest"]
+
+def size_count(size):
+    """Function returns the count for a named size or an integer size"""
+    if isinstance(size, int):
+        return size
+    return SIZES[size]
+
+def phrase(generator, words=3):
+    """Function returns a title cased phrase of random words"""
+    return " ".join([generator.choice(WORDS) for i in range(words)]).title()
+
+def bibframe_graph(size="small", seed=0, base="http://example.org/bf/"):
+    """Function builds a BIBFRAME graph of works, each with an instance, a
+    held item, a title and a creator and subjects drawn from shared pools of
+    people and topics, so deduplication has repeated labels to resolve
+
+    Args:
+        size(str or int): Named size in SIZES or a number of works
+        seed(int): Random seed, the same seed builds the same graph
+        base(str): Base URI of the generated subjects
+
+    Returns:
+        rdflib.Graph
+    """
+    generator = random.Random(seed)
+    works = size_count(size)
+    graph = rdflib.Graph()
+    for prefix, namespace in CONTEXT.items():
+        graph.namespace_manager.bind(prefix, namespace)
+    people, topics = [], []
+    for i in range(max(1, works // 5)):
+        person = rdflib.URIRef("{}person/{}".format(base, i))
+        graph.add((person, rdflib.RDF.type, BF.Person))
+        graph.add((person, BF.authorizedAccessPoint, rdflib.Literal(
+            "{}, {} {}".format(phrase(generator, 1), phrase(generator, 1), i))))
+        people.append(person)
+    for i in range(max(1, works // 10)):
+        topic = rdflib.URIRef("{}topic/{}".format(base, i))
+        graph.add((topic, rdflib.RDF.type, BF.Topic))
+        graph.add((topic, BF.label, rdflib.Literal(
+            "{} {}".format(phrase(generator, 2), i))))
+        topics.append(topic)
+    for i in range(works):
+        work = rdflib.URIRef("{}work/{}".format(base, i))
+        instance = rdflib.URIRef("{}instance/{}".format(base, i))
+        item = rdflib.URIRef("{}item/{}".format(base, i))
+        title = rdflib.BNode()
+        label = "{} {}".format(phrase(generator), i)
+        graph.add((work, rdflib.RDF.type, BF.Work))
+        graph.add((work, BF.label, rdflib.Literal(label)))
+        graph.add((work, BF.workTitle, title))
+        graph.add((work, BF.creator, generator.choice(people)))
+        for topic in generator.sample(topics, min(2, len(topics))):
+            graph.add((work, BF.subject, topic))
+        graph.add((title, rdflib.RDF.type, BF.Title))
+        graph.add((title, BF.titleValue, rdflib.Literal(label)))
+        graph.add((instance, rdflib.RDF.type, BF.Instance))
+        graph.add((instance, BF.instanceOf, work))
+        graph.add((instance, BF.instanceTitle, title))
+        graph.add((instance, BF.extent, rdflib.Literal(
+            "{} p.".format(generator.randint(40, 900)))))
+        graph.add((item, rdflib.RDF.type, BF.HeldItem))
+        graph.add((item, BF.holdingFor, instance))
+        graph.add((item, BF.shelfMarkLcc, rdflib.Literal(
+            "PS{}.{}".format(generator.randint(1, 3999), i))))
+    return graph
+
+def marc_records(size="small", seed=0):
+    """Generator yields MARC records with a III 907 bib number, a 001
+    control number, a 100 and a 245
+
+    Args:
+        size(str or int): Named size in SIZES or a number of records
+        seed(int): Random seed
+
+    Returns:
+        generator of pymarc.Record
+    """
+    generator = random.Random(seed)
+    for i in range(size_count(size)):
+        record = pymarc.Record(force_utf8=True)
+        record.add_field(pymarc.Field(tag='001', data="ocm{:08d}".format(i)))
+        record.add_field(pymarc.Field(
+            tag='100',
+            indicators=['1', ' '],
+            subfields=marc_subfields(['a', phrase(generator, 2)])))
+        record.add_field(pymarc.Field(
+            tag='245',
+            indicators=['1', '0'],
+            subfields=marc_subfields(['a', phrase(generator)])))
+        record.add_field(pymarc.Field(
+            tag='907',
+            indicators=[' ', ' '],
+            subfields=marc_subfields(['a', ".b{:07d}x".format(i)])))
+        yield record
+
+def marc_subfields(codes_values):
+    """Function returns subfields in the form the installed pymarc expects,
+    Subfield tuples from pymarc 5 and a flat code, value list before"""
+    if hasattr(pymarc, 'Subfield'):
+        return [pymarc.Subfield(code, value) for code, value in
+                zip(codes_values[::2], codes_values[1::2])]
+    return codes_values
+
+def write_marc(path, size="small", seed=0):
+    """Function writes generated MARC21 records to a file
+
+    Args:
+        path(str): Path of the MARC21 file
+        size(str or int): Named size in SIZES or a number of records
+        seed(int): Random seed
+
+    Returns:
+        int: Number of records written
+    """
+    count = 0
+    with open(path, "wb") as marc_file:
+        for record in marc_records(size, seed):
+            marc_file.write(record.as_marc())
+            count += 1
+    return count
@@ -0,0 +1,212 @@
+"""
+Name:        runner
+Purpose:     Runs GraphIngester and MARC BatchIngester benchmarks against the
+             in-process Fedora and Elasticsearch fakes and reports throughput,
+             requests per subject, peak RSS and phase times
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from core.benchmarks.fakes import FakeElasticsearch, FakeFedora
+from core.benchmarks.generators import bibframe_graph, write_marc
+from core.utilities.fedora import FedoraClient
+
+def peak_rss():
+    """Function returns the peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        # bytes on macOS, kilobytes elsewhere
+        return peak / (1024.0 * 1024.0)
+    return peak / 1024.0
+
+def requests_made(fedora, elastic_search):
+    """Function returns the requests counted by the fakes"""
+    counts = {}
+    for method, count in fedora.requests.items():
+        counts["fedora_{}".format(method)] = count
+    for method, count in elastic_search.requests.items():
+        counts["es_{}".format(method)] = count
+    return counts
+
+def benchmark_graph(size="small", **kwargs):
+    """Function ingests a synthetic BIBFRAME graph with GraphIngester
+
+    Args:
+        size(str or int): Named size or number of works
+        fedora_latency(float): Seconds of latency per Fedora request
+        es_latency(float): Seconds of latency per Elasticsearch call
+        seed(int): Random seed of the graph
+        kwargs: Other keyword arguments are passed to GraphIngester
+
+    Returns:
+        dict: Results
+    """
+    from core.utilities.ingesters import GraphIngester
+    fedora = FakeFedora(kwargs.pop('fedora_latency', 0.0))
+    elastic_search = FakeElasticsearch(kwargs.pop('es_latency', 0.0))
+    graph = bibframe_graph(size, kwargs.pop('seed', 0))
+    try:
+        ingester = GraphIngester(
+            graph=graph,
+            elastic_search=elastic_search,
+            fedora=FedoraClient(fedora.base_url),
+            quiet=True,
+            **kwargs)
+        ingester.ingest()
+    finally:
+        fedora.stop()
+    stats = ingester.stats
+    counts = requests_made(fedora, elastic_search)
+    subjects = stats.get("subjects") or 1
+    return {
+        "benchmark": "graph",
+        "size": size,
+        "subjects": stats.get("subjects"),
+        "subjects_per_second": stats.get("subjects_per_second"),
+        "requests_per_subject": sum(counts.values()) / float(subjects),
+        "requests": counts,
+        "peak_rss_mb": peak_rss(),
+        "phases": dict([(key, value) for key, value in stats.items()
+                        if key.endswith("_seconds")])}
+
+def benchmark_marc(size="small", **kwargs):
+    """Function ingests a synthetic MARC21 file with BatchIngester
+
+    Args:
+        size(str or int): Named size or number of records
+        fedora_latency(float): Seconds of latency per Fedora request
+        es_latency(float): Seconds of latency per Elasticsearch call
+        seed(int): Random seed of the records
+        kwargs: Other keyword arguments are passed to BatchIngester
+
+    Returns:
+        dict: Results
+    """
+    from core.utilities.marc import BatchIngester
+    fedora = FakeFedora(kwargs.pop('fedora_latency', 0.0))
+    elastic_search = FakeElasticsearch(kwargs.pop('es_latency', 0.0))
+    marc_path = tempfile.NamedTemporaryFile(suffix=".mrc", delete=False).name
+    try:
+        start = time.time()
+        write_marc(marc_path, size, kwargs.pop('seed', 0))
+        generate_seconds = time.time() - start
+        ingester = BatchIngester(
+            elastic_search=elastic_search,
+            fedora=FedoraClient(fedora.base_url),
+            quiet=True,
+            **kwargs)
+        stats = ingester.ingest(marc_path)
+    finally:
+        fedora.stop()
+        os.remove(marc_path)
+    counts = requests_made(fedora, elastic_search)
+    records = stats.get("records") or 1
+    return {
+        "benchmark": "marc",
+        "size": size,
+        "subjects": stats.get("records"),
+        "subjects_per_second": stats.get("records_per_second"),
+        "requests_per_subject": sum(counts.values()) / float(records),
+        "requests": counts,
+        "peak_rss_mb": peak_rss(),
+        "phases": {
+            "generate_seconds": generate_seconds,
+            "ingest_seconds": stats.get("seconds")}}
+
+BENCHMARKS = {
+    "graph": benchmark_graph,
+    "marc": benchmark_marc}
+
+def run(benchmark, size="small", **kwargs):
+    """Function runs a benchmark in a new process, so every result's peak
+    RSS is its own
+
+    Args:
+        benchmark(str): graph or marc
+        size(str or int): Named size or count
+        kwargs: Passed to the benchmark function
+
+    Returns:
+        dict: Results
+    """
+    with ProcessPoolExecutor(
+        max_workers=1,
+        mp_context=multiprocessing.get_context("spawn")) as executor:
+        return executor.submit(
+            BENCHMARKS[benchmark],
+            size,
+            **kwargs).result()
+
+def report(results):
+    """Function prints a table of benchmark results"""
+    print("{:<6} {:<7} {:>8} {:>11} {:>9} {:>9}  {}".format(
+        "bench", "size", "subjects", "subjects/s", "req/subj", "rss MB",
+        "phases"))
+    for result in results:
+        print("{:<6} {:<7} {:>8} {:>11.1f} {:>9.2f} {:>9.1f}  {}".format(
+            result["benchmark"],
+            str(result["size"]),
+            result["subjects"],
+            result["subjects_per_second"],
+            result["requests_per_subject"],
+            result["peak_rss_mb"],
+            ", ".join(["{} {:.2f}s".format(key[:-8], value)
+                       for key, value in sorted(result["phases"].items())])))
+
+def main():
+    """Main function
+
+    python -m core.benchmarks.runner --sizes small medium --workers 4
+    """
+    parser = argparse.ArgumentParser(
+        description="Offline ingest benchmarks")
+    parser.add_argument(
+        "--benchmarks",
+        nargs="+",
+        default=["graph", "marc"],
+        choices=sorted(BENCHMARKS))
+    parser.add_argument("--sizes", nargs="+", default=["small"])
+    parser.add_argument("--fedora-latency", type=float, default=0.002)
+    parser.add_argument("--es-latency", type=float, default=0.001)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument(
+        "--mint",
+        action="store_true",
+        help="Run the graph benchmark in single-pass mint mode")
+    parser.add_argument("--json", help="Also write results to this path")
+    args = parser.parse_args()
+    results = []
+    for benchmark in args.benchmarks:
+        for size in args.sizes:
+            size = int(size) if size.isdigit() else size
+            options = {}
+            if args.mint and benchmark == "graph":
+                options["mint"] = True
+            results.append(run(
+                benchmark,
+                size,
+                fedora_latency=args.fedora_latency,
+                es_latency=args.es_latency,
+                workers=args.workers,
+                **options))
+    report(results)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,12 @@
 __author__ = "Jeremy Nelson"
 
+import falcon
 import importlib
 import rdflib
+import requests
 import sys
+import threading
+import time
 
 #semantic_server = importlib.import_module("../semantic-server")
 #fedora = importlib.import_module(".repository.resources.fedora", "..semantic-server")
@@ -12,49 +16,144 @@ import sys
 import semantic_server.repository.resources.fedora as fedora
 
 from semantic_server.repository import BF, RDF
+from core.resources import vocabulary
+from core.utilities.cache import default_cache
+from core.utilities.fedora import default_client
+
+DEFAULT_ACCEPT = "text/turtle"
+
+def fedora_base_url(config):
+    """Function returns the base URL of the Fedora 4 web application from
+    the FEDORA section of the semantic server's configuration, either its
+    url or its host and port
+
+    Args:
+        config(dict or configparser.ConfigParser): Server configuration
+
+    Returns:
+        string, http://localhost:8080 if there is no FEDORA section
+    """
+    if config is None or not "FEDORA" in config:
+        return "http://localhost:8080"
+    section = config["FEDORA"]
+    if section.get("url"):
+        return section.get("url")
+    return "http://{}:{}".format(
+        section.get("host", "localhost"),
+        section.get("port", 8080))
 
 class Bibframe(fedora.Resource):
 
-    def on_post(self, req, resp):
+    def __init__(self, config, **kwargs):
+        super(Bibframe, self).__init__(config)
+        self.fedora = kwargs.get('fedora') or \
+            default_client(fedora_base_url(config))
+        self.cache = kwargs.get('cache') or default_cache()
+
+    def __fedora_url__(self, id):
+        if str(id).startswith("http"):
+            return str(id)
+        return self.fedora.resource_url(id)
+
+    def on_get(self, req, resp, id=None):
+        """GETs a resource through the shared read cache, the cached
+        representation is revalidated with Fedora by its ETag and a client
+        sending a matching If-None-Match gets a 304
+
+        Args:
+            req(falcon.Request): Request
+            resp(falcon.Response): Response
+            id(str): Identifier Fedora minted for the resource
+        """
+        if id is None:
+            return super(Bibframe, self).on_get(req, resp)
+        accept = req.get_header('Accept') or DEFAULT_ACCEPT
+        if accept == "*/*":
+            accept = DEFAULT_ACCEPT
+        try:
+            entry, cached = self.cache.fetch(
+                self.fedora,
+                self.__fedora_url__(id),
+                accept)
+        except requests.exceptions.HTTPError as http_error:
+            if http_error.response is not None and \
+               http_error.response.status_code == 404:
+                raise falcon.HTTPNotFound()
+            raise falcon.HTTPBadGateway(
+                "Fedora Error",
+                str(http_error))
+        resp.set_header("X-Cache", "HIT" if cached else "MISS")
+        if entry.etag:
+            resp.set_header("ETag", entry.etag)
+            if_none_match = req.get_header('If-None-Match') or ""
+            etags = [etag.strip() for etag in if_none_match.split(",")]
+            if entry.etag in etags or "*" in etags:
+                resp.status = falcon.HTTP_304
+                return
+        resp.status = falcon.HTTP_200
+        resp.content_type = entry.content_type
+        resp.data = entry.body
+
+    def on_post(self, req, resp, id=None):
         rdf = req.get_param('rdf', None)
         if rdf is None:
             turtle_rdf = "PREFIX bf: <" + str(BF) + ">\n"
             turtle_rdf += "PREFIX rdf: <" + str(RDF) + ">\n"
 ##            turtle_rdf += "INSERT DATA {"
-            turtle_rdf += "<> rdf:type bf:" + str(req.path[1:]) + " .\n"
+            turtle_rdf += "<> rdf:type bf:" + type(self).__name__ + " .\n"
             req._params['rdf'] = turtle_rdf
-        super(Bibframe, self).on_post(req, resp)
+        if id is None:
+            super(Bibframe, self).on_post(req, resp)
+        else:
+            self.cache.invalidate(self.__fedora_url__(id))
+            super(Bibframe, self).on_post(req, resp, id=id)
+
+
+
+def load_vocabulary(path=vocabulary.CACHE_PATH):
+    """Function loads the class to parent map of the cached vocabulary, run
+    python -m core.resources.vocabulary refresh to update the cache from
+    bibframe.org
 
+    Args:
+        path(str): Path of the cached vocabulary artifact
 
+    Returns:
+        float: Seconds taken to load the vocabulary
+    """
+    start = time.time()
+    PARENTS.clear()
+    PARENTS.update(vocabulary.load(path).get("classes", {}))
+    return time.time() - start
+
+def resource_class(name):
+    """Function returns the Bibframe subclass for a vocabulary class name,
+    creating it and its parents on first use
+
+    Args:
+        name(str): Class name, for example Work
+
+    Returns:
+        class or None if the name is not in the vocabulary
+    """
+    if name == Bibframe.__name__:
+        return Bibframe
+    if not name in PARENTS:
+        return None
+    with CLASSES_LOCK:
+        if not name in CLASSES:
+            parent_class = resource_class(PARENTS[name]) or Bibframe
+            class_ = type(name, (parent_class,), {})
+            setattr(sys.modules[__name__], name, class_)
+            CLASSES[name] = class_
+        return CLASSES[name]
 
 def bibframe_duck_typing():
-    def _get_or_add_class(name_uri):
-        name = str(name_uri).split("/")[-1]
-        if hasattr(sys.modules[__name__], name):
-            return getattr(sys.modules[__name__], name)
-        parent_uri = bf_ontology.value(
-            subject=name_uri,
-            predicate=rdflib.RDFS.subClassOf)
-        if parent_uri:
-            parent_class = _get_or_add_class(parent_uri)
-        else:
-            parent_class = Bibframe
-        class_ = type(name, (parent_class,), {})
-        setattr(
-            sys.modules[__name__],
-            name,
-            class_)
-        return class_
-    bf_ontology = rdflib.Graph().parse('http://bibframe.org/vocab.rdf')
-    class_sparql = """
-    SELECT DISTINCT ?bf
-    WHERE {
-       ?bf <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <http://www.w3.org/2000/01/rdf-schema#Class> .
-    }"""
-    bf_classes = [row[0] for row in bf_ontology.query(class_sparql)]
-    for class_ in bf_classes:
-        class_name = str(class_).split("/")[-1]
-        new_class = _get_or_add_class(class_)
-
-bibframe_duck_typing()
+    """Function adds a Bibframe subclass to this module for every class in
+    the vocabulary"""
+    for name in PARENTS:
+        resource_class(name)
 
+PARENTS, CLASSES = {}, {}
+CLASSES_LOCK = threading.RLock()
+VOCABULARY_SECONDS = load_vocabulary()
@@ -1,11 +1,12 @@
 __author__ = "Jeremy Nelson"
 
-import importlib
+import falcon
 import pymarc
 import rdflib
 
-fedora = importlib.import_module(
-    "..semantic-server.repository.resources.fedora")
+import semantic_server.repository.resources.fedora as fedora
+
+from core.utilities.marc import bib_number_field, bib_number_query
 
 
 class MARC(fedora.Resource):
@@ -18,26 +19,32 @@ class MARC(fedora.Resource):
         # Default is the Record's 001 Control number
         else:
             bib_number = record['001'].data
-        if self.search is not None:
+        if getattr(self, 'elastic_search', None) is not None:
+            if getattr(self, 'label_field', None) is None:
+                self.label_field = bib_number_field(self.elastic_search)
             existing_result = self.elastic_search.search(
                 index='marc',
-                body={
-                    "query": { "match": { "rdfs:label": bib_number}},
-                    "_source": ["rdfs:label", "owl:sameAs"]})
-            if existing_result.get('hits').get('total') > 0:
+                body=bib_number_query([bib_number], self.label_field))
+            for hit in existing_result.get('hits').get('hits'):
+                labels = hit['_source'].get('rdfs:label', [])
+                if not isinstance(labels, list):
+                    labels = [labels,]
                 # Returns first id
-                first_hit = existing_result['hits']['hits'][0]
-                return first_hit['_source']['owl:sameAs']
+                if bib_number in labels:
+                    return hit['_source']['owl:sameAs']
 
     def on_post(self, req, resp):
         record = req.get_param('record')
-        ils = req.get_parm('ils')
+        ils = req.get_param('ils') or 'III'
         try:
             marc21 = record.as_marc()
         except UnicodeEncodeError:
             record.force_utf8 = True
             marc21 = record.as_marc()
-        if self.__dedup__(record)
+        existing = self.__dedup__(record, ils)
+        if existing is not None:
+            raise falcon.HTTPConflict(
+                "MARC Record Exists",
+                "Record already exists at {}".format(existing))
         req.set_param('binary', marc21)
         result = super(MARC, self).on_post(req, resp)
-
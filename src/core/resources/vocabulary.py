@@ -0,0 +1,202 @@
+"""
+Name:        vocabulary
+Purpose:     Offline cache of the BIBFRAME vocabulary's class hierarchy,
+             compiled once into a JSON parent map keyed by the SHA1 of the
+             vocabulary it was built from
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import rdflib
+import requests
+import sys
+
+CURRENT_DIR = os.path.abspath(os.path.dirname(__file__))
+VOCAB_URL = 'http://bibframe.org/vocab.rdf'
+CACHE_PATH = os.path.join(CURRENT_DIR, "bibframe-vocab.json")
+
+def class_name(uri):
+    """Function returns the Python class name for a vocabulary class URI
+
+    Args:
+        uri(str): Class URI
+
+    Returns:
+        string
+    """
+    return str(uri).split("/")[-1]
+
+def compile_vocabulary(data, source=VOCAB_URL):
+    """Function parses a raw RDF/XML vocabulary and compiles the parent map
+    of every rdfs:Class
+
+    Args:
+        data(bytes): Raw RDF/XML of the vocabulary
+        source(str): URL the vocabulary was fetched from
+
+    Returns:
+        dict: Artifact with the vocabulary's sha1 and class to parent map,
+              parents outside of the vocabulary are null. ValueError is
+              raised for data that is not RDF/XML or has no classes, such
+              as an HTML error page
+    """
+    try:
+        bf_ontology = rdflib.Graph().parse(data=data, format='xml')
+    except Exception as error:
+        raise ValueError("{} is not an RDF/XML vocabulary: {}".format(
+            source,
+            error))
+    classes = {}
+    for class_uri in bf_ontology.subjects(
+        predicate=rdflib.RDF.type,
+        object=rdflib.RDFS.Class):
+        parent_uri = bf_ontology.value(
+            subject=class_uri,
+            predicate=rdflib.RDFS.subClassOf)
+        classes[class_name(class_uri)] = \
+            class_name(parent_uri) if parent_uri else None
+    if len(classes) < 1:
+        raise ValueError("{} has no rdfs:Class".format(source))
+    return {
+        "source": source,
+        "sha1": hashlib.sha1(data).hexdigest(),
+        "generated": datetime.datetime.utcnow().isoformat() + "Z",
+        "seed": False,
+        "classes": dict(sorted(classes.items()))}
+
+def load(path=CACHE_PATH):
+    """Function loads the cached vocabulary artifact. Loading never fetches
+    the vocabulary or writes the artifact, that is left to the refresh and
+    compile commands, so importing the resources works offline and from a
+    read-only install
+
+    Args:
+        path(str): Path of the JSON artifact
+
+    Returns:
+        dict: Artifact with the class to parent map under classes, with no
+              classes if the artifact is missing or unreadable
+    """
+    try:
+        with open(path) as raw_json:
+            artifact = json.load(raw_json)
+    except (OSError, ValueError):
+        print("Could NOT load {} Error={}, run python -m "
+              "core.resources.vocabulary refresh".format(
+                  path,
+                  sys.exc_info()[1]))
+        return {"source": VOCAB_URL, "sha1": None, "seed": True,
+                "classes": {}}
+    if artifact.get("seed", False):
+        print("{} is the seed of the core classes, run python -m "
+              "core.resources.vocabulary refresh for the full "
+              "vocabulary".format(path))
+    return artifact
+
+def save(artifact, path=CACHE_PATH):
+    """Function writes an artifact, replacing the old one atomically
+
+    Args:
+        artifact(dict): Artifact from compile_vocabulary
+        path(str): Path of the JSON artifact
+    """
+    temp_path = "{}.tmp".format(path)
+    with open(temp_path, "w") as raw_json:
+        json.dump(artifact, raw_json, indent=2)
+    os.replace(temp_path, path)
+
+def refresh(url=VOCAB_URL, path=CACHE_PATH, quiet=True):
+    """Function fetches the vocabulary and rewrites the cached artifact when
+    the vocabulary's sha1 differs from the cached one
+
+    Args:
+        url(str): URL of the RDF/XML vocabulary
+        path(str): Path of the JSON artifact
+        quiet(boolean): If False, prints whether the artifact changed
+
+    Returns:
+        dict: Current artifact
+    """
+    response = requests.get(url, timeout=(5, 60))
+    response.raise_for_status()
+    sha1 = hashlib.sha1(response.content).hexdigest()
+    if os.path.exists(path):
+        with open(path) as raw_json:
+            artifact = json.load(raw_json)
+        if artifact.get("sha1") == sha1:
+            if quiet is False:
+                print("{} unchanged, sha1 {}".format(path, sha1))
+            return artifact
+    artifact = compile_vocabulary(response.content, url)
+    save(artifact, path)
+    if quiet is False:
+        print("Wrote {} classes to {}, sha1 {}".format(
+            len(artifact["classes"]),
+            path,
+            sha1))
+    return artifact
+
+def compile_file(source, path=CACHE_PATH, quiet=True):
+    """Function compiles a local copy of the vocabulary into the artifact,
+    for installs that cannot reach the vocabulary's URL
+
+    Args:
+        source(str): Path of the RDF/XML vocabulary
+        path(str): Path of the JSON artifact
+        quiet(boolean): If False, prints the classes written
+
+    Returns:
+        dict: Current artifact
+    """
+    with open(source, "rb") as raw_rdf:
+        artifact = compile_vocabulary(raw_rdf.read(), VOCAB_URL)
+    save(artifact, path)
+    if quiet is False:
+        print("Wrote {} classes from {} to {}, sha1 {}".format(
+            len(artifact["classes"]),
+            source,
+            path,
+            artifact["sha1"]))
+    return artifact
+
+def main():
+    """Main function, refreshes the cached vocabulary from its URL or
+    compiles it from a local copy
+
+    python -m core.resources.vocabulary refresh
+    python -m core.resources.vocabulary compile --source vocab.rdf
+    """
+    parser = argparse.ArgumentParser(
+        description="BIBFRAME vocabulary cache")
+    parser.add_argument("command", choices=["refresh", "compile"])
+    parser.add_argument("--url", default=VOCAB_URL)
+    parser.add_argument("--source", help="Local RDF/XML vocabulary")
+    parser.add_argument("--path", default=CACHE_PATH)
+    args = parser.parse_args()
+    if args.command == "compile" and args.source is None:
+        parser.error("compile needs --source")
+    try:
+        if args.command == "refresh":
+            refresh(args.url, args.path, quiet=False)
+        else:
+            compile_file(args.source, args.path, quiet=False)
+    except (requests.exceptions.RequestException, OSError, ValueError):
+        print("Could NOT {} {} Error={}, {} left unchanged".format(
+            args.command,
+            args.source or args.url,
+            sys.exc_info()[1],
+            args.path))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
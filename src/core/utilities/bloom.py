@@ -0,0 +1,72 @@
+"""
+Name:        bloom
+Purpose:     Bloom filter for answering "definitely not seen" membership
+             questions, like new MARC bib numbers, without a search
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import hashlib
+import math
+import threading
+
+class BloomFilter(object):
+    """Bloom filter of strings sized for a capacity and false positive rate,
+    a value that is not in the filter was never added while a value in the
+    filter was probably added
+
+    To use
+
+    >> seen = BloomFilter(capacity=1000000)
+    >> seen.add("b1234567")
+    >> "b1234567" in seen
+    True
+    """
+
+    def __init__(self, capacity=1000000, error_rate=0.01):
+        """Initializes a BloomFilter
+
+        Args:
+            capacity(int): Expected number of values
+            error_rate(float): False positive rate at capacity
+        """
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(math.ceil(
+            -capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        self.hashes = max(1, int(round(self.size / capacity * math.log(2))))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self.__lock__ = threading.Lock()
+
+    def __positions__(self, value):
+        digest = hashlib.md5(str(value).encode("utf-8")).digest()
+        first = int.from_bytes(digest[:8], "big")
+        second = int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def __contains__(self, value):
+        for position in self.__positions__(value):
+            if not self.bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.count
+
+    def add(self, value):
+        """Method adds a value to the filter
+
+        Args:
+            value(str): Value
+        """
+        positions = self.__positions__(value)
+        with self.__lock__:
+            for position in positions:
+                self.bits[position >> 3] |= 1 << (position & 7)
+            self.count += 1
@@ -0,0 +1,150 @@
+"""
+Name:        bulk
+Purpose:     Buffered Elastic Search indexer that sends documents through the
+             _bulk API instead of one index request per document
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import json
+import threading
+import time
+from core.utilities.metrics import timed
+
+
+class BulkIndexer(object):
+    """Collects Elastic Search documents into _bulk batches bounded by a
+    document count and a byte size. Batches are sent when either bound is
+    reached, when the flush interval elapses and when flush is called.
+
+    To use
+
+    >> indexer = BulkIndexer(elastic_search)
+    >> indexer.add('bibframe', 'Work', doc_id, body)
+    >> indexer.close()
+    """
+
+    def __init__(self, elastic_search, **kwargs):
+        """Initializes a BulkIndexer
+
+        Args:
+            elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+            max_docs(int): Maximum number of documents in a batch,
+                           defaults to 500
+            max_bytes(int): Maximum size in bytes of a batch, defaults to 5MB
+            flush_interval(float): Seconds between timed flushes, None
+                                   disables the timer, defaults to 5
+            quiet(boolean): If False, prints failed documents
+        """
+        self.elastic_search = elastic_search
+        self.max_docs = kwargs.get('max_docs', 500)
+        self.max_bytes = kwargs.get('max_bytes', 5 * 1024 * 1024)
+        self.flush_interval = kwargs.get('flush_interval', 5.0)
+        self.quiet = kwargs.get('quiet', False)
+        self.failures = []
+        self.indexed = 0
+        self.batches = 0
+        self.__actions__ = []
+        self.__size__ = 0
+        self.__last_flush__ = time.time()
+        self.__lock__ = threading.RLock()
+        self.__stopped__ = None
+        self.__timer__ = None
+        self.start()
+
+    def __run_timer__(self, stopped):
+        while not stopped.wait(self.flush_interval):
+            if time.time() - self.__last_flush__ >= self.flush_interval:
+                self.flush()
+
+    def start(self):
+        """Method starts the flush timer if flush_interval is set and the
+        timer is not running, so an indexer can be reused after close"""
+        with self.__lock__:
+            if not self.flush_interval or self.__timer__ is not None:
+                return
+            self.__stopped__ = threading.Event()
+            self.__timer__ = threading.Thread(
+                target=self.__run_timer__,
+                args=(self.__stopped__,))
+            self.__timer__.daemon = True
+            self.__timer__.start()
+
+    def add(self, index, doc_type, doc_id, body):
+        """Method adds a document to the current batch, sending the batch
+        first if the document would push it past max_bytes and afterwards
+        if the batch has reached max_docs.
+
+        Args:
+            index(str): Elastic Search index
+            doc_type(str): Elastic Search doc type
+            doc_id(str): Document id
+            body(dict): Document source
+        """
+        action = json.dumps(
+            {"index": {"_index": index, "_type": doc_type, "_id": doc_id}})
+        lines = "{}\n{}\n".format(action, json.dumps(body))
+        size = len(lines.encode())
+        with self.__lock__:
+            if self.__actions__ and self.__size__ + size > self.max_bytes:
+                self.flush()
+            self.__actions__.append(lines)
+            self.__size__ += size
+            if len(self.__actions__) >= self.max_docs:
+                self.flush()
+
+    def flush(self):
+        """Method sends the current batch to Elastic Search and records any
+        per-item failures
+
+        Returns:
+            int: Number of documents sent
+        """
+        with self.__lock__:
+            self.__last_flush__ = time.time()
+            if not self.__actions__:
+                return 0
+            actions, self.__actions__, self.__size__ = self.__actions__, [], 0
+            try:
+                with timed("es_bulk"):
+                    result = self.elastic_search.bulk(body="".join(actions))
+            except Exception as error:
+                for lines in actions:
+                    action = json.loads(lines.split("\n")[0])['index']
+                    self.__add_failure__(action.get('_id'), None, str(error))
+                return len(actions)
+            self.batches += 1
+            for item in result.get('items', []):
+                outcome = item.get('index', {})
+                if 'error' in outcome:
+                    self.__add_failure__(
+                        outcome.get('_id'),
+                        outcome.get('status'),
+                        outcome.get('error'))
+                else:
+                    self.indexed += 1
+            return len(actions)
+
+    def __add_failure__(self, doc_id, status, error):
+        failure = {"_id": doc_id, "status": status, "error": error}
+        self.failures.append(failure)
+        if self.quiet is False:
+            print("Failed to index {} status={} error={}".format(
+                doc_id,
+                status,
+                error))
+
+    def close(self):
+        """Method stops the flush timer and sends any remaining documents"""
+        with self.__lock__:
+            timer, self.__timer__ = self.__timer__, None
+            if timer is not None:
+                self.__stopped__.set()
+        if timer is not None:
+            timer.join()
+        self.flush()
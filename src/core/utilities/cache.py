@@ -0,0 +1,296 @@
+"""
+Name:        cache
+Purpose:     Shared read cache of Fedora responses, an in-memory LRU bounded
+             in bytes with an optional on-disk tier, revalidated with ETag
+             and If-None-Match
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import collections
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import weakref
+
+CacheEntry = collections.namedtuple(
+    "CacheEntry",
+    ["etag", "content_type", "body", "checked"])
+
+CACHES = weakref.WeakSet()
+
+# A full disk tier is trimmed to this fraction of disk_max_bytes, so the
+# tier is walked once per many writes rather than on every write
+DISK_LOW_WATER = 0.9
+
+class ResponseCache(object):
+    """LRU cache of Fedora representations keyed by URL and Accept header.
+    Entries pushed out of memory are kept in the disk tier when a path is
+    given, and every read is revalidated with If-None-Match unless the
+    entry was checked less than fresh_seconds ago.
+
+    To use
+
+    >> cache = ResponseCache(max_bytes=64 * 1024 * 1024)
+    >> entry, status = cache.fetch(fedora, work_url, "text/turtle")
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, **kwargs):
+        """Initializes a ResponseCache
+
+        Args:
+            max_bytes(int): Maximum bytes of bodies held in memory
+            path(str): Directory of the on-disk tier, no disk tier if None
+            disk_max_bytes(int): Maximum bytes of the on-disk tier
+            fresh_seconds(float): Seconds an entry is served without
+                                  revalidating it with Fedora
+        """
+        self.max_bytes = max_bytes
+        self.path = kwargs.get('path')
+        self.disk_max_bytes = kwargs.get('disk_max_bytes', 1024 * 1024 * 1024)
+        self.fresh_seconds = kwargs.get('fresh_seconds', 0.0)
+        self.entries = collections.OrderedDict()
+        self.size = 0
+        self.hits, self.misses, self.revalidated = 0, 0, 0
+        self.__lock__ = threading.RLock()
+        self.__disk_lock__ = threading.Lock()
+        self.disk_size = 0
+        if self.path is not None:
+            if not os.path.exists(self.path):
+                os.makedirs(self.path)
+            self.disk_size = sum([size for mtime, size, filepath in
+                                  self.__disk_files__()])
+        CACHES.add(self)
+
+    def __url_path__(self, url):
+        digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        return os.path.join(self.path, digest)
+
+    def __disk_path__(self, key):
+        # One directory per URL holds a file per Accept header, so
+        # invalidating a URL removes a single directory
+        digest = hashlib.sha1(key[1].encode("utf-8")).hexdigest()
+        return os.path.join(self.__url_path__(key[0]), digest)
+
+    def __write_disk__(self, key, entry):
+        metadata = json.dumps({
+            "key": list(key),
+            "etag": entry.etag,
+            "content_type": entry.content_type,
+            "checked": entry.checked}).encode("utf-8")
+        disk_path = self.__disk_path__(key)
+        data = metadata + b"\n" + entry.body
+        with self.__disk_lock__:
+            try:
+                previous = os.path.getsize(disk_path)
+            except OSError:
+                previous = 0
+            try:
+                os.makedirs(os.path.dirname(disk_path), exist_ok=True)
+                temp_path = "{}.{}.tmp".format(
+                    disk_path,
+                    threading.get_ident())
+                with open(temp_path, "wb") as disk_file:
+                    disk_file.write(data)
+                os.replace(temp_path, disk_path)
+            except OSError:
+                return
+            self.disk_size += len(data) - previous
+            if self.disk_size > self.disk_max_bytes:
+                self.__trim_disk__()
+
+    def __read_disk__(self, key):
+        try:
+            with open(self.__disk_path__(key), "rb") as disk_file:
+                metadata = json.loads(disk_file.readline().decode("utf-8"))
+                body = disk_file.read()
+        except (IOError, OSError, ValueError):
+            return None
+        if tuple(metadata["key"]) != tuple(key):
+            return None
+        return CacheEntry(
+            metadata["etag"],
+            metadata["content_type"],
+            body,
+            metadata["checked"])
+
+    def __disk_files__(self):
+        files = []
+        for directory in os.listdir(self.path):
+            url_path = os.path.join(self.path, directory)
+            try:
+                names = os.listdir(url_path)
+            except OSError:
+                continue
+            for name in names:
+                filepath = os.path.join(url_path, name)
+                try:
+                    stat = os.stat(filepath)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, filepath))
+        return files
+
+    def __trim_disk__(self):
+        # Called with the disk lock held once the running total is over
+        # disk_max_bytes, removes the oldest files
+        files = self.__disk_files__()
+        total = sum([size for mtime, size, filepath in files])
+        for mtime, size, filepath in sorted(files):
+            if total <= self.disk_max_bytes * DISK_LOW_WATER:
+                break
+            try:
+                os.remove(filepath)
+            except OSError:
+                continue
+            total -= size
+            try:
+                os.rmdir(os.path.dirname(filepath))
+            except OSError:
+                pass
+        self.disk_size = total
+
+    def get(self, key):
+        """Method returns the entry for a key from memory or the disk tier
+
+        Args:
+            key(tuple): URL and Accept header
+
+        Returns:
+            CacheEntry or None
+        """
+        with self.__lock__:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        if self.path is not None:
+            entry = self.__read_disk__(key)
+            if entry is not None:
+                self.put(key, entry)
+            return entry
+
+    def put(self, key, entry):
+        """Method adds an entry, evicting the least recently used entries to
+        the disk tier once max_bytes is exceeded
+
+        Args:
+            key(tuple): URL and Accept header
+            entry(CacheEntry): Representation
+        """
+        if len(entry.body) > self.max_bytes:
+            return
+        evicted = []
+        with self.__lock__:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous.body)
+            self.entries[key] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                old_key, old_entry = self.entries.popitem(last=False)
+                self.size -= len(old_entry.body)
+                evicted.append((old_key, old_entry))
+        if self.path is not None:
+            for old_key, old_entry in evicted:
+                self.__write_disk__(old_key, old_entry)
+
+    def invalidate(self, url):
+        """Method removes every representation of a URL
+
+        Args:
+            url(str): URL of the Fedora resource
+        """
+        url = str(url).rstrip("/")
+        with self.__lock__:
+            keys = [key for key in self.entries if key[0] == url]
+            for key in keys:
+                self.size -= len(self.entries.pop(key).body)
+        if self.path is not None:
+            url_path = self.__url_path__(url)
+            with self.__disk_lock__:
+                if not os.path.isdir(url_path):
+                    return
+                for name in os.listdir(url_path):
+                    try:
+                        self.disk_size -= os.path.getsize(
+                            os.path.join(url_path, name))
+                    except OSError:
+                        pass
+                shutil.rmtree(url_path, ignore_errors=True)
+
+    def fetch(self, fedora, url, accept="text/turtle"):
+        """Method returns a representation of a Fedora resource, sending
+        If-None-Match with the cached ETag so an unchanged resource costs a
+        304 without a body
+
+        Args:
+            fedora(core.utilities.fedora.FedoraClient): Fedora client
+            url(str): URL of the Fedora resource
+            accept(str): Accept header, part of the cache key
+
+        Returns:
+            tuple: CacheEntry and whether it came from the cache
+        """
+        key = (str(url).rstrip("/"), accept)
+        entry = self.get(key)
+        if entry is not None and \
+           time.time() - entry.checked < self.fresh_seconds:
+            self.hits += 1
+            return entry, True
+        headers = {"Accept": accept}
+        if entry is not None:
+            headers["If-None-Match"] = entry.etag
+        response = fedora.get(url, headers=headers)
+        if response.status_code == 304 and entry is not None:
+            entry = entry._replace(checked=time.time())
+            self.put(key, entry)
+            self.hits += 1
+            self.revalidated += 1
+            return entry, True
+        self.misses += 1
+        entry = CacheEntry(
+            response.headers.get("ETag"),
+            response.headers.get("Content-Type", accept),
+            response.content,
+            time.time())
+        if entry.etag:
+            self.put(key, entry)
+        return entry, False
+
+    def stats(self):
+        """Method returns hits, misses, revalidations and bytes in memory
+        and on disk"""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidated": self.revalidated,
+            "entries": len(self.entries),
+            "bytes": self.size,
+            "disk_bytes": self.disk_size}
+
+def invalidate(url):
+    """Function invalidates a URL in every ResponseCache in this process
+
+    Args:
+        url(str): URL of the Fedora resource
+    """
+    for cache in list(CACHES):
+        cache.invalidate(url)
+
+DEFAULT_CACHE = None
+
+def default_cache():
+    """Function returns the shared ResponseCache, creating it on first use"""
+    global DEFAULT_CACHE
+    if DEFAULT_CACHE is None:
+        DEFAULT_CACHE = ResponseCache()
+    return DEFAULT_CACHE
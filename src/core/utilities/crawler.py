@@ -0,0 +1,414 @@
+"""
+Name:        crawler
+Purpose:     Walks the Fedora 4 container tree with a bounded pool of
+             fetchers and rebuilds the bibframe and marc search indexes
+             from the repository
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import argparse
+import collections
+import pymarc
+import rdflib
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from elasticsearch import Elasticsearch
+from core.utilities.bulk import BulkIndexer
+from core.utilities.fedora import FedoraClient
+from core.utilities.ingesters import check_ids, default_graph, fedora_id
+from core.utilities.ingesters import guess_search_doc_type, parse_ntriples
+from core.utilities.ingesters import project_graph
+from core.utilities.journal import IngestJournal, replay
+from core.utilities.marc import bib_number, marc_body, marc_id
+from core.utilities import metrics
+from core.utilities.metrics import timed
+from core.utilities.namespaces import FCREPO, LDP
+from core.utilities.projection import default_projection
+from core.utilities.reindex import Reindexer
+
+CRAWL = "crawl"
+CONTAINER = "container"
+LEAF = "leaf"
+RDF_ACCEPT = "application/n-triples, text/turtle;q=0.9"
+
+class Crawler(object):
+    """Crawls Fedora from /rest down ldp:contains, fetching each resource
+    once as N-Triples or Turtle. RDF resources are projected into bibframe
+    documents and MARC21 binaries into marc documents, both sent to Elastic
+    Search in bulk. Indexed resources are checkpointed to a journal so an
+    interrupted crawl can be resumed.
+
+    To use
+
+    >> crawler = Crawler(fedora=FedoraClient("http://localhost:8080"))
+    >> crawler.crawl()
+    """
+
+    def __init__(self, **kwargs):
+        """Initializes a Crawler
+
+        Args:
+            fedora(core.utilities.fedora.FedoraClient): Pooled Fedora client
+            elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+            indices(dict): Index for each kind of document, bibframe and
+                           marc, kinds left out are not indexed
+            indexer(BulkIndexer): Bulk indexer, defaults to a new one
+            projection(core.utilities.projection.Projection): Mapping plans
+            ils(str): Integrated library system of the MARC records
+            workers(int): Number of concurrent fetches
+            max_pending(int): Maximum fetches queued at once, defaults to
+                              four per worker
+            journal(str or IngestJournal): Path to, or instance of, the
+                                           crawl journal
+            resume(boolean): If True, replays the journal so indexed
+                             resources are not indexed again
+            checkpoint_interval(int): Resources between checkpoints
+            report_interval(float): Seconds between throughput reports
+            bulk_size(int): Maximum documents in a bulk batch
+            bulk_bytes(int): Maximum size in bytes of a bulk batch
+            quiet(boolean): If False, prints the throughput report
+        """
+        self.fedora = kwargs.get('fedora')
+        if self.fedora is None:
+            self.fedora = FedoraClient()
+        self.elastic_search = kwargs.get('elastic_search', Elasticsearch())
+        self.indices = kwargs.get('indices', {
+            "bibframe": "bibframe",
+            "marc": "marc"})
+        self.projection = kwargs.get('projection', default_projection())
+        self.ils = kwargs.get('ils', 'III')
+        self.workers = kwargs.get('workers', 8)
+        self.max_pending = kwargs.get('max_pending', self.workers * 4)
+        self.checkpoint_interval = kwargs.get('checkpoint_interval', 1000)
+        self.report_interval = kwargs.get('report_interval', 10.0)
+        self.quiet = kwargs.get('quiet', False)
+        self.indexer = kwargs.get('indexer')
+        self.__owns_indexer__ = self.indexer is None
+        if self.indexer is None:
+            self.indexer = BulkIndexer(
+                self.elastic_search,
+                max_docs=kwargs.get('bulk_size', 1000),
+                max_bytes=kwargs.get('bulk_bytes', 10 * 1024 * 1024),
+                flush_interval=None,
+                quiet=self.quiet)
+        self.journal = kwargs.get('journal', None)
+        self.containers_done, self.leaves_done = set(), set()
+        if self.journal is not None and \
+           not isinstance(self.journal, IngestJournal):
+            if kwargs.get('resume', False):
+                for step, url, marker in replay(self.journal):
+                    if step != CRAWL:
+                        continue
+                    if marker == CONTAINER:
+                        self.containers_done.add(url)
+                    else:
+                        self.leaves_done.add(url)
+            self.journal = IngestJournal(self.journal)
+        self.counts = collections.Counter()
+        self.roots = set()
+        self.stats = {}
+        self.__pending__ = []
+        self.__failed__ = 0
+        self.__lock__ = threading.Lock()
+
+    def __count__(self, name, amount=1):
+        with self.__lock__:
+            self.counts[name] += amount
+
+    def __resolve__(self, object_):
+        uri = str(object_)
+        if uri.startswith(self.fedora.rest_url):
+            return fedora_id(uri)
+        return uri
+
+    def fetch(self, url):
+        """Method GETs a resource once, parsing RDF sources into a graph
+
+        Args:
+            url(str): URL of the Fedora resource
+
+        Returns:
+            tuple: graph or None for a binary, child URLs, response
+        """
+        response = self.fedora.get(url, headers={"Accept": RDF_ACCEPT})
+        self.__count__("bytes", len(response.content))
+        if "NonRDFSource" in response.headers.get("Link", ""):
+            return None, [], response
+        content_type = response.headers.get("Content-Type", "")
+        with timed("fedora_parse"):
+            if "n-triples" in content_type:
+                graph = parse_ntriples(response.text)
+            else:
+                graph = default_graph()
+                graph.parse(data=response.text, format='turtle', publicID=url)
+        children = sorted(set(
+            [str(child) for child in graph.objects(predicate=LDP.contains)]))
+        return graph, children, response
+
+    def index_resource(self, url, graph):
+        """Method queues the bibframe document of an RDF resource
+
+        Args:
+            url(str): URL of the Fedora resource
+            graph(rdflib.Graph): Fedora graph of the resource
+
+        Returns:
+            string: Document id or None if the resource was not indexed
+        """
+        fcrepo_uri = rdflib.URIRef(url)
+        if not 'bibframe' in self.indices or url in self.roots or \
+           graph.value(subject=fcrepo_uri, predicate=FCREPO.created) is None:
+            return
+        doc_id = fedora_id(url)
+        with timed("project"):
+            body = project_graph(graph, self.projection, self.__resolve__)
+        self.indexer.add(
+            self.indices['bibframe'],
+            guess_search_doc_type(graph, fcrepo_uri),
+            doc_id,
+            body)
+        self.__count__("bibframe")
+        return doc_id
+
+    def index_marc(self, url, response):
+        """Method queues the marc document of a MARC21 binary, other binaries
+        are skipped
+
+        Args:
+            url(str): URL of the Fedora binary
+            response(requests.Response): Response of the binary's GET
+
+        Returns:
+            string: Document id or None if the binary was not indexed
+        """
+        if not 'marc' in self.indices:
+            return
+        try:
+            record = pymarc.Record(data=response.content, force_utf8=True)
+            record_bib_number = bib_number(record, self.ils)
+        except Exception:
+            self.__count__("skipped")
+            return
+        body = marc_body(
+            "/".join([url, "fcr:metadata"]),
+            record_bib_number,
+            response.headers)
+        doc_id = marc_id(body["owl:sameAs"][0])
+        self.indexer.add(self.indices['marc'], 'marc21', doc_id, body)
+        self.__count__("marc")
+        return doc_id
+
+    def visit(self, url):
+        """Method fetches a resource, indexes it unless it was indexed by an
+        earlier run and returns its children
+
+        Args:
+            url(str): URL of the Fedora resource
+
+        Returns:
+            list: Child URLs
+        """
+        graph, children, response = self.fetch(url)
+        self.__count__("resources")
+        doc_id = None
+        if not url in self.containers_done:
+            if graph is None:
+                doc_id = self.index_marc(url, response)
+            else:
+                doc_id = self.index_resource(url, graph)
+            with self.__lock__:
+                self.__pending__.append(
+                    (url, doc_id, CONTAINER if children else LEAF))
+        return children
+
+    def checkpoint(self):
+        """Method flushes the bulk indexer and journals every resource
+        visited since the last checkpoint whose document was indexed"""
+        with self.__lock__:
+            pending, self.__pending__ = self.__pending__, []
+        self.indexer.flush()
+        failures = self.indexer.failures[self.__failed__:]
+        self.__failed__ = len(self.indexer.failures)
+        failed = set([failure['_id'] for failure in failures])
+        if self.journal is None:
+            return
+        for url, doc_id, marker in pending:
+            if doc_id is None or not doc_id in failed:
+                self.journal.record(CRAWL, url, marker)
+        self.journal.sync()
+
+    def report(self, start):
+        """Method prints resources crawled and the throughput so far"""
+        seconds = max(time.time() - start, 0.001)
+        if self.quiet is False:
+            print("{} resources, {} bibframe, {} marc, {:.1f} resources/s, "
+                  "{:.1f} MB".format(
+                      self.counts["resources"],
+                      self.counts["bibframe"],
+                      self.counts["marc"],
+                      self.counts["resources"] / seconds,
+                      self.counts["bytes"] / (1024.0 * 1024.0)))
+
+    def crawl(self, roots=None):
+        """Method crawls Fedora breadth first from the root containers,
+        keeping at most max_pending fetches in flight
+
+        Args:
+            roots(list): URLs to start from, defaults to /rest
+
+        Returns:
+            dict: Stats
+        """
+        start = time.time()
+        last_report = start
+        self.roots = set(roots or [self.fedora.rest_url])
+        frontier = collections.deque(sorted(self.roots))
+        seen = set(self.roots)
+        futures = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                while frontier or futures:
+                    while frontier and len(futures) < self.max_pending:
+                        url = frontier.popleft()
+                        if url in self.leaves_done:
+                            continue
+                        futures[executor.submit(self.visit, url)] = url
+                    if not futures:
+                        continue
+                    done, not_done = wait(futures, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        url = futures.pop(future)
+                        try:
+                            children = future.result()
+                        except Exception:
+                            self.__count__("errors")
+                            print("Could NOT crawl {} Error={}".format(
+                                url,
+                                sys.exc_info()[1]))
+                            continue
+                        for child in children:
+                            if not child in seen:
+                                seen.add(child)
+                                frontier.append(child)
+                    if len(self.__pending__) >= self.checkpoint_interval:
+                        self.checkpoint()
+                    if time.time() - last_report >= self.report_interval:
+                        self.report(start)
+                        last_report = time.time()
+        finally:
+            self.checkpoint()
+            if self.__owns_indexer__:
+                self.indexer.close()
+            if self.journal is not None:
+                self.journal.close()
+        self.report(start)
+        seconds = time.time() - start
+        self.stats.update(self.counts)
+        self.stats.update({
+            "failures": len(self.indexer.failures),
+            "seconds": seconds,
+            "resources_per_second": self.counts["resources"] / max(
+                seconds, 0.001)})
+        return self.stats
+
+    def filler(self, kind):
+        """Method returns a fill function for Reindexer.reindex that crawls
+        Fedora into the new index for one kind of document
+
+        Args:
+            kind(str): bibframe or marc
+
+        Returns:
+            function
+        """
+        def fill(index, indexer):
+            self.indices = {kind: index}
+            self.indexer = indexer
+            self.__owns_indexer__ = False
+            self.crawl()
+            return self.counts[kind]
+        return fill
+
+def main():
+    """Main function, rebuilds the search indexes from Fedora. Each index
+    is crawled into a new versioned index and its alias swapped with a
+    Reindexer, so documents indexed under an older id scheme, like the
+    fcrepo:uuid ids, do not remain next to the path ids. --in-place crawls
+    into the live indexes, for indexes already using the path ids, and
+    allows a partial or resumable crawl.
+
+    python -m core.utilities.crawler --workers 16
+    python -m core.utilities.crawler --in-place --journal crawl.journal
+    """
+    parser = argparse.ArgumentParser(
+        description="Rebuild the search indexes by crawling Fedora")
+    parser.add_argument("--fedora", default="http://localhost:8080")
+    parser.add_argument("--es", default="localhost:9200")
+    parser.add_argument("--root", nargs="+", default=None)
+    parser.add_argument(
+        "--indices",
+        nargs="+",
+        default=["bibframe", "marc"],
+        choices=["bibframe", "marc"])
+    parser.add_argument("--ils", default="III")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--bulk-size", type=int, default=1000)
+    parser.add_argument(
+        "--in-place",
+        action="store_true",
+        help="Crawl into the live indexes instead of new ones, existing "
+             "documents with other ids are left in place")
+    parser.add_argument("--journal", default=None)
+    parser.add_argument("--resume", action="store_true")
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve stage metrics at /metrics on this port")
+    args = parser.parse_args()
+    if not args.in_place and (args.root or args.journal or args.resume):
+        parser.error("--root, --journal and --resume need --in-place, a "
+                     "rebuild crawls all of Fedora into new indexes")
+    if args.metrics_port is not None:
+        metrics.serve(args.metrics_port)
+    fedora = FedoraClient(args.fedora, pool_size=args.workers)
+    elastic_search = Elasticsearch([args.es])
+    if args.in_place:
+        for kind in args.indices:
+            if not check_ids(elastic_search, kind):
+                sys.exit(1)
+        crawler = Crawler(
+            fedora=fedora,
+            elastic_search=elastic_search,
+            indices=dict([(kind, kind) for kind in args.indices]),
+            ils=args.ils,
+            workers=args.workers,
+            bulk_size=args.bulk_size,
+            journal=args.journal,
+            resume=args.resume)
+        crawler.crawl(args.root)
+        return
+    for kind in args.indices:
+        crawler = Crawler(
+            fedora=fedora,
+            elastic_search=elastic_search,
+            ils=args.ils,
+            workers=args.workers)
+        reindexer = Reindexer(
+            elastic_search=elastic_search,
+            alias=kind,
+            bulk_size=args.bulk_size)
+        stats = reindexer.reindex(crawler.filler(kind))
+        if not stats.get("swapped"):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
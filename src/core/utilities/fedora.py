@@ -0,0 +1,301 @@
+"""
+Name:        fedora
+Purpose:     Shared Fedora 4 REST API client with persistent connection
+             pooling, timeouts and retry with backoff
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import rdflib
+import requests
+import threading
+from requests.adapters import HTTPAdapter
+from requests.packages.urllib3.util.retry import Retry
+from core.utilities import cache
+from core.utilities.metrics import timed
+from core.utilities.serializer import PREFIX_HEADER
+
+RETRY_METHODS = frozenset(['DELETE', 'GET', 'HEAD', 'OPTIONS', 'PATCH', 'PUT'])
+RETRY_STATUSES = (500, 502, 503, 504)
+WRITE_METHODS = frozenset(['DELETE', 'PATCH', 'POST', 'PUT'])
+
+def build_retry(retries, backoff):
+    """Function returns a urllib3 Retry that retries connection errors for
+    every method and resets and 5xx responses for the idempotent methods
+    (SPARQL INSERT DATA PATCHes are idempotent), POSTs are never resent once
+    they have reached Fedora
+
+    Args:
+        retries(int): Maximum number of retries
+        backoff(float): Backoff factor in seconds
+
+    Returns:
+        Retry
+    """
+    options = {
+        "total": retries,
+        "connect": retries,
+        "read": retries,
+        "status": retries,
+        "backoff_factor": backoff,
+        "status_forcelist": RETRY_STATUSES,
+        "raise_on_status": False}
+    try:
+        return Retry(allowed_methods=RETRY_METHODS, **options)
+    except TypeError:
+        # urllib3 before 1.26
+        return Retry(method_whitelist=RETRY_METHODS, **options)
+
+class FedoraClient(object):
+    """Client for the Fedora 4 REST API that keeps persistent connections
+    in a pool shared by every thread using the client
+
+    To use
+
+    >> fedora = FedoraClient("http://localhost:8080")
+    >> fedora_url = fedora.create(raw_turtle).text
+    """
+
+    def __init__(self, base_url="http://localhost:8080", **kwargs):
+        """Initializes a FedoraClient
+
+        Args:
+            base_url(str): Base URL of the Fedora 4 web application
+            pool_size(int): Maximum connections per host, defaults to 10
+            timeout(float or tuple): Connect and read timeouts in seconds,
+                                     defaults to (5, 60)
+            retries(int): Maximum retries, defaults to 3
+            backoff(float): Retry backoff factor in seconds, defaults to 0.5
+        """
+        self.base_url = base_url.rstrip("/")
+        self.rest_url = "/".join([self.base_url, 'rest'])
+        self.pool_size = kwargs.get('pool_size', 10)
+        self.timeout = kwargs.get('timeout', (5, 60))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            pool_block=True,
+            max_retries=build_retry(
+                kwargs.get('retries', 3),
+                kwargs.get('backoff', 0.5)))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def request(self, method, url, **kwargs):
+        """Method sends a request over the pooled session, raising
+        requests.HTTPError for 4xx and 5xx responses
+
+        Args:
+            method(str): HTTP method
+            url(str): URL
+            kwargs: Passed to requests.Session.request
+
+        Returns:
+            requests.Response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            with timed("fedora_{}".format(method.lower())):
+                response = self.session.request(method, str(url), **kwargs)
+                response.raise_for_status()
+        finally:
+            # After the write, so a read racing it cannot cache the old
+            # representation again, and even when the write failed part way
+            if method in WRITE_METHODS:
+                cache.invalidate(self.canonical(url))
+        return response
+
+    def canonical(self, url):
+        """Method removes a transaction segment from a resource URL, the
+        reverse of in_transaction
+
+        Args:
+            url(str): URL of the Fedora resource
+
+        Returns:
+            string
+        """
+        url = str(url).rstrip("/")
+        tx_prefix = "/".join([self.rest_url, "tx:"])
+        if url.startswith(tx_prefix):
+            segments = url[len(self.rest_url) + 1:].split("/", 1)
+            return "/".join([self.rest_url] + segments[1:])
+        return url
+
+    def resource_url(self, identifier):
+        """Method returns the URL of a resource from the identifier Fedora
+        minted for it, with the pairtree path Fedora 4 uses
+
+        Args:
+            identifier(str): UUID of the resource
+
+        Returns:
+            string
+        """
+        identifier = str(identifier)
+        return "/".join([
+            self.rest_url,
+            identifier[0:2],
+            identifier[2:4],
+            identifier[4:6],
+            identifier[6:8],
+            identifier])
+
+    def begin_transaction(self):
+        """Method starts a Fedora 4 transaction
+
+        Returns:
+            string URL of the transaction, for example
+            http://localhost:8080/rest/tx:83e34464-...
+        """
+        response = self.post("/".join([self.rest_url, "fcr:tx"]))
+        return response.headers.get("Location", response.text).rstrip("/")
+
+    def commit_transaction(self, tx_url):
+        """Method commits a transaction
+
+        Args:
+            tx_url(str): URL of the transaction
+        """
+        return self.post("/".join([tx_url, "fcr:tx", "fcr:commit"]))
+
+    def rollback_transaction(self, tx_url):
+        """Method rolls back a transaction
+
+        Args:
+            tx_url(str): URL of the transaction
+        """
+        return self.post("/".join([tx_url, "fcr:tx", "fcr:rollback"]))
+
+    def in_transaction(self, tx_url, url):
+        """Method rewrites a resource URL so a request is made inside a
+        transaction
+
+        Args:
+            tx_url(str): URL of the transaction
+            url(str): URL of the Fedora resource
+
+        Returns:
+            string
+        """
+        url = str(url)
+        if url.startswith(self.rest_url):
+            return tx_url + url[len(self.rest_url):]
+        return url
+
+    def create(self, data=None, content_type="text/turtle", parent=None):
+        """Method POSTs a new resource, the new resource's URL is the
+        response's text and its Location header
+
+        Args:
+            data(str or bytes): Body of the new resource
+            content_type(str): Content type of the body
+            parent(str): URL of the parent container, defaults to /rest
+
+        Returns:
+            requests.Response
+        """
+        headers = {}
+        if data is not None:
+            headers["Content-Type"] = content_type
+            if not isinstance(data, bytes):
+                data = data.encode()
+        return self.request(
+            "POST",
+            parent or self.rest_url,
+            data=data,
+            headers=headers)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def graph(self, url, graph=None):
+        """Method GETs a resource as Turtle and parses it into a graph
+
+        Args:
+            url(str): URL of the Fedora resource
+            graph(rdflib.Graph): Graph to parse into, defaults to a new graph
+
+        Returns:
+            rdflib.Graph
+        """
+        if graph is None:
+            graph = rdflib.Graph()
+        response = self.get(url, headers={"Accept": "text/turtle"})
+        with timed("fedora_parse"):
+            graph.parse(data=response.text, format='turtle', publicID=str(url))
+        return graph
+
+    def insert(self, url, predicate, object_):
+        """Method inserts a single triple with the resource as its subject
+
+        Args:
+            url(str): URL of the Fedora resource
+            predicate(rdflib.URIRef): Predicate
+            object_(rdflib.Term or str): Object, strings are inserted as
+                                         literals
+
+        Returns:
+            requests.Response
+        """
+        if not isinstance(object_, rdflib.term.Identifier):
+            object_ = rdflib.Literal(object_)
+        sparql = "{}INSERT DATA {{ <> {} {} . }}".format(
+            PREFIX_HEADER,
+            rdflib.URIRef(predicate).n3(),
+            object_.n3())
+        return self.patch(url, sparql)
+
+    def patch(self, url, sparql):
+        """Method sends a SPARQL-Update PATCH to a resource
+
+        Args:
+            url(str): URL of the Fedora resource
+            sparql(str): SPARQL Update
+
+        Returns:
+            requests.Response
+        """
+        return self.request(
+            "PATCH",
+            url,
+            data=sparql.encode(),
+            headers={"Content-Type": "application/sparql-update"})
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.request("HEAD", url, **kwargs)
+
+CLIENTS = {}
+CLIENTS_LOCK = threading.Lock()
+
+def default_client(base_url="http://localhost:8080", **kwargs):
+    """Function returns the shared FedoraClient for a base URL, creating it
+    on first use
+
+    Args:
+        base_url(str): Base URL of the Fedora 4 web application
+        kwargs: Passed to FedoraClient when the client is created
+
+    Returns:
+        FedoraClient
+    """
+    key = base_url.rstrip("/")
+    with CLIENTS_LOCK:
+        if not key in CLIENTS:
+            CLIENTS[key] = FedoraClient(key, **kwargs)
+        return CLIENTS[key]
@@ -11,111 +11,66 @@ Licence:     GPLv3
 """
 __author__ = "Jeremy Nelson"
 
+import collections
 import datetime
-import json
-import os
+import email.utils
 import rdflib
-import re
+import requests
 import sys
-import urllib.request
-from flask_fedora_commons import build_prefixes, Repository
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from flask_fedora_commons import Repository
 from elasticsearch import Elasticsearch
+from elasticsearch.exceptions import NotFoundError
+from core.utilities.bulk import BulkIndexer
+from core.utilities.fedora import default_client
+from core.utilities.journal import IngestJournal, INIT, PROCESS, replay
+from core.utilities.namespaces import (
+    AUTHZ, BF, DC, FCREPO, FEDORA, FEDORACONFIG, FEDORARELSEXT, FOAF, IMAGE,
+    MADS, MIX, MODE, MODSRDF, NT, OWL, PREMIS, RDF, RDFS, SCHEMA, SV, TEST,
+    XML, XMLNS, XS, XSI, CONTEXT)
+from core.utilities.labels import LabelIndex
+from core.utilities.mapping import SubjectMap
+from core.utilities import metrics
+from core.utilities.metrics import timed
+from core.utilities.projection import default_projection
+from core.utilities.serializer import PREFIX_HEADER, serialize
+from core.utilities.triplestore import TripleStore
 
-AUTHZ = rdflib.Namespace("http://fedora.info/definitions/v4/authorization#")
-BF = rdflib.Namespace("http://bibframe.org/vocab/")
-DC = rdflib.Namespace("http://purl.org/dc/elements/1.1/")
-FCREPO = rdflib.Namespace("http://fedora.info/definitions/v4/repository#")
-FEDORA = rdflib.Namespace("http://fedora.info/definitions/v4/rest-api#")
-FEDORACONFIG = rdflib.Namespace("http://fedora.info/definitions/v4/config#")
-FEDORARELSEXT = rdflib.Namespace("http://fedora.info/definitions/v4/rels-ext#")
-FOAF = rdflib.Namespace("http://xmlns.com/foaf/0.1/")
-IMAGE = rdflib.Namespace("http://www.modeshape.org/images/1.0")
-MADS = rdflib.Namespace("http://www.loc.gov/mads/rdf/v1#")
-MIX = rdflib.Namespace("http://www.jcp.org/jcr/mix/1.0")
-MODE = rdflib.Namespace("http://www.modeshape.org/1.0")
-MODSRDF = rdflib.Namespace("http://www.loc.gov/mods/modsrdf/v1")
-NT = rdflib.Namespace("http://www.jcp.org/jcr/nt/1.0")
-OWL = rdflib.Namespace("http://www.w3.org/2002/07/owl#")
-PREMIS = rdflib.Namespace("http://www.loc.gov/premis/rdf/v1#")
-RDF = rdflib.Namespace("http://www.w3.org/1999/02/22-rdf-syntax-ns#")
-RDFS = rdflib.Namespace("http://www.w3.org/2000/01/rdf-schema#")
-SCHEMA = rdflib.Namespace("http://schema.org/")
-SV = rdflib.Namespace("http://www.jcp.org/jcr/sv/1.0")
-TEST = rdflib.Namespace("info:fedora/test/")
-XML = rdflib.Namespace("http://www.w3.org/XML/1998/namespace")
-XMLNS = rdflib.Namespace("http://www.w3.org/2000/xmlns/")
-XS = rdflib.Namespace("http://www.w3.org/2001/XMLSchema")
-XSI = rdflib.Namespace("http://www.w3.org/2001/XMLSchema-instance")
-
-CONTEXT = {
-    "authz": "http://fedora.info/definitions/v4/authorization#",
-    "bf": "http://bibframe.org/vocab/",
-    "dc": "http://purl.org/dc/elements/1.1/",
-    "fcrepo": "http://fedora.info/definitions/v4/repository#",
-    "fedora": "http://fedora.info/definitions/v4/rest-api#",
-    "fedoraconfig": "http://fedora.info/definitions/v4/config#",
-    "fedorarelsext": "http://fedora.info/definitions/v4/rels-ext#",
-    "foaf": "http://xmlns.com/foaf/0.1/",
-    "image": "http://www.modeshape.org/images/1.0",
-    "mads": "http://www.loc.gov/mads/rdf/v1#",
-    "mix": "http://www.jcp.org/jcr/mix/1.0",
-    "mode": "http://www.modeshape.org/1.0",
-    "owl": "http://www.w3.org/2002/07/owl#",
-    "nt": "http://www.jcp.org/jcr/nt/1.0",
-    "premis": "http://www.loc.gov/premis/rdf/v1#",
-    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
-    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
-    "schema": "http://schema.org/",
-    "sv": "http://www.jcp.org/jcr/sv/1.0",
-    "test": "info:fedora/test/",
-    "xml": "http://www.w3.org/XML/1998/namespace",
-    "xmlns": "http://www.w3.org/2000/xmlns/",
-    "xs": "http://www.w3.org/2001/XMLSchema",
-    "xsi": "http://www.w3.org/2001/XMLSchema-instance"}
-
-URL_CHECK_RE = re.compile(
-    r'^(?:http|ftp)s?://' # http:// or https://
-    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|' # domain...
-    r'localhost|' # localhost...
-    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|' # ...or ipv4
-    r'\[?[A-F0-9]*:[A-F0-9:]+\]?)' # ...or ipv6
-    r'(?::\d+)?' # optional port
-    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-
-def create_sparql_insert_row(predicate, object_):
-    """Function creates a SPARQL update row based on a predicate and object
+DEDUP_FIELDS = [
+    "bf:authorizedAccessPoint.raw",
+    "mads:authoritativeLabel.raw",
+    "bf:label.raw",
+    "bf:titleValue.raw"]
+
+LABEL_PREDICATES = [
+    BF.authorizedAccessPoint,
+    BF.label,
+    MADS.authoritativeLabel,
+    BF.titleValue]
+
+def dedup_query(term):
+    """Function returns an Elastic Search query body that matches a term
+    exactly against the not_analyzed raw fields used for deduplication
 
     Args:
-        predicate(rdflib.Term): Predicate
-        object_(rdflib.Term): Object
+        term(string): A search term or phrase
 
     Returns:
-        string
+        dict: Query body returning at most the top hit's location
     """
-    statement = "<> "
-    if str(predicate).startswith(str(RDF)):
-        statement += "rdf:" + predicate.split("#")[-1]
-    elif str(predicate).startswith(str(BF)):
-        statement += "bf:" + predicate.split("/")[-1]
-    elif str(predicate).startswith(str(MADS)):
-        statement += "mads:" + predicate.split("#")[-1]
-    else:
-        statement += "<" + str(predicate) + ">"
-    if type(object_) == rdflib.URIRef:
-        if URL_CHECK_RE.search(str(object_)):
-            statement += " <" + str(object_) + "> "
-        else:
-            statement += """ "{}" """.format(object_)
-    if type(object_) == rdflib.Literal:
-        if str(object_).find('"') > -1:
-            value = """ '''{}''' """.format(object_)
-        else:
-            value = """ "{}" """.format(object_)
-        statement += value
-    if type(object_) == rdflib.BNode:
-        statement += """ "{}" """.format(object_)
-    statement += ".\n"
-    return statement
+    return {
+        "query": {
+            "bool": {
+                "should": [{"term": {field: term}} for field in DEDUP_FIELDS],
+                "minimum_should_match": 1
+            }
+        },
+        "size": 1,
+        "_source": ["fcrepo:hasLocation"]
+    }
 
 def dedup(term, elastic_search=Elasticsearch()):
     """Function takes a term and attempts to match it againest three
@@ -131,43 +86,44 @@ def dedup(term, elastic_search=Elasticsearch()):
     """
     if term is None:
         return
-    search_result = elastic_search.search(
-        index="bibframe",
-        body={
-            "query": {
-                "filtered": {
-                    "filter": {
-                        "or": [
-                            {
-                            "term": {
-                                "bf:authorizedAccessPoint.raw": term
-                            }
-                            },
-                            {
-                            "term": {
-                                "mads:authoritativeLabel.raw": term
-                            }
-
-                            },
-                            {
-                            "term": {
-                                "bf:label.raw": term
-                            }
-                            },
-                            {
-                            "term": {
-                                "bf:titleValue.raw": term
-                            }
-                            }
-                    ]
-                }
-            }
-        }
-    }
-    )
-    if search_result.get('hits').get('total') > 0:
-        top_hit = search_result['hits']['hits'][0]
-        return top_hit['_source']['fcrepo:hasLocation'][0]
+    with timed("dedup"):
+        search_result = elastic_search.search(
+            index="bibframe",
+            body=dedup_query(term))
+    hits = search_result.get('hits').get('hits')
+    if len(hits) > 0:
+        return hits[0]['_source']['fcrepo:hasLocation'][0]
+
+def dedup_batch(terms, elastic_search=Elasticsearch()):
+    """Function takes a list of terms and resolves all of them with a single
+    Elastic Search multi-search, one sub-search per unique term
+
+    Args:
+        terms(list): Search terms or phrases
+
+    Returns:
+        dict: Term to the URL of the term's top-hit, terms without a hit
+              are omitted
+    """
+    unique_terms, seen = [], set()
+    for term in terms:
+        if term is not None and term not in seen:
+            seen.add(term)
+            unique_terms.append(term)
+    if len(unique_terms) < 1:
+        return {}
+    body = []
+    for term in unique_terms:
+        body.append({"index": "bibframe"})
+        body.append(dedup_query(term))
+    with timed("dedup"):
+        search_result = elastic_search.msearch(body=body)
+    matches = {}
+    for term, response in zip(unique_terms, search_result.get('responses')):
+        hits = response.get('hits', {}).get('hits', [])
+        if len(hits) > 0:
+            matches[term] = hits[0]['_source']['fcrepo:hasLocation'][0]
+    return matches
 
 def default_graph():
     """Function generates a new rdflib Graph and sets all namespaces as part
@@ -177,6 +133,220 @@ def default_graph():
         new_graph.namespace_manager.bind(key, value)
     return new_graph
 
+COMPACT_NAMESPACES = sorted(
+    CONTEXT.items(),
+    key=lambda item: len(item[1]),
+    reverse=True)
+
+def compact_uri(uri):
+    """Function compacts a URI into a prefixed name using the namespaces in
+    CONTEXT, URIs outside of CONTEXT are returned unchanged
+
+    Args:
+        uri(rdflib.URIRef): URI
+
+    Returns:
+        string
+    """
+    value = str(uri)
+    for prefix, namespace in COMPACT_NAMESPACES:
+        if value.startswith(namespace) and len(value) > len(namespace):
+            return "{}:{}".format(prefix, value[len(namespace):])
+    return value
+
+def fedora_id(fedora_url):
+    """Function returns the last segment of a resource's path, the id of
+    the resource's search documents whichever way they are built. It is
+    not the JCR fcrepo:uuid, which Fedora assigns separately and which
+    older indexes used as the id. Those indexes must be rebuilt before
+    ingesting into them, or each resource gets a second document:
+
+    python -m core.utilities.reindex bibframe
+
+    Args:
+        fedora_url(str): URL of the Fedora resource
+
+    Returns:
+        string
+    """
+    return str(fedora_url).rstrip("/").split("/")[-1]
+
+def document_id(source):
+    """Function returns the path id of a search document from the Fedora
+    URL in its body, fcrepo:hasLocation or for MARC documents the owl:sameAs
+    link to their binary's fcr:metadata
+
+    Args:
+        source(dict): Body of the document
+
+    Returns:
+        string or None if the body has neither field
+    """
+    if source.get("fcrepo:hasLocation"):
+        return fedora_id(source["fcrepo:hasLocation"][0])
+    if source.get("owl:sameAs"):
+        fedora_url = str(source["owl:sameAs"][0])
+        if fedora_url.endswith("fcr:metadata"):
+            fedora_url = fedora_url.rsplit("/", 1)[0]
+        return fedora_id(fedora_url)
+
+def legacy_ids(elastic_search, index='bibframe', sample=10):
+    """Function checks a sample of an index's documents and returns True if
+    their ids are not the path ids of their resources, as in indexes built
+    before fedora_id, which must be rebuilt before ingesting into them
+
+    Args:
+        elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+        index(str): Index or alias
+        sample(int): Number of documents checked
+
+    Returns:
+        boolean
+    """
+    try:
+        result = elastic_search.search(
+            index=index,
+            body={"size": sample,
+                  "_source": ["fcrepo:hasLocation", "owl:sameAs"]})
+    except NotFoundError:
+        return False
+    for hit in result.get('hits', {}).get('hits', []):
+        doc_id = document_id(hit.get('_source', {}))
+        if doc_id is not None and str(hit.get('_id')) != doc_id:
+            return True
+    return False
+
+def check_ids(elastic_search, index='bibframe'):
+    """Function prints how to rebuild an index that still has documents
+    with the older fcrepo:uuid ids
+
+    Args:
+        elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+        index(str): Index or alias
+
+    Returns:
+        boolean: True if the index can be ingested into
+    """
+    if not legacy_ids(elastic_search, index):
+        return True
+    print("Could NOT ingest into {0}, its documents use the fcrepo:uuid "
+          "ids, rebuild it first with python -m core.utilities.reindex "
+          "{0}".format(index))
+    return False
+
+def http_date_to_iso(value):
+    """Function converts an HTTP date header value to an ISO 8601 timestamp
+
+    Args:
+        value(str): HTTP date, for example a Last-Modified header
+
+    Returns:
+        string, or the current UTC time if value is missing
+    """
+    if value:
+        return email.utils.parsedate_to_datetime(value).isoformat()
+    return datetime.datetime.utcnow().isoformat() + "Z"
+
+class LabelledBNodes(dict):
+    """bnode_context for rdflib's N-Triples parser that keeps the blank node
+    labels from the source, so the same blank node parses to the same BNode
+    in every window and pass without holding a map of labels in memory"""
+
+    def get(self, key, default=None):
+        return key
+
+def open_source(source):
+    """Function opens a path, - for stdin, or returns an open file as is
+
+    Args:
+        source(str or file): Source of RDF
+
+    Returns:
+        file
+    """
+    if source == "-":
+        return sys.stdin
+    if isinstance(source, str):
+        return open(source, encoding="utf-8")
+    return source
+
+def parse_ntriples(data, graph=None):
+    """Function parses N-Triples into a graph keeping blank node labels
+
+    Args:
+        data(str): N-Triples
+        graph(rdflib.Graph): Graph to parse into, defaults to a new graph
+
+    Returns:
+        rdflib.Graph
+    """
+    if graph is None:
+        graph = default_graph()
+    try:
+        graph.parse(data=data, format='nt', bnode_context=LabelledBNodes())
+    except TypeError:
+        # rdflib before 5.0 keeps N-Triples blank node labels already
+        graph.parse(data=data, format='nt')
+    return graph
+
+def serialize_ntriples(graph):
+    """Function returns a graph serialized as N-Triples text"""
+    data = graph.serialize(format='nt')
+    if isinstance(data, bytes):
+        data = data.decode()
+    return data
+
+def read_windows(lines, format='nt', window=10000):
+    """Generator reads N-Triples lines, or Turtle blocks separated by blank
+    lines, and yields a graph and its sorted subjects for about window
+    subjects at a time. The most recently read subject is carried into the
+    next window so a subject's consecutive triples stay together.
+
+    Args:
+        lines(iterable): Lines of text
+        format(str): nt or turtle
+        window(int): Subjects per window
+
+    Returns:
+        generator of (rdflib.Graph, list) tuples
+    """
+    if format == 'nt':
+        groups = collections.OrderedDict()
+        for line in lines:
+            line = line.strip()
+            if len(line) < 1 or line.startswith("#"):
+                continue
+            subject = line.split(None, 1)[0]
+            groups.setdefault(subject, []).append(line)
+            if len(groups) > window:
+                last_subject, last_lines = groups.popitem(last=True)
+                graph = parse_ntriples(
+                    "\n".join([row for rows in groups.values() for row in rows]))
+                yield graph, sorted(set(graph.subjects()), key=str)
+                groups = collections.OrderedDict([(last_subject, last_lines)])
+        if len(groups) > 0:
+            graph = parse_ntriples(
+                "\n".join([row for rows in groups.values() for row in rows]))
+            yield graph, sorted(set(graph.subjects()), key=str)
+        return
+    header, block, blocks, graph = [], [], 0, default_graph()
+    for line in lines:
+        if line.strip().lower().startswith(
+            ("@prefix", "@base", "prefix ", "base ")):
+            header.append(line)
+        elif len(line.strip()) > 0:
+            block.append(line)
+        elif len(block) > 0:
+            graph.parse(data="".join(header + block), format='turtle')
+            block, blocks = [], blocks + 1
+            if blocks >= window:
+                yield graph, sorted(set(graph.subjects()), key=str)
+                blocks, graph = 0, default_graph()
+    if len(block) > 0:
+        graph.parse(data="".join(header + block), format='turtle')
+    if len(graph) > 0:
+        yield graph, sorted(set(graph.subjects()), key=str)
+
 def guess_search_doc_type(graph, fcrepo_uri):
     """Function takes a graph and attempts to guess the Doc type for ingestion
     into Elastic Search
@@ -211,6 +381,29 @@ def guess_search_doc_type(graph, fcrepo_uri):
             doc_type = class_name
     return doc_type
 
+def project_graph(graph, projection, resolve=None):
+    """Function projects the subjects of a Fedora graph that were created in
+    the repository into a dict for indexing into Elastic Search
+
+    Args:
+        graph(rdflib.Graph): Fedora Graph
+        projection(core.utilities.projection.Projection): Mapping plans
+        resolve(function): Maps object URIs to the values indexed for them
+
+    Returns:
+        dict: Dictionary of values filtered for Elastic Search indexing
+    """
+    body = dict()
+    for fcrepo_uri in set(graph.subjects(predicate=FCREPO.created)):
+        projected = projection.project(
+            graph.predicate_objects(subject=fcrepo_uri),
+            guess_search_doc_type(graph, fcrepo_uri),
+            resolve)
+        projected['fcrepo:hasLocation'] = [str(fcrepo_uri)]
+        for key, values in projected.items():
+            body.setdefault(key, []).extend(values)
+    return body
+
 class GraphIngester(object):
     """Takes a BIBFRAME graph, extracts all subjects and creates an object in
     Fedora 4 for all triples associated with the subject. The Fedora 4 subject
@@ -229,29 +422,143 @@ class GraphIngester(object):
             es(elasticsearch.ElasticSearch): Instance of Elasticsearch
             graph(rdflib.Graph): BIBFRAM RDF Graph
             repository(flask_fedora_commons.Repository): Fedora Commons Repository
+            fedora(core.utilities.fedora.FedoraClient): Pooled Fedora client,
+                defaults to the shared client for the repository's base URL
             quiet(boolean): If False, prints status of ingestion
             debug(boolean): Adds additional information for debugging purposes
+            bulk(boolean): If True, buffers documents and sends them to
+                           Elastic Search with the _bulk API
+            bulk_size(int): Maximum documents in a bulk batch
+            bulk_bytes(int): Maximum size in bytes of a bulk batch
+            flush_interval(float): Seconds between timed bulk flushes
+            index_once(boolean): If True, a subject is only indexed after
+                                 process_subject instead of also after
+                                 init_subject
+            dedup_batch_size(int): Number of subjects whose labels are
+                                   resolved with a single multi-search,
+                                   0 queries each label separately
+            label_index(str or LabelIndex): Path to, or instance of, a
+                                            persistent label index checked
+                                            before Elastic Search
+            warm_labels(boolean): If True, pre-warms the label index from
+                                  the bibframe index
+            write_through(boolean): If True, search documents are built from
+                                    the ingested graph and Fedora's response
+                                    headers instead of re-fetching each
+                                    resource from Fedora
+            verify(boolean): If True with write_through, fetches each
+                             resource from Fedora and reports differences
+                             with the locally built document
+            workers(int): Number of worker threads used by ingest, 1 runs
+                          each subject in turn
+            max_pending(int): Maximum queued units of work before ingest
+                              blocks, defaults to four per worker
+            tx_batch_size(int): Number of subjects PATCHed in a single
+                                Fedora transaction, 0 PATCHes and commits
+                                each subject on its own
+            tx_retries(int): Times a rolled back transaction is retried
+            journal(str or IngestJournal): Path to, or instance of, an
+                append-only journal of completed steps
+            resume(boolean): If True, replays the journal so finished
+                init_subject and process_subject steps are skipped. Blank
+                node subjects are only matched when their labels are stable
+                between runs, as with ingest_stream
+            fsync_interval(int): Journal records between fsyncs
+            memory_cap(int): Entries the subject map and the creation
+                             times hold in memory before spilling to
+                             SQLite
+            map_path(str): Path of the SQLite database the maps spill to
+            triplestore(str or TripleStore): URL of, or instance of, a
+                Fuseki dataset that processed subjects are loaded into
+            triplestore_batch_size(int): Triples in each Fuseki POST
+            triplestore_workers(int): Fuseki POSTs in flight at once
+            mint(boolean): If True, ingest mints each new subject's Fedora
+                           URL on the client and PUTs the subject with all
+                           of its triples in a single pass, tx_batch_size
+                           is not used
 
         """
-        self.bf2uris = {}
+        self.bf2uris = SubjectMap(
+            memory_cap=kwargs.get('memory_cap'),
+            path=kwargs.get('map_path'),
+            table="bf2uris")
+        self.dedup_batch_size = kwargs.get('dedup_batch_size', 100)
+        self.prefetched = {}
         self.debug = kwargs.get('debug', False)
-        self.uris2uuid = {}
+        self.lock = threading.RLock()
+        self.stats = {}
+        # Creation times of resources waiting for process_subject, every
+        # subject of a stream is initialized before any is processed so
+        # they spill with the subject map
+        self.timestamps = SubjectMap(
+            memory_cap=kwargs.get('memory_cap'),
+            path=kwargs.get('map_path'),
+            table="timestamps")
+        self.workers = kwargs.get('workers', 1)
+        self.max_pending = kwargs.get('max_pending', self.workers * 4)
+        self.tx_batch_size = kwargs.get('tx_batch_size', 0)
+        self.tx_retries = kwargs.get('tx_retries', 2)
+        self.mint = kwargs.get('mint', False)
+        self.minted = set()
+        # URLs created in this run that another subject was deduplicated
+        # to, their documents must be fetched to include every subject
+        self.shared = set()
+        self.minted_labels = {}
+        self.write_through = kwargs.get('write_through', False)
+        self.verify = kwargs.get('verify', False)
         self.elastic_search = kwargs.get('elastic_search', Elasticsearch())
+        self.projection = kwargs.get('projection', default_projection())
         if not self.elastic_search.indices.exists('bibframe'):
-            helper_directory = os.path.dirname(__file__)
-            base_directory = helper_directory.split(
-                "{0}catalog{0}helpers".format(os.path.sep))[0]
-            with open(
-                os.path.join(
-                    base_directory,
-                    "search{0}config{0}bibframe-map.json".format(
-                    os.path.sep))) as raw_json:
-                        bf_map = json.load(raw_json)
-            self.elastic_search.indices.create(index='bibframe', body=bf_map)
+            self.elastic_search.indices.create(
+                index='bibframe',
+                body={"mappings": self.projection.mappings})
 
+        self.processed = set()
+        self.journal = kwargs.get('journal', None)
+        if self.journal is not None and \
+           not isinstance(self.journal, IngestJournal):
+            self.journal = IngestJournal(
+                self.journal,
+                fsync_interval=kwargs.get('fsync_interval', 1000))
+        if self.journal is not None and kwargs.get('resume', False):
+            for step, subject, url in replay(self.journal.path):
+                if step == INIT:
+                    self.bf2uris[subject] = url
+                elif step == PROCESS:
+                    self.processed.add(subject)
+        # Defaults are only built when the option is missing, a LabelIndex
+        # opens a database and an empty one is falsy
+        self.label_index = kwargs.get('label_index')
+        if self.label_index is None:
+            self.label_index = LabelIndex()
+        elif not isinstance(self.label_index, LabelIndex):
+            self.label_index = LabelIndex(self.label_index)
+        if kwargs.get('warm_labels', False):
+            self.label_index.warm(self.elastic_search)
         self.graph = kwargs.get('graph', default_graph())
         self.repository = kwargs.get('repository', Repository())
+        self.fedora = kwargs.get('fedora')
+        if self.fedora is None:
+            self.fedora = default_client(self.repository.base_url)
         self.quiet = kwargs.get('quiet', False)
+        self.index_once = kwargs.get('index_once', False)
+        self.triplestore = kwargs.get('triplestore', None)
+        if self.triplestore is not None and \
+           not isinstance(self.triplestore, TripleStore):
+            self.triplestore = TripleStore(
+                self.triplestore,
+                batch_size=kwargs.get('triplestore_batch_size', 50000),
+                workers=kwargs.get('triplestore_workers', 4),
+                quiet=self.quiet)
+        self.indexer = None
+        self.__pending__ = []
+        if kwargs.get('bulk', False):
+            self.indexer = BulkIndexer(
+                self.elastic_search,
+                max_docs=kwargs.get('bulk_size', 500),
+                max_bytes=kwargs.get('bulk_bytes', 5 * 1024 * 1024),
+                flush_interval=kwargs.get('flush_interval', 5.0),
+                quiet=self.quiet)
 
     def init_subject(self, subject):
         """Method initializes a subject, serializes JSON-LD of Fedora container
@@ -267,41 +574,58 @@ class GraphIngester(object):
             return
         existing_url =  self.exists(subject)
         if existing_url:
-            if not str(subject) in self.bf2uris:
-                self.bf2uris[str(subject)] = existing_url
+            with self.lock:
+                if not str(subject) in self.bf2uris:
+                    self.bf2uris[str(subject)] = existing_url
+                if existing_url in self.timestamps:
+                    self.shared.add(existing_url)
+            self.__record__(INIT, subject, existing_url)
             return
-        raw_turtle = """PREFIX bf: <http://bibframe.org/vocab/>
- PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
- PREFIX mads: <http://www.loc.gov/mads/rdf/v1#>\n"""
-        for predicate, _object in self.graph.predicate_objects(subject=subject):
-            if type(_object) == rdflib.Literal:
-                raw_turtle += create_sparql_insert_row(predicate, _object)
-            if predicate == rdflib.RDF.type:
-                raw_turtle += create_sparql_insert_row(predicate, _object)
-
-        new_request = urllib.request.Request(
-            "/".join([self.repository.base_url, 'rest']),
-            data=raw_turtle.encode(),
-            method="POST",
-            headers={"Content-Type": "text/turtle"})
+        with timed("serialize"):
+            raw_turtle = PREFIX_HEADER + serialize(
+                [(predicate, _object)
+                 for predicate, _object in self.graph.predicate_objects(
+                     subject=subject)
+                 if type(_object) == rdflib.Literal or
+                    predicate == rdflib.RDF.type])
+
+        headers = None
         try:
-            fedora_url = urllib.request.urlopen(new_request).read().decode()
-        except urllib.error.HTTPError as http_error:
+            result = self.fedora.create(raw_turtle)
+            fedora_url = result.text
+            headers = result.headers
+        except requests.exceptions.HTTPError as http_error:
             error_comment = "Failed to add {}, Error={}\nTurtle=\n{}".format(
                 subject,
                 http_error,
                 raw_turtle)
             print(error_comment)
-            fedora_url = self.repository.create()
-            self.repository.insert(fedora_url, "owl:sameAs", str(subject))
+            fedora_url = self.fedora.create().text
+            self.fedora.insert(fedora_url, OWL.sameAs, str(subject))
             ##self.repository.insert(fedora_url, "rdfs:comment", error_comment)
-        self.bf2uris[str(subject)] = fedora_url
-        self.index(rdflib.URIRef(fedora_url))
+        with self.lock:
+            self.bf2uris[str(subject)] = fedora_url
+        self.__record__(INIT, subject, fedora_url)
+        for label in self.get_labels(subject):
+            self.label_index.add(label, fedora_url)
+        if self.write_through and headers is not None:
+            self.timestamps[fedora_url] = http_date_to_iso(
+                headers.get('Last-Modified'))
+        if not self.index_once:
+            if headers is not None:
+                self.index(
+                    rdflib.URIRef(fedora_url),
+                    subject=subject,
+                    headers=headers,
+                    literals_only=True)
+            else:
+                self.index(rdflib.URIRef(fedora_url))
         return fedora_url
 
     def generate_body(self, graph):
-        """Function takes a Fedora URI, filters the Fedora graph and returns a dict
-        for indexing into Elastic search
+        """Function takes a Fedora graph and projects the subjects created in
+        the repository into a dict for indexing into Elastic search, using
+        the doc type's compiled mapping plan
 
         Args:
             graph(rdflib.Graph): Fedora Graph
@@ -309,155 +633,768 @@ class GraphIngester(object):
         Returns:
             dict: Dictionary of values filtered for Elastic Search indexing
         """
-        def get_id_or_value(value):
-            """Helper function takes a dict with either a value or id and returns
-            the dict value
-
-            Args:
-                value(dict)
-            Returns:
-                string or None
-            """
-            if '@value' in value:
-                return value.get('@value')
-            elif '@id' in value:
-                uri = value.get('@id')
-                if uri in self.uris2uuid:
-                    return self.uris2uuid[uri]
-                else:
-                    return uri
-            return value
-        def set_or_expand(key, value):
-            """Helper function takes a key and value and either creates a key
-            with either a list or appends an existing key-value to the value
-
-            Args:
-                key
-                value
-            """
-            if key not in body:
-                body[key] = []
-            if type(value) == list:
-                for row in value:
-                    body[key].append(get_id_or_value(row))
-            else:
-                body[key] = [get_id_or_value(value),]
-        body = dict()
-        bf_json = json.loads(
-            graph.serialize(
-                format='json-ld',
-                context=CONTEXT).decode())
-        if '@graph' in bf_json:
-            for graph in bf_json.get('@graph'):
-                # Index only those graphs that have been created in the
-                # repository
-                if 'fcrepo:created' in graph:
-                    for key, val in graph.items():
-                        if key in [
-                            'fcrepo:lastModified',
-                            'fcrepo:created',
-                            'fcrepo:uuid'
-                        ]:
-                            set_or_expand(key, val)
-                        elif key.startswith('@type'):
-                            for name in val:
-                                if name.startswith('bf:'):
-                                    set_or_expand('type', name)
-                        elif key.startswith('@id'):
-                            set_or_expand('fcrepo:hasLocation', val)
-                        elif not key.startswith('fcrepo') and not key.startswith('owl'):
-                            set_or_expand(key, val)
+        return project_graph(graph, self.projection, self.__resolve_url__)
+
+    def __resolve_url__(self, object_):
+        uri = str(object_)
+        if uri.startswith(self.fedora.rest_url):
+            return fedora_id(uri)
+        return uri
+
+    def __resolve_subject__(self, object_):
+        object_url = self.bf2uris.get(object_)
+        if object_url is None:
+            return str(object_)
+        return fedora_id(object_url)
+
+    def build_body(self, subject, fedora_url, headers=None, **kwargs):
+        """Method builds the Elastic Search document for a subject from the
+        triples in the ingester's graph and the headers Fedora returned when
+        the resource was written, producing the same shape of document as
+        generate_body without fetching the resource from Fedora
+
+        Args:
+            subject(rdflib.Term or list): BIBFRAME subject, or every subject
+                                          written to the resource
+            fedora_url(str): URL of the subject's Fedora resource
+            headers(dict): Fedora response headers
+            literals_only(boolean): Only index literals and types, matching
+                                    what init_subject writes to Fedora
+
+        Returns:
+            dict: Dictionary of values for Elastic Search indexing
+        """
+        literals_only = kwargs.get('literals_only', False)
+        if headers is None:
+            headers = {}
+        fedora_url = str(fedora_url)
+        last_modified = http_date_to_iso(headers.get('Last-Modified'))
+        body = {
+            "fcrepo:created": [self.timestamps.get(fedora_url, last_modified)],
+            "fcrepo:hasLocation": [fedora_url],
+            "fcrepo:lastModified": [last_modified]
+        }
+        subjects = subject if isinstance(subject, list) else [subject]
+        predicate_objects = []
+        for subject in subjects:
+            predicate_objects.extend(
+                self.graph.predicate_objects(subject=subject))
+        # Triples shared by several subjects are stored once in Fedora
+        predicate_objects = list(collections.OrderedDict.fromkeys(
+            predicate_objects))
+        if literals_only:
+            predicate_objects = [
+                (predicate, object_) for predicate, object_ in predicate_objects
+                if predicate == rdflib.RDF.type or \
+                   isinstance(object_, rdflib.Literal)]
+        body.update(self.projection.project(
+            predicate_objects,
+            guess_search_doc_type(self.graph, subjects[0]),
+            self.__resolve_subject__))
         return body
 
+    def __writes_through__(self, fedora_url, subject):
+        """Method returns True if the document of a resource can be built
+        from the graph, the resource was created in this run and no other
+        subject was deduplicated to it"""
+        if not self.write_through or subject is None:
+            return False
+        fedora_url = str(fedora_url)
+        if isinstance(subject, list):
+            return fedora_url in self.minted
+        return fedora_url in self.timestamps and \
+            not fedora_url in self.shared
+
+    def verify_body(self, fcrepo_uri, body):
+        """Method fetches a resource from Fedora and reports the fields where
+        the Fedora document differs from a locally built body
 
+        Args:
+            fcrepo_uri(rdflib.URIRef): Fedora URI Ref for a BIBFRAME subject
+            body(dict): Locally built document
 
+        Returns:
+            list: Keys that differ
+        """
+        fedora_body = self.generate_body(
+            self.fedora.graph(fcrepo_uri, default_graph()))
+        differences = []
+        for key in set(body.keys()).union(fedora_body.keys()):
+            if key.startswith('fcrepo'):
+                continue
+            if sorted(body.get(key, [])) != sorted(fedora_body.get(key, [])):
+                differences.append(key)
+        if len(differences) > 0 and self.quiet is False:
+            print("{} differs from Fedora for {}".format(
+                fcrepo_uri,
+                ", ".join(sorted(differences))))
+        return differences
 
     def exists(self, subject):
-        """Method takes a subject, queries Elasticsearch index,
-        if present, adds result to bf2uris, always returns boolean
+        """Method takes a subject, checks the local label index and the labels
+        resolved by resolve_duplicates before querying the Elasticsearch
+        index, returns the matching Fedora URL
 
         Args:
             subject(rdflib.Term): Subject, can be literal, BNode, or URI
 
         Returns:
-            boolean
+            string URL of the existing resource or None
         """
-        doc_type = guess_search_doc_type(self.graph, subject)
-        # This should be accomplished in a single Elasticseach query
-        # instead of potentially five separate queries
-        for predicate in [
-            BF.authorizedAccessPoint,
-            BF.label,
-            MADS.authoritativeLabel,
-            BF.titleValue]:
-            objects = self.graph.objects(
-                subject=subject,
-                predicate=predicate)
-            for object_value in objects:
-                result = dedup(str(object_value), self.elastic_search)
+        labels = self.get_labels(subject)
+        for label in labels:
+            result = self.label_index.get(label)
+            if result:
+                return result
+        if str(subject) in self.prefetched:
+            result = self.prefetched.pop(str(subject))
+        else:
+            result = None
+            for label in labels:
+                result = dedup(label, self.elastic_search)
                 if result:
-                    return result
+                    break
+        if result:
+            for label in labels:
+                self.label_index.add(label, result)
+            return result
 
+    def get_labels(self, subject):
+        """Method returns the subject's labels used for deduplication in
+        order of precedence
 
-    def index(self, fcrepo_uri):
+        Args:
+            subject(rdflib.Term): Subject
+
+        Returns:
+            list: Label strings
+        """
+        labels = []
+        for predicate in LABEL_PREDICATES:
+            for object_value in self.graph.objects(
+                subject=subject,
+                predicate=predicate):
+                labels.append(str(object_value))
+        return labels
+
+    def resolve_duplicates(self, subjects):
+        """Method gathers the labels of a chunk of subjects, resolves all of
+        them with a single Elasticsearch multi-search and maps the top hits
+        back to the subjects for use by exists
+
+        Args:
+            subjects(list): Subjects to resolve
+        """
+        candidates = []
+        for subject in subjects:
+            if str(subject) in self.bf2uris:
+                continue
+            labels = self.get_labels(subject)
+            if len(labels) > 0 and not any(
+                [label in self.label_index for label in labels]):
+                candidates.append((str(subject), labels))
+        terms = []
+        for subject, labels in candidates:
+            terms.extend(labels)
+        matches = dedup_batch(terms, self.elastic_search)
+        for subject, labels in candidates:
+            self.prefetched[subject] = None
+            for label in labels:
+                if label in matches:
+                    self.prefetched[subject] = matches[label]
+                    break
+
+    def index(self, fcrepo_uri, subject=None, headers=None, **kwargs):
         """Method takes a Fedora Object URIRef, generates JSON-LD
         representation, and then ingests into an Elasticsearch
-        instance
+        instance. With write_through and a subject, the document is
+        built locally by build_body instead, unless the resource existed
+        before this run or is shared with other subjects, as their triples
+        are only in Fedora. Either way the document id is the resource's
+        path id, fedora_id.
 
         Args:
             fcrepo_uri(rdflib.URIRef): Fedora URI Ref for a BIBFRAME subject
+            subject(rdflib.Term or list): BIBFRAME subject of the Fedora
+                                          resource, or every subject of a
+                                          minted resource
+            headers(dict): Fedora response headers
+            literals_only(boolean): Passed to build_body
 
         """
-        fcrepo_graph = default_graph().parse(str(fcrepo_uri))
-        doc_id = str(fcrepo_graph.value(
-                    subject=fcrepo_uri,
-                    predicate=FCREPO.uuid))
-        if not str(fcrepo_uri) in self.uris2uuid:
-            self.uris2uuid[str(fcrepo_uri)] = doc_id
-        doc_type = guess_search_doc_type(fcrepo_graph, fcrepo_uri)
-        body = self.generate_body(fcrepo_graph)
-        self.elastic_search.index(
-            index='bibframe',
-            doc_type=doc_type,
-            id=doc_id,
-            body=body)
+        doc_id = fedora_id(fcrepo_uri)
+        if self.__writes_through__(fcrepo_uri, subject):
+            doc_type = guess_search_doc_type(
+                self.graph,
+                subject[0] if isinstance(subject, list) else subject)
+            with timed("project"):
+                body = self.build_body(
+                    subject,
+                    fcrepo_uri,
+                    headers,
+                    literals_only=kwargs.get('literals_only', False))
+            if self.verify:
+                self.verify_body(fcrepo_uri, body)
+        else:
+            fcrepo_graph = self.fedora.graph(fcrepo_uri, default_graph())
+            doc_type = guess_search_doc_type(fcrepo_graph, fcrepo_uri)
+            with timed("project"):
+                body = self.generate_body(fcrepo_graph)
+        if self.indexer is not None:
+            self.indexer.add('bibframe', doc_type, doc_id, body)
+            return
+        with timed("es_index"):
+            self.elastic_search.index(
+                index='bibframe',
+                doc_type=doc_type,
+                id=doc_id,
+                body=body)
 
     def ingest(self):
-        """Method ingests a BIBFRAME graph into Fedora 4 and Elastic search"""
+        """Method ingests a BIBFRAME graph into Fedora 4 and Elastic search,
+        running each phase with a pool of worker threads when workers is
+        greater than one"""
+        if not check_ids(self.elastic_search):
+            return
         start = datetime.datetime.utcnow()
         if self.quiet is False:
             print("Started ingestion at {}".format(start.isoformat()))
-        subjects = set([subject for subject in self.graph.subjects()])
+        if self.indexer is not None:
+            self.indexer.start()
+        subjects = sorted(set(self.graph.subjects()), key=str)
         if self.quiet is False:
             print("Initializing all subjects")
-        for i, subject in enumerate(subjects):
-            if not i%10 and i > 0:
-                if self.quiet is False:
-                    print(".", end="")
-            if not i%100:
-                if self.quiet is False:
-                    print(i, end="")
-            self.init_subject(subject)
+        if self.mint:
+            self.mint_subjects(subjects)
+        else:
+            self.init_subjects(subjects)
         finished_init = datetime.datetime.utcnow()
         if self.quiet is False:
             print("Finished initializing {} subjects at {}, time={}".format(
-                i,
+                len(subjects),
                 finished_init,
-                (finished_init-start).seconds / 60.0))
-        for i, subject_uri in enumerate(subjects):
-            if not i%10 and i > 0:
-                if self.quiet is False:
-                    print(".", end="")
-            if not i%100:
-                if self.quiet is False:
-                    print(i, end="")
-            self.process_subject(subject_uri)
+                (finished_init-start).total_seconds() / 60.0))
+        if self.mint:
+            self.put_subjects(subjects)
+        else:
+            self.process_subjects(subjects)
+        self.__finish__(start, finished_init, len(subjects))
+
+    def ingest_stream(self, source, format='nt', window=10000):
+        """Method ingests N-Triples, or Turtle grouped by subject into blocks
+        separated by blank lines, from a file or stdin without loading the
+        whole graph. Triples are read in windows of about window subjects,
+        each window is parsed into self.graph and its subjects initialized,
+        then the source is read a second time to link and index the
+        subjects. Only the subject to Fedora URL mapping is kept between
+        windows.
+
+        Input should be sorted or grouped by subject (sort -k1,1 for
+        N-Triples); triples of a subject that arrive in a later window are
+        saved to Fedora but its first window's document is the one indexed
+        at init. Turtle blank node labels are only kept within a block, use
+        N-Triples for dumps where subjects share labelled blank nodes.
+
+        Args:
+            source(str or file): Path of the file, - for stdin, or an open
+                                 text file
+            format(str): nt or turtle
+            window(int): Maximum subjects held in memory at once
+        """
+        if not check_ids(self.elastic_search):
+            return
+        start = datetime.datetime.utcnow()
+        if self.quiet is False:
+            print("Started streaming ingestion at {}".format(start.isoformat()))
+        if self.indexer is not None:
+            self.indexer.start()
+        reread = isinstance(source, str) and source != "-" and format == 'nt'
+        spool = None if reread else tempfile.TemporaryFile(mode="w+")
+        total = 0
+        for graph, subjects in read_windows(
+            open_source(source),
+            format,
+            window):
+            self.graph = graph
+            self.init_subjects(subjects)
+            total += len(subjects)
+            if spool is not None:
+                spool.write(serialize_ntriples(graph))
+        finished_init = datetime.datetime.utcnow()
+        if self.quiet is False:
+            print("Finished initializing {} subjects at {}, time={}".format(
+                total,
+                finished_init,
+                (finished_init-start).total_seconds() / 60.0))
+        if spool is not None:
+            spool.seek(0)
+            lines = spool
+        else:
+            lines = open_source(source)
+        for graph, subjects in read_windows(lines, 'nt', window):
+            self.graph = graph
+            self.process_subjects(subjects)
+        if spool is not None:
+            spool.close()
+        self.graph = default_graph()
+        self.__finish__(start, finished_init, total)
+
+    def init_subjects(self, subjects):
+        """Method initializes a list of subjects, with a pool of worker
+        threads when workers is greater than one
+
+        Args:
+            subjects(list): Subjects in the order they should be mapped
+        """
+        if self.workers > 1:
+            self.run_pool(self.__init_group__, self.__init_groups__(subjects))
+            # Restores subject order so the final mapping does not depend
+            # on the order the workers finished in
+            with self.lock:
+                for subject in subjects:
+                    if str(subject) in self.bf2uris:
+                        self.bf2uris[str(subject)] = self.bf2uris.pop(
+                            str(subject))
+        else:
+            for i, subject in enumerate(subjects):
+                self.__report_progress__(i)
+                if self.dedup_batch_size and not i%self.dedup_batch_size:
+                    self.resolve_duplicates(
+                        subjects[i:i+self.dedup_batch_size])
+                self.init_subject(subject)
+
+    def mint_subject(self, subject):
+        """Method maps a subject to its existing Fedora URL or to a new URL
+        minted from a UUID, without writing to Fedora
+
+        Args:
+            subject(rdflib.Term): Subject
+
+        Returns:
+            fedora_url
+        """
+        if str(subject) in self.bf2uris:
+            return self.bf2uris[str(subject)]
+        labels = self.get_labels(subject)
+        # Labels of minted URLs stay out of the label index until the PUT
+        # succeeds, later subjects in this run match them here
+        fedora_url = None
+        for label in labels:
+            fedora_url = self.minted_labels.get(label)
+            if fedora_url:
+                break
+        if not fedora_url:
+            fedora_url = self.exists(subject)
+        if not fedora_url:
+            identifier = str(uuid.uuid4())
+            fedora_url = self.fedora.resource_url(identifier)
+            with self.lock:
+                self.minted.add(fedora_url)
+                for label in labels:
+                    self.minted_labels.setdefault(label, fedora_url)
+        with self.lock:
+            self.bf2uris[str(subject)] = fedora_url
+        return fedora_url
+
+    def mint_subjects(self, subjects):
+        """Method mints or deduplicates every subject before anything is
+        written, so every cross reference can be resolved when a subject is
+        first written
+
+        Args:
+            subjects(list): Subjects in the order they should be mapped
+        """
+        for i, subject in enumerate(subjects):
+            if self.dedup_batch_size and not i%self.dedup_batch_size:
+                self.resolve_duplicates(subjects[i:i+self.dedup_batch_size])
+            self.mint_subject(subject)
+
+    def put_group(self, subjects):
+        """Method PUTs a minted resource with the triples of every subject
+        mapped to it, cross references already replaced with Fedora URLs,
+        and indexes it once. Subjects that already existed in Fedora are
+        PATCHed by process_subject.
+
+        Args:
+            subjects(list): Subjects sharing one Fedora URL
+
+        Returns:
+            fedora_url
+        """
+        subjects = [subject for subject in subjects
+                    if not str(subject) in self.processed]
+        if len(subjects) < 1:
+            return
+        fedora_url = self.bf2uris[str(subjects[0])]
+        if not fedora_url in self.minted:
+            for subject in subjects:
+                self.process_subject(subject)
+            return fedora_url
+        with timed("serialize"):
+            predicate_objects = []
+            for subject in subjects:
+                if self.debug:
+                    predicate_objects.append((OWL.sameAs, subject))
+                predicate_objects.extend(self.linked_objects(subject))
+            raw_turtle = PREFIX_HEADER + serialize(predicate_objects)
+        try:
+            result = self.fedora.put(
+                fedora_url,
+                data=raw_turtle.encode(),
+                headers={"Content-Type": "text/turtle"})
+        except requests.exceptions.HTTPError as http_error:
+            print("Failed to put {}, Error={}\nTurtle=\n{}".format(
+                ", ".join([str(subject) for subject in subjects]),
+                http_error,
+                raw_turtle))
+            result = self.__put_placeholder__(subjects, fedora_url)
+            if result is None:
+                return
+            # The placeholder only has owl:sameAs links, it is fetched
+            with self.lock:
+                self.minted.discard(fedora_url)
+        for subject in subjects:
+            self.__record__(INIT, subject, fedora_url)
+            for label in self.get_labels(subject):
+                self.label_index.add(label, fedora_url)
+        self.index(
+            rdflib.URIRef(fedora_url),
+            subject=list(subjects),
+            headers=result.headers)
+        for subject in subjects:
+            self.__load_triples__(subject, fedora_url)
+            self.__record_processed__(subject, fedora_url)
+        return fedora_url
+
+    def __put_placeholder__(self, subjects, fedora_url):
+        """Method creates an empty resource with only owl:sameAs links at a
+        minted URL whose PUT failed, as init_subject does for a failed
+        POST, so the subjects already written that link to the URL do not
+        point at a missing resource. If that fails too, the URL is dropped
+        from bf2uris and the minted labels so it is never journaled or added
+        to the label index.
+
+        Args:
+            subjects(list): Subjects sharing the minted URL
+            fedora_url(str): Minted Fedora URL
+
+        Returns:
+            requests.Response or None
+        """
+        try:
+            result = self.fedora.put(fedora_url)
+            for subject in subjects:
+                self.fedora.insert(fedora_url, OWL.sameAs, str(subject))
+            return result
+        except requests.exceptions.RequestException:
+            print("Could NOT put subjects {} Error={}".format(
+                ", ".join([str(subject) for subject in subjects]),
+                sys.exc_info()[1]))
+            print(fedora_url)
+        with self.lock:
+            self.minted.discard(fedora_url)
+            for subject in subjects:
+                self.bf2uris.pop(str(subject), None)
+            for label in [label for label, url in self.minted_labels.items()
+                          if url == fedora_url]:
+                del self.minted_labels[label]
+        return None
+
+    def put_subjects(self, subjects):
+        """Method writes and indexes a list of minted subjects, grouping the
+        subjects deduplicated to the same Fedora URL so each resource is
+        written by one request, with a pool of worker threads when workers
+        is greater than one
+
+        Args:
+            subjects(list): Subjects
+        """
+        groups = collections.OrderedDict()
+        for subject in subjects:
+            groups.setdefault(self.bf2uris[str(subject)], []).append(subject)
+        if self.workers > 1:
+            self.run_pool(self.put_group, groups.values())
+        else:
+            for i, group in enumerate(groups.values()):
+                self.__report_progress__(i)
+                self.put_group(group)
+
+    def process_subjects(self, subjects):
+        """Method links and indexes a list of initialized subjects, in
+        transaction batches when tx_batch_size is set and with a pool of
+        worker threads when workers is greater than one
+
+        Args:
+            subjects(list): Subjects
+        """
+        if self.tx_batch_size:
+            batches = self.__transaction_batches__(subjects)
+            if self.workers > 1:
+                self.run_pool(self.process_batch, batches)
+            else:
+                for i, batch in enumerate(batches):
+                    self.__report_progress__(i)
+                    self.process_batch(batch)
+        elif self.workers > 1:
+            self.run_pool(self.process_subject, subjects)
+        else:
+            for i, subject_uri in enumerate(subjects):
+                self.__report_progress__(i)
+                self.process_subject(subject_uri)
+
+    def __record__(self, step, subject, fedora_url):
+        if self.journal is not None:
+            self.journal.record(step, subject, fedora_url)
+
+    def __record_processed__(self, subject, fedora_url):
+        """Method journals a processed subject, with a bulk indexer the
+        record waits for the flush carrying its document so a crash never
+        leaves a subject journaled but missing from the index"""
+        if self.journal is None:
+            return
+        if self.indexer is None:
+            self.journal.record(PROCESS, subject, fedora_url)
+            return
+        with self.lock:
+            self.__pending__.append((subject, fedora_url))
+            ready = len(self.__pending__) >= self.indexer.max_docs
+        if ready:
+            self.checkpoint()
+
+    def checkpoint(self):
+        """Method flushes the bulk indexer and journals every subject
+        processed since the last checkpoint whose document was indexed"""
+        with self.lock:
+            pending, self.__pending__ = self.__pending__, []
+        if self.indexer is not None:
+            self.indexer.flush()
+            failed = set([failure['_id'] for failure in self.indexer.failures])
+        else:
+            failed = set()
+        if self.journal is None:
+            return
+        for subject, fedora_url in pending:
+            if not fedora_id(fedora_url) in failed:
+                self.journal.record(PROCESS, subject, fedora_url)
+        self.journal.sync()
+
+    def __load_triples__(self, subject, fedora_url):
+        if self.triplestore is not None:
+            fedora_uri = rdflib.URIRef(fedora_url)
+            self.triplestore.add(
+                [(fedora_uri, predicate, object_)
+                 for predicate, object_ in self.linked_objects(subject)])
+
+    def __finish__(self, start, finished_init, total):
+        if self.triplestore is not None:
+            failures = self.triplestore.flush()
+            if self.quiet is False and failures > 0:
+                print("{} triplestore batches failed to load".format(
+                    failures))
+        if self.indexer is not None:
+            self.indexer.close()
+        self.checkpoint()
+        if self.indexer is not None:
+            if self.quiet is False and len(self.indexer.failures) > 0:
+                print("{} documents failed to index".format(
+                    len(self.indexer.failures)))
+        self.label_index.commit()
+        if self.quiet is False:
+            print("Label index {}".format(self.label_index.stats()))
         end = datetime.datetime.utcnow()
+        seconds = (end-start).total_seconds()
+        self.stats = {
+            "subjects": total,
+            "workers": self.workers,
+            "init_seconds": (finished_init-start).total_seconds(),
+            "process_seconds": (end-finished_init).total_seconds(),
+            "seconds": seconds,
+            "subjects_per_second": total / seconds if seconds else 0.0}
         if self.quiet is False:
             print("Finished ingesting at {}, total time={} minutes for {} subjects".format(
                 end.isoformat(),
-                (end-start).seconds / 60.0,
-                i))
+                (end-start).total_seconds() / 60.0,
+                total))
+
+    def __init_group__(self, group):
+        for subject in group:
+            self.init_subject(subject)
+
+    def __init_groups__(self, subjects):
+        """Generator groups subjects that share their first label so the
+        same worker initializes them in turn and the later subjects are
+        deduplicated against the first, resolving the labels of each chunk
+        of dedup_batch_size subjects before its groups are yielded"""
+        groups = collections.OrderedDict()
+        for subject in subjects:
+            labels = self.get_labels(subject)
+            key = labels[0] if len(labels) > 0 else str(subject)
+            groups.setdefault(key, []).append(subject)
+        chunk, size = [], 0
+        for group in groups.values():
+            chunk.append(group)
+            size += len(group)
+            if size >= max(self.dedup_batch_size, 1):
+                if self.dedup_batch_size:
+                    self.resolve_duplicates(
+                        [subject for row in chunk for subject in row])
+                for row in chunk:
+                    yield row
+                chunk, size = [], 0
+        if len(chunk) > 0:
+            if self.dedup_batch_size:
+                self.resolve_duplicates(
+                    [subject for row in chunk for subject in row])
+            for row in chunk:
+                yield row
+
+    def __transaction_batches__(self, subjects):
+        """Method orders subjects so each subject is followed by the subjects
+        it links to that have not been placed yet, keeping a Work with its
+        Instances and Titles together, and splits them into batches of
+        tx_batch_size"""
+        keys = set([str(subject) for subject in subjects])
+        placed, ordered = set(), []
+        for subject in subjects:
+            if str(subject) in placed:
+                continue
+            placed.add(str(subject))
+            ordered.append(subject)
+            for _object in self.graph.objects(subject=subject):
+                if str(_object) in keys and not str(_object) in placed:
+                    placed.add(str(_object))
+                    ordered.append(_object)
+        return [ordered[i:i+self.tx_batch_size]
+                for i in range(0, len(ordered), self.tx_batch_size)]
+
+    def __report_progress__(self, i):
+        if self.quiet is False:
+            if not i%10 and i > 0:
+                print(".", end="")
+            if not i%100:
+                print(i, end="")
+
+    def run_pool(self, function, units):
+        """Method calls function on each unit of work with a pool of worker
+        threads, blocking the producer once max_pending units are queued
+
+        Args:
+            function(callable): Called with each unit
+            units(iterable): Units of work
+        """
+        pending = threading.BoundedSemaphore(max(self.max_pending, 1))
+        completed = [0]
+        def run(unit):
+            try:
+                function(unit)
+            except Exception:
+                print("Could NOT run {} on {} Error={}".format(
+                    function.__name__,
+                    unit,
+                    sys.exc_info()[1]))
+            finally:
+                with self.lock:
+                    self.__report_progress__(completed[0])
+                    completed[0] += 1
+                pending.release()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for unit in units:
+                pending.acquire()
+                executor.submit(run, unit)
+
+    def linked_objects(self, subject):
+        """Method returns the subject's predicates and objects, replacing
+        objects that are ingested subjects with their Fedora URLs
+
+        Args:
+            subject(rdflib.URIRef): Subject URI
+
+        Returns:
+            list: (predicate, object) tuples
+        """
+        predicate_objects = []
+        for predicate, _object in self.graph.predicate_objects(subject=subject):
+            object_url = self.bf2uris.get(_object)
+            if object_url is not None:
+                _object = rdflib.URIRef(object_url)
+            predicate_objects.append((predicate, _object))
+        return predicate_objects
+
+    def build_update(self, subject):
+        """Method returns the SPARQL Update that saves all of the subject's
+        predicates and objects to the subject's Fedora graph, replacing
+        objects that are ingested subjects with their Fedora URLs
+
+        Args:
+            subject(rdflib.URIRef): Subject URI
+
+        Returns:
+            string
+        """
+        with timed("serialize"):
+            predicate_objects = self.linked_objects(subject)
+            if self.debug:
+                predicate_objects.insert(0, (OWL.sameAs, subject))
+            return "".join([
+                PREFIX_HEADER,
+                "\nINSERT DATA {\n",
+                serialize(predicate_objects),
+                "\n}"])
+
+    def process_batch(self, subjects):
+        """Method PATCHes a batch of subjects inside a single Fedora
+        transaction that is committed once. If any request fails the
+        transaction is rolled back and the whole batch retried up to
+        tx_retries times. Subjects are indexed after the commit.
+
+        Args:
+            subjects(list): Subject URIs
+
+        Returns:
+            list: Fedora URLs of the batch or None if the batch failed
+        """
+        updates = []
+        for subject in subjects:
+            if str(subject) in self.processed:
+                continue
+            updates.append((
+                subject,
+                self.bf2uris[str(subject)],
+                self.build_update(subject)))
+        for attempt in range(self.tx_retries + 1):
+            tx_url, results = None, []
+            try:
+                tx_url = self.fedora.begin_transaction()
+                for subject, fedora_url, sparql in updates:
+                    results.append(self.fedora.patch(
+                        self.fedora.in_transaction(tx_url, fedora_url),
+                        sparql))
+                self.fedora.commit_transaction(tx_url)
+                break
+            except requests.exceptions.RequestException:
+                print("Rolling back batch of {} subjects, attempt {} Error={}".format(
+                    len(updates),
+                    attempt + 1,
+                    sys.exc_info()[1]))
+                if tx_url is not None:
+                    try:
+                        self.fedora.rollback_transaction(tx_url)
+                    except requests.exceptions.RequestException:
+                        pass
+        else:
+            for subject, fedora_url, sparql in updates:
+                print("Could NOT process subject {}".format(subject))
+                print(fedora_url)
+            return
+        for (subject, fedora_url, sparql), result in zip(updates, results):
+            self.index(
+                rdflib.URIRef(fedora_url),
+                subject=subject,
+                headers=result.headers)
+            self.timestamps.pop(fedora_url, None)
+            self.__load_triples__(subject, fedora_url)
+            self.__record_processed__(subject, fedora_url)
+        return [fedora_url for subject, fedora_url, sparql in updates]
 
     def process_subject(self, subject):
         """Method takes a subject URI and iterates through the subject's
@@ -470,33 +1407,18 @@ class GraphIngester(object):
             subject(rdflib.URIRef): Subject URI
         """
         fedora_url = self.bf2uris[str(subject)]
-        sparql = build_prefixes(self.repository.namespaces)
-        sparql += "\nINSERT DATA {\n"
-        if self.debug:
-            sparql += create_sparql_insert_row(
-                OWL.sameAs,
-                subject
-            )
-        for predicate, _object in self.graph.predicate_objects(subject=subject):
-            if str(_object) in self.bf2uris:
-                object_url = self.bf2uris[str(_object)]
-                sparql += create_sparql_insert_row(
-                    predicate,
-                    rdflib.URIRef(object_url)
-                )
-            elif _object != rdflib.Literal:
-                sparql += create_sparql_insert_row(
-                    predicate,
-                    _object)
-        sparql += "\n}"
-        update_fedora_request = urllib.request.Request(
-            fedora_url,
-            method='PATCH',
-            data=sparql.encode(),
-            headers={"Content-type": "application/sparql-update"})
+        if str(subject) in self.processed:
+            return fedora_url
+        sparql = self.build_update(subject)
         try:
-            result = urllib.request.urlopen(update_fedora_request)
-            self.index(rdflib.URIRef(fedora_url))
+            result = self.fedora.patch(fedora_url, sparql)
+            self.index(
+                rdflib.URIRef(fedora_url),
+                subject=subject,
+                headers=result.headers)
+            self.timestamps.pop(fedora_url, None)
+            self.__load_triples__(subject, fedora_url)
+            self.__record_processed__(subject, fedora_url)
             return fedora_url
         except:
             print("Could NOT process subject {} Error={}".format(
@@ -506,6 +1428,43 @@ class GraphIngester(object):
             print(sparql)
 
 
+def benchmark_workers(graph_factory, levels=(1, 2, 4, 8), **kwargs):
+    """Function ingests a new graph at each concurrency level and reports
+    the subjects per second for each level
+
+    Args:
+        graph_factory(callable): Returns a new rdflib.Graph for each run, so
+                                 later runs are not deduplicated against
+                                 earlier ones
+        levels(iterable): Worker counts to measure
+        metrics_port(int): If given, serves stage metrics at /metrics on
+                           this port while the levels run
+        kwargs: Passed to GraphIngester
+
+    Returns:
+        list: (workers, subjects per second) tuples
+    """
+    results = []
+    metrics_port = kwargs.pop('metrics_port', None)
+    server = None
+    if metrics_port is not None:
+        server = metrics.serve(metrics_port)
+    try:
+        for workers in levels:
+            ingester = GraphIngester(
+                graph=graph_factory(),
+                workers=workers,
+                quiet=True,
+                **kwargs)
+            ingester.ingest()
+            rate = ingester.stats.get('subjects_per_second')
+            print("{} workers: {:.2f} subjects/sec".format(workers, rate))
+            results.append((workers, rate))
+    finally:
+        if server is not None:
+            server.shutdown()
+    return results
+
 def main():
     """Main function"""
     pass
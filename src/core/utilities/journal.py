@@ -0,0 +1,101 @@
+"""
+Name:        journal
+Purpose:     Append-only on-disk journal of completed ingest steps so a
+             failed ingest can be resumed without repeating finished work
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import os
+import threading
+import time
+
+INIT = "init"
+PROCESS = "process"
+
+class IngestJournal(object):
+    """Journal of completed ingest steps, one tab separated line of step,
+    subject and Fedora URL per step. Lines are flushed as they are written
+    and fsync'ed every fsync_interval records or fsync_seconds seconds.
+
+    To use
+
+    >> journal = IngestJournal("ingest.journal")
+    >> journal.record(INIT, subject, fedora_url)
+    >> journal.close()
+    """
+
+    def __init__(self, path, fsync_interval=1000, fsync_seconds=5.0):
+        """Initializes an IngestJournal
+
+        Args:
+            path(str): Path of the journal file, appended to if it exists
+            fsync_interval(int): Records between fsyncs
+            fsync_seconds(float): Maximum seconds between fsyncs
+        """
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.fsync_seconds = fsync_seconds
+        self.__lock__ = threading.Lock()
+        self.__unsynced__ = 0
+        self.__last_sync__ = time.time()
+        self.file = open(path, "a", encoding="utf-8")
+
+    def record(self, step, subject, url):
+        """Method appends a completed step to the journal
+
+        Args:
+            step(str): INIT or PROCESS
+            subject(str): BIBFRAME subject
+            url(str): Fedora URL of the subject
+        """
+        line = "\t".join([step, str(subject), str(url)]) + "\n"
+        with self.__lock__:
+            self.file.write(line)
+            self.__unsynced__ += 1
+            if self.__unsynced__ >= self.fsync_interval or \
+               time.time() - self.__last_sync__ >= self.fsync_seconds:
+                self.__sync__()
+
+    def __sync__(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.__unsynced__ = 0
+        self.__last_sync__ = time.time()
+
+    def sync(self):
+        """Method flushes and fsyncs the journal"""
+        with self.__lock__:
+            self.__sync__()
+
+    def close(self):
+        """Method fsyncs and closes the journal"""
+        with self.__lock__:
+            if not self.file.closed:
+                self.__sync__()
+                self.file.close()
+
+def replay(path):
+    """Generator yields the step, subject and Fedora URL of every complete
+    line in a journal, skipping a partly written last line
+
+    Args:
+        path(str): Path of the journal file
+
+    Returns:
+        generator of (step, subject, url) tuples
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, encoding="utf-8") as journal_file:
+        for line in journal_file:
+            if not line.endswith("\n"):
+                break
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 3:
+                yield tuple(fields)
@@ -0,0 +1,157 @@
+"""
+Name:        labels
+Purpose:     Persistent exact-match index of authority labels to Fedora URLs
+             used to short-circuit Elastic Search deduplication lookups
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import sqlite3
+import threading
+from elasticsearch import helpers
+
+LABEL_FIELDS = [
+    "bf:authorizedAccessPoint",
+    "mads:authoritativeLabel",
+    "bf:label",
+    "bf:titleValue"]
+
+class LabelIndex(object):
+    """SQLite backed index of labels to the Fedora URL of the first resource
+    with that label. Counts hits and misses so the Elastic Search traffic
+    saved by the index can be reported.
+
+    To use
+
+    >> label_index = LabelIndex("labels.db")
+    >> label_index.warm(elastic_search)
+    >> label_index.get("Twain, Mark, 1835-1910")
+    """
+
+    def __init__(self, path=":memory:", commit_interval=1000):
+        """Initializes a LabelIndex
+
+        Args:
+            path(str): Path of the SQLite database, defaults to an in-memory
+                       database that lasts only as long as the instance
+            commit_interval(int): Number of added labels between commits
+        """
+        self.path = path
+        self.commit_interval = commit_interval
+        self.hits, self.misses = 0, 0
+        self.__pending__ = 0
+        self.__lock__ = threading.RLock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            """CREATE TABLE IF NOT EXISTS labels (
+                label TEXT PRIMARY KEY,
+                url TEXT NOT NULL)""")
+        self.connection.commit()
+
+    def __contains__(self, label):
+        with self.__lock__:
+            cursor = self.connection.execute(
+                "SELECT 1 FROM labels WHERE label=?",
+                (label,))
+            return cursor.fetchone() is not None
+
+    def __len__(self):
+        with self.__lock__:
+            return self.connection.execute(
+                "SELECT COUNT(*) FROM labels").fetchone()[0]
+
+    def add(self, label, url):
+        """Method adds a label, an existing label keeps its first URL
+
+        Args:
+            label(str): Label
+            url(str): Fedora URL of the resource with the label
+        """
+        with self.__lock__:
+            self.connection.execute(
+                "INSERT OR IGNORE INTO labels (label, url) VALUES (?, ?)",
+                (label, url))
+            self.__pending__ += 1
+            if self.__pending__ >= self.commit_interval:
+                self.commit()
+
+    def commit(self):
+        """Method commits added labels to disk"""
+        with self.__lock__:
+            self.connection.commit()
+            self.__pending__ = 0
+
+    def close(self):
+        """Method commits and closes the database"""
+        with self.__lock__:
+            self.commit()
+            self.connection.close()
+
+    def get(self, label):
+        """Method returns the Fedora URL for a label, counting hits and misses
+
+        Args:
+            label(str): Label
+
+        Returns:
+            string URL or None
+        """
+        with self.__lock__:
+            row = self.connection.execute(
+                "SELECT url FROM labels WHERE label=?",
+                (label,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return
+            self.hits += 1
+            return row[0]
+
+    def stats(self):
+        """Method returns hit and miss counters for the index
+
+        Returns:
+            dict
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": float(self.hits) / lookups if lookups else 0.0,
+            "labels": len(self)}
+
+    def warm(self, elastic_search, index='bibframe'):
+        """Method pre-warms the index with a scroll over all documents in an
+        Elastic Search index
+
+        Args:
+            elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+            index(str): Elastic Search index, defaults to bibframe
+
+        Returns:
+            int: Number of documents scanned
+        """
+        total = 0
+        for hit in helpers.scan(
+            elastic_search,
+            index=index,
+            query={"_source": LABEL_FIELDS + ["fcrepo:hasLocation"]}):
+            source = hit.get('_source', {})
+            locations = source.get('fcrepo:hasLocation')
+            if not locations:
+                continue
+            if not isinstance(locations, list):
+                locations = [locations,]
+            for field in LABEL_FIELDS:
+                values = source.get(field, [])
+                if not isinstance(values, list):
+                    values = [values,]
+                for value in values:
+                    self.add(str(value), locations[0])
+            total += 1
+        self.commit()
+        return total
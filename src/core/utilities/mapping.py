@@ -0,0 +1,251 @@
+"""
+Name:        mapping
+Purpose:     Compact dict-like mapping of subject URIs to Fedora URLs that
+             stores shared URI prefixes once, pairtree Fedora URLs as their
+             16 byte UUID, and spills to SQLite past a memory cap
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import sqlite3
+import struct
+import tempfile
+import threading
+import uuid
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+PREFIX_ID = struct.Struct(">I")
+PAIRTREE = 0x80000000
+PAIRTREE_LENGTH = 48
+PAIRTREE_URL = "{}{}/{}/{}/{}/{}-{}-{}-{}-{}"
+
+def split_uri(value):
+    """Function splits a URI after its first path segment, so
+    http://localhost:8080/rest/ab/cd/ef/gh/abcdefgh-... shares the prefix
+    http://localhost:8080/rest/ with every other Fedora URL. Values without
+    a path, like blank node ids, have an empty prefix.
+
+    Args:
+        value(str): URI
+
+    Returns:
+        tuple: prefix, suffix
+    """
+    parts = value.split("/", 4)
+    if len(parts) < 5:
+        return "", value
+    suffix = parts[4]
+    return value[:len(value) - len(suffix)], suffix
+
+def pairtree_uuid(suffix):
+    """Function returns the 16 bytes of the UUID at the end of a pairtree
+    path, ab/cd/ef/gh/abcdefgh-..., as built by FedoraClient.resource_url,
+    or None if the suffix is not exactly such a path
+
+    Args:
+        suffix(str): Path after the Fedora rest prefix
+
+    Returns:
+        bytes or None
+    """
+    if len(suffix) != PAIRTREE_LENGTH or suffix[2] != "/":
+        return None
+    identifier = suffix[12:]
+    try:
+        value = uuid.UUID(identifier)
+    except ValueError:
+        return None
+    if str(value) != identifier or suffix[:12] != pairtree_path(identifier):
+        return None
+    return value.bytes
+
+def pairtree_path(identifier):
+    """Function returns the four pairtree segments of an identifier"""
+    return "{}/{}/{}/{}/".format(
+        identifier[0:2],
+        identifier[2:4],
+        identifier[4:6],
+        identifier[6:8])
+
+class SubjectMap(MutableMapping):
+    """Mapping of URI strings, or rdflib terms, to URI strings. Keys and
+    values are stored as a 4 byte prefix id followed by the UTF-8 suffix,
+    with each distinct prefix kept once in a shared table. The pairtree
+    Fedora URLs minted for resources are stored as the prefix id, with its
+    high bit set, and the 16 bytes of their UUID. When memory_cap
+    entries are held in memory they are moved to a SQLite table and later
+    lookups check memory first and then SQLite.
+
+    To use
+
+    >> bf2uris = SubjectMap(memory_cap=1000000)
+    >> bf2uris[subject] = fedora_url
+    """
+
+    def __init__(self, memory_cap=None, path=None, table="mapping"):
+        """Initializes a SubjectMap
+
+        Args:
+            memory_cap(int): Entries held in memory before spilling to
+                             SQLite, None never spills
+            path(str): Path of the SQLite database used when spilling,
+                       defaults to a temporary file. The map's table is
+                       emptied on its first spill, it is not reloaded
+            table(str): SQLite table name, lets several maps share a path
+        """
+        self.memory_cap = memory_cap
+        self.path = path
+        self.table = table
+        self.prefixes = []
+        self.prefix_ids = {}
+        self.connection = None
+        self.__memory__ = {}
+        self.__spilled__ = 0
+        self.__lock__ = threading.RLock()
+
+    def __encode__(self, value, add=True):
+        prefix, suffix = split_uri(str(value))
+        prefix_id = self.prefix_ids.get(prefix)
+        if prefix_id is None:
+            if not add:
+                # An unseen prefix means the key cannot be in the map
+                return None
+            prefix_id = len(self.prefixes)
+            self.prefixes.append(prefix)
+            self.prefix_ids[prefix] = prefix_id
+        identifier = pairtree_uuid(suffix)
+        if identifier is not None:
+            return PREFIX_ID.pack(prefix_id | PAIRTREE) + identifier
+        return PREFIX_ID.pack(prefix_id) + suffix.encode("utf-8")
+
+    def __decode__(self, data):
+        data = bytes(data)
+        prefix_id = PREFIX_ID.unpack_from(data)[0]
+        if prefix_id & PAIRTREE:
+            digits = data[4:].hex()
+            return PAIRTREE_URL.format(
+                self.prefixes[prefix_id ^ PAIRTREE],
+                digits[0:2],
+                digits[2:4],
+                digits[4:6],
+                digits[6:8],
+                digits[0:8],
+                digits[8:12],
+                digits[12:16],
+                digits[16:20],
+                digits[20:32])
+        return self.prefixes[prefix_id] + data[4:].decode("utf-8")
+
+    def __find__(self, key):
+        if key is None:
+            return None
+        value = self.__memory__.get(key)
+        if value is None and self.__spilled__ > 0:
+            row = self.connection.execute(
+                "SELECT value FROM {} WHERE key=?".format(self.table),
+                (key,)).fetchone()
+            if row is not None:
+                value = row[0]
+        return value
+
+    def __spill__(self):
+        if self.connection is None:
+            if self.path is None:
+                self.path = tempfile.NamedTemporaryFile(
+                    suffix=".db",
+                    delete=False).name
+            self.connection = sqlite3.connect(
+                self.path,
+                check_same_thread=False)
+            # Prefix ids are only valid for this map, rows left in the
+            # table by an earlier run would decode with the wrong prefixes
+            self.connection.execute(
+                "DROP TABLE IF EXISTS {}".format(self.table))
+            self.connection.execute(
+                """CREATE TABLE {} (
+                    key BLOB PRIMARY KEY,
+                    value BLOB NOT NULL)""".format(self.table))
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO {} (key, value) VALUES (?, ?)".format(
+                self.table),
+            self.__memory__.items())
+        self.connection.commit()
+        self.__spilled__ += len(self.__memory__)
+        self.__memory__ = {}
+
+    def __contains__(self, key):
+        # Entries in memory are read without the lock, a spill replaces
+        # the dict rather than clearing it
+        encoded_key = self.__encode__(key, False)
+        if encoded_key in self.__memory__:
+            return True
+        if self.__spilled__ < 1:
+            return False
+        with self.__lock__:
+            return self.__find__(encoded_key) is not None
+
+    def __getitem__(self, key):
+        encoded_key = self.__encode__(key, False)
+        value = self.__memory__.get(encoded_key)
+        if value is None and self.__spilled__ > 0:
+            with self.__lock__:
+                value = self.__find__(encoded_key)
+        if value is None:
+            raise KeyError(key)
+        return self.__decode__(value)
+
+    def __setitem__(self, key, value):
+        with self.__lock__:
+            encoded_key = self.__encode__(key)
+            if self.__spilled__ > 0 and \
+               not encoded_key in self.__memory__ and \
+               self.__find__(encoded_key) is not None:
+                self.__delete_spilled__(encoded_key)
+            self.__memory__[encoded_key] = self.__encode__(value)
+            if self.memory_cap and len(self.__memory__) >= self.memory_cap:
+                self.__spill__()
+
+    def __delete_spilled__(self, encoded_key):
+        self.connection.execute(
+            "DELETE FROM {} WHERE key=?".format(self.table),
+            (encoded_key,))
+        self.__spilled__ -= 1
+
+    def __delitem__(self, key):
+        with self.__lock__:
+            encoded_key = self.__encode__(key, False)
+            if encoded_key in self.__memory__:
+                del self.__memory__[encoded_key]
+            elif self.__spilled__ > 0 and \
+                 self.__find__(encoded_key) is not None:
+                self.__delete_spilled__(encoded_key)
+            else:
+                raise KeyError(key)
+
+    def __iter__(self):
+        with self.__lock__:
+            keys = []
+            if self.__spilled__ > 0:
+                keys.extend([row[0] for row in self.connection.execute(
+                    "SELECT key FROM {} ORDER BY rowid".format(self.table))])
+            keys.extend(self.__memory__.keys())
+        for key in keys:
+            yield self.__decode__(key)
+
+    def __len__(self):
+        return len(self.__memory__) + self.__spilled__
+
+    def close(self):
+        """Method closes the SQLite database if the map has spilled"""
+        with self.__lock__:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
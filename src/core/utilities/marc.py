@@ -11,13 +11,286 @@
 """
 __author__ = "Jeremy Nelson"
 
+import argparse
+import collections
+import datetime
 import falcon
+import io
+import json
+import os
 import pymarc
 import rdflib
-import urllib.request
-from catalog.helpers.bibframe import FCREPO
+import threading
+import xml.etree.ElementTree as etree
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from core.utilities.bloom import BloomFilter
+from core.utilities.bulk import BulkIndexer
+from core.utilities.fedora import default_client
+from core.utilities.ingesters import check_ids, fedora_id, http_date_to_iso
+from core.utilities import metrics
+from core.utilities.metrics import timed
+from core.utilities.namespaces import FCREPO
+from core.utilities.projection import SEARCH_CONFIG
 from flask_fedora_commons import build_prefixes, Repository
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.exceptions import NotFoundError
+
+MARCXML_RECORD = "{http://www.loc.gov/MARC21/slim}record"
+LEADER_LENGTH = 24
+RECORD_TERMINATOR = b"\x1d"
+MARC_MAPPING = os.path.join(SEARCH_CONFIG, "mappings", "marc", "marc21.json")
+
+RAW_LABEL = "rdfs:label.raw"
+
+def bib_number_query(bib_numbers, field=RAW_LABEL):
+    """Function returns an Elastic Search query body that matches bib
+    numbers exactly against the not_analyzed rdfs:label.raw field. Marc
+    indexes created before the raw subfield only have the analyzed
+    rdfs:label, which is searched with match_phrase queries instead, so
+    hits must be checked against their rdfs:label
+
+    Args:
+        bib_numbers(list): Bib numbers
+        field(str): rdfs:label.raw or, for an old index, rdfs:label
+
+    Returns:
+        dict: Query body returning every matching record's location
+    """
+    if field == RAW_LABEL:
+        query = {"terms": {field: list(bib_numbers)}}
+    else:
+        query = {"bool": {"should": [
+            {"match_phrase": {field: number}} for number in bib_numbers]}}
+    return {
+        "query": query,
+        "size": len(bib_numbers),
+        "_source": ["rdfs:label", "owl:sameAs"]
+    }
+
+def bib_number_field(elastic_search, index='marc'):
+    """Function returns the field bib numbers are looked up in, the raw
+    subfield unless the index was created before it was added to the
+    mapping. Those indexes need a reindex with
+
+    python -m core.utilities.reindex marc
+
+    until then deduplication falls back to the analyzed rdfs:label
+
+    Args:
+        elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+        index(str): Index name, defaults to marc
+
+    Returns:
+        string: rdfs:label.raw or rdfs:label
+    """
+    try:
+        mappings = elastic_search.indices.get_mapping(index=index)
+    except NotFoundError:
+        return RAW_LABEL
+    stack = [mappings]
+    while stack:
+        mapping = stack.pop()
+        if not isinstance(mapping, dict):
+            continue
+        label = mapping.get('properties', {}).get('rdfs:label', {})
+        if 'raw' in label.get('fields', {}):
+            return RAW_LABEL
+        stack.extend(mapping.values())
+    print("Index {} has no {} field, reindex it with "
+          "python -m core.utilities.reindex marc. Matching bib numbers "
+          "against the analyzed rdfs:label until then".format(
+              index,
+              RAW_LABEL))
+    return "rdfs:label"
+
+def create_marc_index(elastic_search, index='marc'):
+    """Function creates the marc index with its mapping if the index does
+    not exist
+
+    Args:
+        elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+        index(str): Index name, defaults to marc
+    """
+    if not elastic_search.indices.exists(index):
+        with open(MARC_MAPPING) as raw_json:
+            mapping = json.load(raw_json)
+        elastic_search.indices.create(index, body={"mappings": mapping})
+
+def marc_body(marc_meta_url, bib_number, headers=None):
+    """Function builds the marc index document of a MARC21 binary
+
+    Args:
+        marc_meta_url(str): URL of the binary's fcr:metadata
+        bib_number(str): Bib number of the record
+        headers(dict): Fedora response headers
+
+    Returns:
+        dict: Document for the marc index
+    """
+    if headers is None:
+        headers = {}
+    return {
+        "owl:sameAs": [marc_meta_url,],
+        "rdfs:label": [bib_number,],
+        "fcrepo:created": [http_date_to_iso(headers.get('Last-Modified'))]}
+
+def marc_id(marc_meta_url):
+    """Function returns the document id of a MARC21 binary, the path id of
+    the binary whose fcr:metadata URL is given. A marc index built with the
+    older fcrepo:uuid ids must be rebuilt first, see fedora_id
+
+    Args:
+        marc_meta_url(str): URL of the binary's fcr:metadata
+
+    Returns:
+        string
+    """
+    return fedora_id(str(marc_meta_url).rsplit("/", 1)[0])
+
+def bib_number(record, ils='III'):
+    """Function returns a record's bib number, 907$a for III records or the
+    001 control number
+
+    Args:
+        record(pymarc.Record): MARC record
+        ils(str): Integrated library system the record was exported from
+
+    Returns:
+        string
+    """
+    if ils.startswith('III'):
+        # III MARC specific sys number
+        return record['907']['a'][1:-1]
+    return record['001'].data
+
+def as_marc21(record):
+    """Function serializes a record as MARC21, forcing UTF-8 when the
+    record's encoding fails
+
+    Args:
+        record(pymarc.Record): MARC record
+
+    Returns:
+        bytes
+    """
+    try:
+        return record.as_marc()
+    except UnicodeEncodeError:
+        record.force_utf8 = True
+        return record.as_marc()
+
+def read_to_terminator(marc_file, data):
+    """Function reads a record with an unusable length up to and including
+    the end of record terminator, so the records after it can still be read
+
+    Args:
+        marc_file(file): MARC21 file opened in binary mode
+        data(bytes): Bytes of the record already read
+
+    Returns:
+        bytes
+    """
+    if RECORD_TERMINATOR in data:
+        return data
+    raw_record = [data]
+    while True:
+        byte = marc_file.read(1)
+        raw_record.append(byte)
+        if len(byte) < 1 or byte == RECORD_TERMINATOR:
+            return b"".join(raw_record)
+
+def marc21_chunks(marc_file, chunk_size=500):
+    """Generator reads raw MARC21 records, using the record length in each
+    leader, without decoding them. A record whose leader does not start
+    with a usable length is read up to its end of record terminator and
+    passed on, decode_chunk counts it as undecodable
+
+    Args:
+        marc_file(file): MARC21 file opened in binary mode
+        chunk_size(int): Records per chunk
+
+    Returns:
+        generator of lists of raw records
+    """
+    chunk = []
+    while True:
+        leader = marc_file.read(5)
+        if len(leader) < 5:
+            break
+        if leader.isdigit() and int(leader) >= LEADER_LENGTH:
+            chunk.append(leader + marc_file.read(int(leader) - 5))
+        else:
+            chunk.append(read_to_terminator(marc_file, leader))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+def marcxml_chunks(marc_file, chunk_size=500):
+    """Generator reads MARCXML record elements incrementally, so files of
+    any size use constant memory
+
+    Args:
+        marc_file(file): MARCXML file opened in binary mode
+        chunk_size(int): Records per chunk
+
+    Returns:
+        generator of lists of raw record elements
+    """
+    chunk, root = [], None
+    for event, element in etree.iterparse(
+        marc_file,
+        events=("start", "end")):
+        if root is None:
+            root = element
+        if event == "end" and element.tag == MARCXML_RECORD:
+            chunk.append(etree.tostring(element))
+            # Cleared records stay children of the collection unless the
+            # root is cleared too
+            root.clear()
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+def decode_chunk(raw_records, marc_format='marc21', ils='III'):
+    """Function decodes a chunk of raw records with pymarc and serializes
+    each as MARC21, run in a process pool by BatchIngester
+
+    Args:
+        raw_records(list): Raw MARC21 records or MARCXML record elements
+        marc_format(str): marc21 or marcxml
+        ils(str): Integrated library system the records were exported from
+
+    Returns:
+        tuple: List of (bib number, MARC21) tuples and number of records
+               that could not be decoded
+    """
+    decoded, errors = [], 0
+    if marc_format != 'marcxml':
+        readable = [raw_record for raw_record in raw_records
+                    if raw_record[:5].isdigit()]
+        errors += len(raw_records) - len(readable)
+        raw_records = readable
+    if marc_format == 'marcxml':
+        records = []
+        for raw_record in raw_records:
+            try:
+                records.extend(
+                    pymarc.parse_xml_to_array(io.BytesIO(raw_record)))
+            except Exception:
+                errors += 1
+    else:
+        records = pymarc.MARCReader(b"".join(raw_records), to_unicode=True)
+    for record in records:
+        try:
+            decoded.append((bib_number(record, ils), as_marc21(record)))
+        except Exception:
+            # pymarc yields None for records it could not read
+            errors += 1
+    return decoded, errors
 
 
 class RecordIngester(object):
@@ -28,7 +301,10 @@ class RecordIngester(object):
             self,
             record,
             elastic_search=Elasticsearch(),
-            repository=Repository()
+            repository=Repository(),
+            fedora=None,
+            bloom=None,
+            indexer=None
             ):
         """Initializes RecordIngester class
 
@@ -37,35 +313,133 @@ class RecordIngester(object):
             elastic_search: Elasticsearch instance, defaults to localhost
             repository: Flask Fedora Commons Repository instance,
                         defaults to localhost
+            fedora: Pooled FedoraClient, defaults to the shared client for
+                    the repository's base URL
+            bloom: BloomFilter of the bib numbers in the marc index, bib
+                   numbers not in the filter are new without a search
+            indexer: BulkIndexer that queues marc documents, documents are
+                     indexed one at a time by default
         """
         self.elastic_search = elastic_search
-        if not self.elastic_search.indices.exists('marc'):
-            self.elastic_search.indices.create('marc')
+        create_marc_index(self.elastic_search)
         self.record = record
         self.repository = repository
+        self.fedora = fedora or default_client(self.repository.base_url)
+        self.bloom = bloom
+        self.indexer = indexer
+        self.label_field = None
 
+    def dedup(self, ils='III'):
+        if ils.startswith('III'):
+            return self.find(bib_number(self.record, ils))
 
+    def find(self, bib_number):
+        """Method returns the Fedora URL of an existing MARC record
 
+        Args:
+            bib_number(str): Bib number of the record
 
-    def dedup(self, ils='III'):
-        if ils.startswith('III'):
-            # III MARC specific sys number
-            bib_number = self.record['907']['a'][1:-1]
-        else:
+        Returns:
+            string or None
+        """
+        return self.find_batch([bib_number]).get(bib_number)
+
+    def find_batch(self, bib_numbers):
+        """Method resolves a batch of bib numbers with a single terms
+        query, skipping the query for bib numbers the Bloom filter shows
+        are new
+
+        Args:
+            bib_numbers(list): Bib numbers
+
+        Returns:
+            dict: Bib number to Fedora URL of the existing records
+        """
+        candidates = sorted(set(bib_numbers))
+        if self.bloom is not None:
+            candidates = [number for number in candidates
+                          if number in self.bloom]
+        existing = {}
+        if len(candidates) < 1 or self.elastic_search is None:
+            return existing
+        if self.label_field is None:
+            self.label_field = bib_number_field(self.elastic_search)
+        with timed("dedup"):
+            result = self.elastic_search.search(
+                index='marc',
+                body=bib_number_query(candidates, self.label_field))
+        wanted = set(candidates)
+        for hit in result.get('hits').get('hits'):
+            same_as = hit['_source'].get('owl:sameAs')
+            if isinstance(same_as, list):
+                same_as = same_as[0]
+            labels = hit['_source'].get('rdfs:label', [])
+            if not isinstance(labels, list):
+                labels = [labels,]
+            for label in labels:
+                if label in wanted:
+                    existing.setdefault(label, same_as)
+        return existing
+
+    def warm(self, capacity=1000000, error_rate=0.01):
+        """Method builds the Bloom filter from the bib numbers in the marc
+        index with a scroll over all documents
+
+        Args:
+            capacity(int): Expected number of bib numbers
+            error_rate(float): False positive rate at capacity
+
+        Returns:
+            int: Number of bib numbers added
+        """
+        bloom = BloomFilter(capacity, error_rate)
+        for hit in helpers.scan(
+            self.elastic_search,
+            index='marc',
+            query={"_source": ["rdfs:label"]}):
+            labels = hit.get('_source', {}).get('rdfs:label', [])
+            if not isinstance(labels, list):
+                labels = [labels,]
+            for label in labels:
+                bloom.add(str(label))
+        self.bloom = bloom
+        return len(bloom)
+
+    def build_body(self, marc_meta_url, bib_number, headers=None):
+        """Method builds the marc document from the bib number and the
+        headers Fedora returned when the binary was created, without
+        fetching the binary's metadata
+
+        Args:
+            marc_meta_url(str): URL of the binary's fcr:metadata
+            bib_number(str): Bib number of the record
+            headers(dict): Fedora response headers
+
+        Returns:
+            dict: Document for the marc index
+        """
+        return marc_body(marc_meta_url, bib_number, headers)
+
+    def index_body(self, marc_body):
+        """Method indexes, or queues with the bulk indexer, a marc
+        document
+
+        Args:
+            marc_body(dict): Document built by build_body
+        """
+        marc_uuid = marc_id(marc_body["owl:sameAs"][0])
+        if self.indexer is not None:
+            self.indexer.add('marc', 'marc21', marc_uuid, marc_body)
             return
-        if self.elastic_search is not None:
-            existing_result = self.elastic_search.search(
+        with timed("es_index"):
+            self.elastic_search.index(
                 index='marc',
-                body={
-                    "query": { "match": { "rdfs:label": bib_number}},
-                    "_source": ["rdfs:label", "owl:sameAs"]})
-            if existing_result.get('hits').get('total') > 0:
-                # Returns first id
-                first_hit = existing_result['hits']['hits'][0]
-                return first_hit['_source']['owl:sameAs']
+                doc_type='marc21',
+                id=marc_uuid,
+                body=marc_body)
 
     def index(self, marc_meta_url):
-        marc_graph = rdflib.Graph().parse(marc_meta_url)
+        marc_graph = self.fedora.graph(marc_meta_url)
         marc_uri = rdflib.URIRef(marc_meta_url)
         bib_number = str(marc_graph.value(
             subject=marc_uri,
@@ -84,44 +458,260 @@ class RecordIngester(object):
             "rdfs:label": [bib_number,],
             "fcrepo:created": [created_on,],
             "fcrepo:uuid": [marc_uuid,]}
-        self.elastic_search.index(
-            index='marc',
-            doc_type='marc21',
-            id=marc_uuid,
-            body=marc_body)
+        with timed("es_index"):
+            self.elastic_search.index(
+                index='marc',
+                doc_type='marc21',
+                id=marc_id(marc_meta_url),
+                body=marc_body)
 
     def ingest(self, ils):
         existing_marc = self.dedup(ils)
         if existing_marc is not None:
             return existing_marc
-        try:
-            marc21 = self.record.as_marc()
-        except UnicodeEncodeError:
-            self.record.force_utf8 = True
-            marc21 = self.record.as_marc()
-        create_request = urllib.request.Request(
-            '/'.join([self.repository.base_url, 'rest']),
-            method='POST',
-            data=marc21)
-        result = urllib.request.urlopen(create_request)
-        marc_uri = result.read().decode()
-        marc_meta_uri = "/".join([marc_uri, "fcr:metadata"])
-        # III specific BIB Number
-        if ils.startswith("III"):
-            bib_number = self.record['907']['a'][1:-1]
+        return self.store(as_marc21(self.record), bib_number(self.record, ils))
 
-        else:
-            # Use 001 as rdfs:label for MARC record
-            bib_number = self.record['001'].data
-        self.repository.insert(
+    def store(self, marc21, bib_number):
+        """Method creates the MARC21 binary in Fedora, adds the bib number
+        as its rdfs:label and indexes a document built from the creation
+        response
+
+        Args:
+            marc21(bytes): MARC21 record
+            bib_number(str): Bib number of the record
+
+        Returns:
+            string URL of the new Fedora binary
+        """
+        result = self.fedora.create(
+            marc21,
+            content_type="application/octet-stream")
+        marc_uri = result.text
+        marc_meta_uri = "/".join([marc_uri, "fcr:metadata"])
+        self.fedora.insert(
             marc_meta_uri,
-            'rdfs:label',
+            rdflib.RDFS.label,
             bib_number)
-        self.index(marc_meta_uri)
+        if self.bloom is not None:
+            self.bloom.add(bib_number)
+        self.index_body(
+            self.build_body(marc_meta_uri, bib_number, result.headers))
         return marc_uri
 
+class BatchIngester(object):
+    """Streams a MARC21 or MARCXML file of any size into Fedora 4 and
+    Elastic Search. Raw records are decoded and serialized in a pool of
+    processes while a pool of threads deduplicates, stores and indexes them.
+    An instance can ingest several files, the bib numbers seen in earlier
+    files are kept so a record repeated in a later file is not stored again,
+    while the counts and stats are for the last file only.
+
+    To use
+
+    >> ingester = BatchIngester(ils='III')
+    >> ingester.ingest("nightly-export.mrc")
+    """
+
+    def __init__(self, **kwargs):
+        """Initializes BatchIngester
+
+        Args:
+            elastic_search(elasticsearch.Elasticsearch): Elasticsearch
+                instance, defaults to localhost
+            repository(flask_fedora_commons.Repository): Fedora Commons
+                Repository, defaults to localhost
+            fedora(core.utilities.fedora.FedoraClient): Pooled Fedora
+                client, defaults to the shared client for the repository
+            ils(str): Integrated library system of the export, defaults to
+                      III
+            processes(int): Decoding processes, defaults to the CPU count
+            workers(int): Threads storing and indexing records, defaults
+                          to 8
+            chunk_size(int): Raw records sent to a process at a time
+            max_pending(int): Maximum decoded records queued for the
+                              threads, defaults to four per worker
+            report_interval(int): Records between progress reports
+            quiet(boolean): If False, prints progress and throughput
+            warm(boolean): If True, the default, builds a Bloom filter of
+                           the bib numbers already in the marc index
+            bloom_capacity(int): Expected number of bib numbers in the
+                                 marc index and the files ingested
+            bulk_size(int): Maximum documents in a bulk batch
+            bulk_bytes(int): Maximum size in bytes of a bulk batch
+            flush_interval(float): Seconds between timed bulk flushes
+        """
+        self.ils = kwargs.get('ils', 'III')
+        self.processes = kwargs.get('processes', os.cpu_count() or 1)
+        self.workers = kwargs.get('workers', 8)
+        self.chunk_size = kwargs.get('chunk_size', 500)
+        self.max_pending = kwargs.get('max_pending', self.workers * 4)
+        self.report_interval = kwargs.get('report_interval', 1000)
+        self.quiet = kwargs.get('quiet', False)
+        elastic_search = kwargs.get('elastic_search', Elasticsearch())
+        self.indexer = BulkIndexer(
+            elastic_search,
+            max_docs=kwargs.get('bulk_size', 500),
+            max_bytes=kwargs.get('bulk_bytes', 5 * 1024 * 1024),
+            flush_interval=kwargs.get('flush_interval', 5.0),
+            quiet=self.quiet)
+        self.record_ingester = RecordIngester(
+            None,
+            elastic_search=elastic_search,
+            repository=kwargs.get('repository', Repository()),
+            fedora=kwargs.get('fedora'),
+            indexer=self.indexer)
+        if kwargs.get('warm', True):
+            self.record_ingester.warm(kwargs.get('bloom_capacity', 2000000))
+        self.lock = threading.Lock()
+        self.seen = set()
+        self.stats = {}
+        self.counts = collections.Counter()
+
+    def __chunks__(self, marc_file, marc_format):
+        if marc_format == 'marcxml':
+            return marcxml_chunks(marc_file, self.chunk_size)
+        return marc21_chunks(marc_file, self.chunk_size)
+
+    def __count__(self, outcome):
+        with self.lock:
+            self.counts[outcome] += 1
+            done = self.counts['created'] + self.counts['existing'] + \
+                self.counts['failed']
+            if self.quiet is False and not done % self.report_interval:
+                seconds = (datetime.datetime.utcnow() - \
+                    self.start).total_seconds()
+                print("{} records, {:.1f} records/sec".format(
+                    done,
+                    done / seconds if seconds else 0.0))
+
+    def __store__(self, bib_number, marc21):
+        self.record_ingester.store(marc21, bib_number)
+        self.__count__('created')
+
+    def __write_chunk__(self, decoded, writers, pending):
+        records, errors = decoded
+        with self.lock:
+            self.counts['undecodable'] += errors
+        existing = self.record_ingester.find_batch(
+            [bib_number for bib_number, marc21 in records])
+        for bib_number, marc21 in records:
+            duplicate = bib_number in self.seen
+            self.seen.add(bib_number)
+            if duplicate or bib_number in existing:
+                self.__count__('existing')
+                continue
+            pending.acquire()
+            future = writers.submit(self.__store__, bib_number, marc21)
+            future.add_done_callback(
+                lambda future: self.__done__(future, pending))
+
+    def __done__(self, future, pending):
+        pending.release()
+        if future.exception() is not None:
+            print("Could NOT store MARC record Error={}".format(
+                future.exception()))
+            self.__count__('failed')
+
+    def ingest(self, source, marc_format=None):
+        """Method streams a MARC file through the decoding processes and
+        storing threads
+
+        Args:
+            source(str or file): Path to, or binary file of, MARC21 or
+                                 MARCXML records
+            marc_format(str): marc21 or marcxml, guessed from the file's
+                              first byte by default
+
+        Returns:
+            dict: Counts of created, existing, failed and undecodable
+                  records with the elapsed time and throughput
+        """
+        if not check_ids(self.record_ingester.elastic_search, 'marc'):
+            return self.stats
+        marc_file = open(source, 'rb') if isinstance(source, str) else source
+        if marc_format is None:
+            first = marc_file.peek(1)[:1] if hasattr(marc_file, 'peek') \
+                else b""
+            marc_format = 'marcxml' if first == b"<" or \
+                str(source).endswith(".xml") else 'marc21'
+        self.start = datetime.datetime.utcnow()
+        with self.lock:
+            self.counts = collections.Counter()
+        self.indexer.start()
+        pending = threading.BoundedSemaphore(max(self.max_pending, 1))
+        try:
+            with ProcessPoolExecutor(self.processes) as decoders, \
+                 ThreadPoolExecutor(self.workers) as writers:
+                decoding = collections.deque()
+                for chunk in self.__chunks__(marc_file, marc_format):
+                    decoding.append(decoders.submit(
+                        decode_chunk,
+                        chunk,
+                        marc_format,
+                        self.ils))
+                    if len(decoding) >= self.processes * 2:
+                        self.__write_chunk__(
+                            decoding.popleft().result(),
+                            writers,
+                            pending)
+                while len(decoding) > 0:
+                    self.__write_chunk__(
+                        decoding.popleft().result(),
+                        writers,
+                        pending)
+        finally:
+            if marc_file is not source:
+                marc_file.close()
+            self.indexer.close()
+        end = datetime.datetime.utcnow()
+        seconds = (end - self.start).total_seconds()
+        records = sum(self.counts.values())
+        self.stats = dict([(outcome, self.counts[outcome]) for outcome in
+            ['created', 'existing', 'failed', 'undecodable']])
+        self.stats.update({
+            "records": records,
+            "seconds": seconds,
+            "records_per_second": records / seconds if seconds else 0.0,
+            "index_failures": len(self.indexer.failures)})
+        if self.quiet is False:
+            print("Finished {} records in {:.1f}s, {:.1f} records/sec, "
+                  "{} created, {} existing, {} failed, {} undecodable".format(
+                      records,
+                      seconds,
+                      self.stats["records_per_second"],
+                      self.counts['created'],
+                      self.counts['existing'],
+                      self.counts['failed'],
+                      self.counts['undecodable']))
+        return self.stats
+
 def main():
-    pass
+    """Main function, ingests MARC files
+
+    python -m core.utilities.marc --ils III nightly-export.mrc
+    """
+    parser = argparse.ArgumentParser(
+        description="Ingest MARC21 or MARCXML files")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--ils", default="III")
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve stage metrics at /metrics on this port")
+    args = parser.parse_args()
+    if args.metrics_port is not None:
+        metrics.serve(args.metrics_port)
+    ingester = BatchIngester(
+        ils=args.ils,
+        processes=args.processes,
+        workers=args.workers,
+        chunk_size=args.chunk_size)
+    for filepath in args.files:
+        ingester.ingest(filepath)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,205 @@
+"""
+Name:        metrics
+Purpose:     In-process latency histograms and counters for the ingest
+             stages, rendered in the Prometheus text format and served
+             over HTTP by the command line ingesters
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+def format_labels(labels):
+    """Function returns Prometheus labels for a tuple of name, value pairs"""
+    if not labels:
+        return ""
+    return "{{{}}}".format(",".join(
+        ['{}="{}"'.format(name, str(value).replace('"', '\\"'))
+         for name, value in labels]))
+
+class Histogram(object):
+    """Latency histogram with one series per set of label values"""
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.__lock__ = threading.Lock()
+
+    def observe(self, value, **labels):
+        """Method records a value, in seconds for latencies
+
+        Args:
+            value(float): Observed value
+            labels: Label names and values of the series
+        """
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self.__lock__:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = {
+                    "buckets": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0}
+            if index < len(self.buckets):
+                series["buckets"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.description),
+            "# TYPE {} histogram".format(self.name)]
+        with self.__lock__:
+            series = sorted(self.series.items())
+            series = [(key, dict(values, buckets=list(values["buckets"])))
+                      for key, values in series]
+        for key, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets, values["buckets"]):
+                cumulative += count
+                lines.append("{}_bucket{} {}".format(
+                    self.name,
+                    format_labels(key + (("le", bound),)),
+                    cumulative))
+            lines.append("{}_bucket{} {}".format(
+                self.name,
+                format_labels(key + (("le", "+Inf"),)),
+                values["count"]))
+            lines.append("{}_sum{} {}".format(
+                self.name,
+                format_labels(key),
+                values["sum"]))
+            lines.append("{}_count{} {}".format(
+                self.name,
+                format_labels(key),
+                values["count"]))
+        return lines
+
+class Counter(object):
+    """Monotonic counter with one series per set of label values"""
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self.series = {}
+        self.__lock__ = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """Method increments the counter
+
+        Args:
+            amount(int): Increment
+            labels: Label names and values of the series
+        """
+        key = tuple(sorted(labels.items()))
+        with self.__lock__:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def render(self):
+        lines = [
+            "# HELP {} {}".format(self.name, self.description),
+            "# TYPE {} counter".format(self.name)]
+        with self.__lock__:
+            series = sorted(self.series.items())
+        for key, value in series:
+            lines.append("{}{} {}".format(
+                self.name,
+                format_labels(key),
+                value))
+        return lines
+
+STAGE_SECONDS = Histogram(
+    "bibframe_ingest_stage_seconds",
+    "Latency of each ingest stage in seconds")
+STAGE_ERRORS = Counter(
+    "bibframe_ingest_stage_errors_total",
+    "Ingest stage calls that raised an error")
+METRICS = [STAGE_SECONDS, STAGE_ERRORS]
+
+class timed(object):
+    """Context manager that records a stage's latency, and an error if the
+    block raises
+
+    To use
+
+    >> with timed("fedora_post"):
+    ..     fedora.create(raw_turtle)
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        STAGE_SECONDS.observe(time.time() - self.start, stage=self.stage)
+        if exc_type is not None:
+            STAGE_ERRORS.inc(stage=self.stage)
+        return False
+
+def render():
+    """Function returns every metric in the Prometheus text format
+
+    Returns:
+        string
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serves render() at /metrics"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(port, host="0.0.0.0"):
+    """Function serves the metrics of this process at /metrics from a
+    daemon thread, so Prometheus can scrape an ingest run from the command
+    line the same way it scrapes the app
+
+    Args:
+        port(int): Port to listen on, 0 picks a free port
+        host(str): Address to listen on
+
+    Returns:
+        http.server.ThreadingHTTPServer, call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
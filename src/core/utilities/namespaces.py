@@ -0,0 +1,67 @@
+"""
+Name:        namespaces
+Purpose:     RDF namespaces and the JSON-LD context shared by the BIBFRAME
+             Datastore ingesters and clients
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import rdflib
+
+AUTHZ = rdflib.Namespace("http://fedora.info/definitions/v4/authorization#")
+BF = rdflib.Namespace("http://bibframe.org/vocab/")
+DC = rdflib.Namespace("http://purl.org/dc/elements/1.1/")
+FCREPO = rdflib.Namespace("http://fedora.info/definitions/v4/repository#")
+FEDORA = rdflib.Namespace("http://fedora.info/definitions/v4/rest-api#")
+FEDORACONFIG = rdflib.Namespace("http://fedora.info/definitions/v4/config#")
+FEDORARELSEXT = rdflib.Namespace("http://fedora.info/definitions/v4/rels-ext#")
+FOAF = rdflib.Namespace("http://xmlns.com/foaf/0.1/")
+IMAGE = rdflib.Namespace("http://www.modeshape.org/images/1.0")
+LDP = rdflib.Namespace("http://www.w3.org/ns/ldp#")
+MADS = rdflib.Namespace("http://www.loc.gov/mads/rdf/v1#")
+MIX = rdflib.Namespace("http://www.jcp.org/jcr/mix/1.0")
+MODE = rdflib.Namespace("http://www.modeshape.org/1.0")
+MODSRDF = rdflib.Namespace("http://www.loc.gov/mods/modsrdf/v1")
+NT = rdflib.Namespace("http://www.jcp.org/jcr/nt/1.0")
+OWL = rdflib.Namespace("http://www.w3.org/2002/07/owl#")
+PREMIS = rdflib.Namespace("http://www.loc.gov/premis/rdf/v1#")
+RDF = rdflib.Namespace("http://www.w3.org/1999/02/22-rdf-syntax-ns#")
+RDFS = rdflib.Namespace("http://www.w3.org/2000/01/rdf-schema#")
+SCHEMA = rdflib.Namespace("http://schema.org/")
+SV = rdflib.Namespace("http://www.jcp.org/jcr/sv/1.0")
+TEST = rdflib.Namespace("info:fedora/test/")
+XML = rdflib.Namespace("http://www.w3.org/XML/1998/namespace")
+XMLNS = rdflib.Namespace("http://www.w3.org/2000/xmlns/")
+XS = rdflib.Namespace("http://www.w3.org/2001/XMLSchema")
+XSI = rdflib.Namespace("http://www.w3.org/2001/XMLSchema-instance")
+
+CONTEXT = {
+    "authz": "http://fedora.info/definitions/v4/authorization#",
+    "bf": "http://bibframe.org/vocab/",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "fcrepo": "http://fedora.info/definitions/v4/repository#",
+    "fedora": "http://fedora.info/definitions/v4/rest-api#",
+    "fedoraconfig": "http://fedora.info/definitions/v4/config#",
+    "fedorarelsext": "http://fedora.info/definitions/v4/rels-ext#",
+    "foaf": "http://xmlns.com/foaf/0.1/",
+    "image": "http://www.modeshape.org/images/1.0",
+    "mads": "http://www.loc.gov/mads/rdf/v1#",
+    "mix": "http://www.jcp.org/jcr/mix/1.0",
+    "mode": "http://www.modeshape.org/1.0",
+    "owl": "http://www.w3.org/2002/07/owl#",
+    "nt": "http://www.jcp.org/jcr/nt/1.0",
+    "premis": "http://www.loc.gov/premis/rdf/v1#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "schema": "http://schema.org/",
+    "sv": "http://www.jcp.org/jcr/sv/1.0",
+    "test": "info:fedora/test/",
+    "xml": "http://www.w3.org/XML/1998/namespace",
+    "xmlns": "http://www.w3.org/2000/xmlns/",
+    "xs": "http://www.w3.org/2001/XMLSchema",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance"}
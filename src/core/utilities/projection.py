@@ -0,0 +1,136 @@
+"""
+Name:        projection
+Purpose:     Projects rdflib triples directly into Elastic Search documents
+             using plans compiled from the search mapping configuration
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import glob
+import json
+import os
+import rdflib
+from core.utilities.namespaces import BF, CONTEXT
+
+CURRENT_DIR = os.path.abspath(os.path.dirname(__file__))
+BASE_DIR = os.path.abspath(
+    os.path.join(CURRENT_DIR, os.pardir, os.pardir, os.pardir))
+SEARCH_CONFIG = os.path.join(BASE_DIR, "search", "config")
+
+def expand_field(field):
+    """Function expands a mapping field name like bf:label to its predicate
+    URI, full URI field names are returned as is
+
+    Args:
+        field(str): Field name
+
+    Returns:
+        rdflib.URIRef or None if the field does not name a predicate
+    """
+    if field.startswith("http://") or field.startswith("https://"):
+        return rdflib.URIRef(field)
+    if ":" in field:
+        prefix, local_name = field.split(":", 1)
+        if prefix in CONTEXT:
+            return rdflib.URIRef(CONTEXT[prefix] + local_name)
+
+def load_mappings(config_dir=SEARCH_CONFIG):
+    """Function loads bibframe-map.json and overlays the per-type files in
+    mappings/bibframe
+
+    Args:
+        config_dir(str): Search configuration directory
+
+    Returns:
+        dict: Doc type to Elastic Search type mapping
+    """
+    with open(os.path.join(config_dir, "bibframe-map.json")) as raw_json:
+        mappings = json.load(raw_json)
+    for filepath in sorted(glob.glob(
+        os.path.join(config_dir, "mappings", "bibframe", "*.json"))):
+        with open(filepath) as raw_json:
+            for doc_type, mapping in json.load(raw_json).items():
+                properties = mappings.setdefault(
+                    doc_type,
+                    {"properties": {}}).setdefault("properties", {})
+                properties.update(mapping.get("properties", {}))
+    return mappings
+
+class Projection(object):
+    """Compiled plan of the predicates indexed for each doc type
+
+    To use
+
+    >> projection = default_projection()
+    >> body = projection.project(graph.predicate_objects(subject), 'Work')
+    """
+
+    def __init__(self, mappings):
+        """Initializes a Projection
+
+        Args:
+            mappings(dict): Doc type to Elastic Search type mapping
+        """
+        self.mappings = mappings
+        self.plans = {}
+        for doc_type, mapping in mappings.items():
+            plan = {}
+            for field in mapping.get("properties", {}):
+                predicate = expand_field(field)
+                if predicate is None:
+                    continue
+                # Prefixed field names win over full URIs, matching the
+                # keys JSON-LD compaction with CONTEXT produced
+                if not predicate in plan or not field.startswith("http"):
+                    plan[predicate] = field
+            self.plans[doc_type] = plan
+
+    def project(self, predicate_objects, doc_type, resolve=None):
+        """Method builds a document from a subject's predicates and objects,
+        skipping predicates the doc type's mapping does not index
+
+        Args:
+            predicate_objects(iterable): (predicate, object) tuples
+            doc_type(str): Elastic Search doc type
+            resolve(callable): Maps a URIRef or BNode object to its indexed
+                               value, defaults to the object's string
+
+        Returns:
+            dict: Field name to list of values
+        """
+        plan = self.plans.get(doc_type, self.plans.get('Resource', {}))
+        body = {}
+        for predicate, object_ in predicate_objects:
+            if predicate == rdflib.RDF.type:
+                if object_.startswith(BF):
+                    body.setdefault('type', []).append(
+                        "bf:" + object_[len(BF):])
+                continue
+            field = plan.get(predicate)
+            if field is None:
+                continue
+            if isinstance(object_, rdflib.Literal) or resolve is None:
+                value = str(object_)
+            else:
+                value = resolve(object_)
+            body.setdefault(field, []).append(value)
+        return body
+
+PROJECTION = None
+
+def default_projection():
+    """Function returns the Projection compiled from the search
+    configuration, loading it on first use
+
+    Returns:
+        Projection
+    """
+    global PROJECTION
+    if PROJECTION is None:
+        PROJECTION = Projection(load_mappings())
+    return PROJECTION
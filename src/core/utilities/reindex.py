@@ -0,0 +1,371 @@
+"""
+Name:        reindex
+Purpose:     Rebuilds a search index into a new versioned index behind an
+             alias, loading with refresh and replicas off and swapping the
+             alias atomically once the new index is ready
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import argparse
+import json
+import time
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.exceptions import NotFoundError
+from core.utilities import metrics
+from core.utilities.bulk import BulkIndexer
+from core.utilities.ingesters import document_id
+from core.utilities.marc import MARC_MAPPING
+from core.utilities.projection import load_mappings
+
+LOAD_SETTINGS = {"index": {"refresh_interval": "-1", "number_of_replicas": 0}}
+
+def index_mappings(alias):
+    """Function reads the current mappings of an index from search/config,
+    so a reindex picks up edits to bibframe-map.json and the mappings
+    directory
+
+    Args:
+        alias(str): bibframe or marc
+
+    Returns:
+        dict
+    """
+    if alias == 'marc':
+        with open(MARC_MAPPING) as raw_json:
+            return json.load(raw_json)
+    return load_mappings()
+
+def versioned_name(alias):
+    """Function returns a new index name for an alias, for example
+    bibframe_20261018093015"""
+    return "{}_{}".format(alias, time.strftime("%Y%m%d%H%M%S"))
+
+def alias_indices(elastic_search, alias):
+    """Function returns the indices an alias points to, or the alias itself
+    if it is still a concrete index from before aliases were used
+
+    Args:
+        elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+        alias(str): Alias name
+
+    Returns:
+        tuple: list of index names, True if alias is a concrete index
+    """
+    try:
+        return sorted(elastic_search.indices.get_alias(name=alias)), False
+    except NotFoundError:
+        pass
+    if elastic_search.indices.exists(alias):
+        return [alias], True
+    return [], False
+
+class Reindexer(object):
+    """Builds a new versioned index for an alias with bulk-load settings,
+    fills it and swaps the alias to it in a single update_aliases call, so
+    searches against the alias keep working during the rebuild.
+
+    Writes are not replayed into the new index, so by default the old
+    indices are write blocked from before the fill until the swap. Ingests
+    running meanwhile get their documents rejected, the ingesters leave
+    those out of their journals and a resumed run indexes them into the new
+    index. If the reindex fails the new index is deleted and the old
+    indices are unblocked.
+
+    To use
+
+    >> reindexer = Reindexer(alias='bibframe')
+    >> reindexer.reindex()
+    """
+
+    def __init__(self, **kwargs):
+        """Initializes a Reindexer
+
+        Args:
+            elastic_search(elasticsearch.Elasticsearch): Elasticsearch instance
+            alias(str): Alias searched by clients, defaults to bibframe
+            mappings(dict): Mappings of the new index, defaults to the
+                            current files in search/config
+            replicas(int): Replicas after loading, defaults to the old
+                           index's replicas or 1
+            refresh_interval(str): Refresh interval after loading
+            max_num_segments(int): Segments to force merge down to
+            delete_old(boolean): If True, deletes the old indices after the
+                                 alias is swapped
+            block_writes(boolean): If True, the default, write blocks the
+                                   old indices during the rebuild
+            bulk_size(int): Maximum documents in a bulk batch
+            bulk_bytes(int): Maximum size in bytes of a bulk batch
+            quiet(boolean): If False, prints status of the reindex
+        """
+        self.elastic_search = kwargs.get('elastic_search', Elasticsearch())
+        self.alias = kwargs.get('alias', 'bibframe')
+        self.mappings = kwargs.get('mappings')
+        if self.mappings is None:
+            self.mappings = index_mappings(self.alias)
+        self.replicas = kwargs.get('replicas')
+        self.refresh_interval = kwargs.get('refresh_interval', "1s")
+        self.max_num_segments = kwargs.get('max_num_segments', 1)
+        self.delete_old = kwargs.get('delete_old', False)
+        self.block_writes = kwargs.get('block_writes', True)
+        self.bulk_size = kwargs.get('bulk_size', 1000)
+        self.bulk_bytes = kwargs.get('bulk_bytes', 10 * 1024 * 1024)
+        self.quiet = kwargs.get('quiet', False)
+        self.stats = {}
+
+    def __status__(self, message):
+        if self.quiet is False:
+            print(message)
+
+    def __old_replicas__(self, indices):
+        for name in indices:
+            try:
+                settings = self.elastic_search.indices.get_settings(index=name)
+                return int(settings[name]['settings']['index'].get(
+                    'number_of_replicas', 1))
+            except (NotFoundError, KeyError, ValueError):
+                continue
+        return 1
+
+    def __set_write_block__(self, indices, blocked):
+        for name in indices:
+            self.elastic_search.indices.put_settings(
+                index=name,
+                body={"index": {"blocks": {"write": blocked}}})
+        if indices:
+            self.__status__("{} writes to {}".format(
+                "Blocked" if blocked else "Unblocked",
+                ", ".join(indices)))
+
+    def __delete__(self, index):
+        try:
+            self.elastic_search.indices.delete(index=index)
+            self.__status__("Deleted {}".format(index))
+        except NotFoundError:
+            pass
+
+    def indexer(self):
+        """Method returns a BulkIndexer sized for a reindex"""
+        return BulkIndexer(
+            self.elastic_search,
+            max_docs=self.bulk_size,
+            max_bytes=self.bulk_bytes,
+            flush_interval=None,
+            quiet=self.quiet)
+
+    def create(self):
+        """Method creates the new versioned index with refresh off and no
+        replicas
+
+        Returns:
+            string: Name of the new index
+        """
+        name = versioned_name(self.alias)
+        self.elastic_search.indices.create(
+            index=name,
+            body={"settings": LOAD_SETTINGS, "mappings": self.mappings})
+        self.__status__("Created {} for {}".format(name, self.alias))
+        return name
+
+    def fill_from_index(self, index, source_indices, indexer):
+        """Method copies every document of the old indices into the new
+        index, documents are re-analyzed with the new mappings and copied
+        under their path id, so an index with the older fcrepo:uuid ids is
+        migrated by the copy
+
+        Args:
+            index(str): New index
+            source_indices(list): Old indices
+            indexer(BulkIndexer): Bulk indexer
+
+        Returns:
+            int: Number of documents copied
+        """
+        count = 0
+        for source in source_indices:
+            for hit in helpers.scan(
+                self.elastic_search,
+                index=source,
+                query={"query": {"match_all": {}}},
+                size=self.bulk_size):
+                indexer.add(
+                    index,
+                    hit.get('_type'),
+                    document_id(hit['_source']) or hit['_id'],
+                    hit['_source'])
+                count += 1
+                if not count % 10000:
+                    self.__status__("{} documents copied".format(count))
+        return count
+
+    def finish(self, index):
+        """Method restores the refresh interval and replicas of the new
+        index and force merges it
+
+        Args:
+            index(str): New index
+        """
+        start = time.time()
+        self.elastic_search.indices.put_settings(
+            index=index,
+            body={"index": {
+                "refresh_interval": self.refresh_interval,
+                "number_of_replicas": self.replicas}})
+        self.elastic_search.indices.forcemerge(
+            index=index,
+            max_num_segments=self.max_num_segments)
+        self.elastic_search.indices.refresh(index=index)
+        self.stats['merge_seconds'] = time.time() - start
+
+    def swap(self, index, old_indices, concrete):
+        """Method points the alias at the new index and away from the old
+        indices in one update_aliases call
+
+        Args:
+            index(str): New index
+            old_indices(list): Indices the alias pointed to
+            concrete(boolean): True if the alias name was a concrete index,
+                               which is removed in the same call
+        """
+        actions = []
+        for name in old_indices:
+            if concrete:
+                actions.append({"remove_index": {"index": name}})
+            else:
+                actions.append({"remove": {"index": name, "alias": self.alias}})
+        actions.append({"add": {"index": index, "alias": self.alias}})
+        self.elastic_search.indices.update_aliases(body={"actions": actions})
+        self.__status__("{} now points to {}".format(self.alias, index))
+        if self.delete_old and not concrete:
+            for name in old_indices:
+                self.elastic_search.indices.delete(index=name)
+
+    def reindex(self, fill=None):
+        """Method rebuilds the alias into a new index
+
+        Args:
+            fill(function): Called with the new index name and a BulkIndexer
+                            and returns the number of documents added,
+                            defaults to copying the old indices
+
+        Returns:
+            dict: Stats
+        """
+        start = time.time()
+        old_indices, concrete = alias_indices(self.elastic_search, self.alias)
+        if self.replicas is None:
+            self.replicas = self.__old_replicas__(old_indices)
+        blocked = old_indices if self.block_writes else []
+        index, swapped = None, False
+        try:
+            self.__set_write_block__(blocked, True)
+            index = self.create()
+            indexer = self.indexer()
+            try:
+                if fill is None:
+                    documents = self.fill_from_index(
+                        index,
+                        old_indices,
+                        indexer)
+                else:
+                    documents = fill(index, indexer)
+            finally:
+                indexer.close()
+            load_seconds = time.time() - start
+            if indexer.failures:
+                self.__status__(
+                    "{} documents failed, {} left in place and {} "
+                    "deleted".format(
+                        len(indexer.failures),
+                        self.alias,
+                        index))
+                self.stats.update({
+                    "index": index,
+                    "documents": documents,
+                    "failures": len(indexer.failures),
+                    "swapped": False})
+                return self.stats
+            self.finish(index)
+            self.swap(index, old_indices, concrete)
+            swapped = True
+        finally:
+            if not swapped and index is not None:
+                self.__delete__(index)
+            if swapped and (concrete or self.delete_old):
+                blocked = []
+            self.__set_write_block__(blocked, False)
+        self.stats.update({
+            "index": index,
+            "previous": old_indices,
+            "documents": documents,
+            "failures": 0,
+            "swapped": True,
+            "load_seconds": load_seconds,
+            "docs_per_second": documents / max(load_seconds, 0.001),
+            "seconds": time.time() - start})
+        self.__status__(
+            "Reindexed {} documents into {} in {:.1f}s ({:.0f} docs/s)".format(
+                documents,
+                index,
+                self.stats['seconds'],
+                self.stats['docs_per_second']))
+        return self.stats
+
+def main():
+    """Main function, rebuilds an index behind its alias
+
+    python -m core.utilities.reindex bibframe --source fedora
+    """
+    parser = argparse.ArgumentParser(
+        description="Rebuild a search index behind its alias")
+    parser.add_argument("alias", choices=["bibframe", "marc"])
+    parser.add_argument("--es", default="localhost:9200")
+    parser.add_argument("--replicas", type=int, default=None)
+    parser.add_argument("--bulk-size", type=int, default=1000)
+    parser.add_argument("--delete-old", action="store_true")
+    parser.add_argument(
+        "--allow-writes",
+        action="store_true",
+        help="Leave the old indices writable, writes during the rebuild "
+             "are lost at the swap")
+    parser.add_argument(
+        "--source",
+        default="index",
+        choices=["index", "fedora"],
+        help="Copy the old index or crawl Fedora")
+    parser.add_argument("--fedora", default="http://localhost:8080")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve stage metrics at /metrics on this port")
+    args = parser.parse_args()
+    if args.metrics_port is not None:
+        metrics.serve(args.metrics_port)
+    elastic_search = Elasticsearch([args.es])
+    reindexer = Reindexer(
+        elastic_search=elastic_search,
+        alias=args.alias,
+        replicas=args.replicas,
+        bulk_size=args.bulk_size,
+        delete_old=args.delete_old,
+        block_writes=not args.allow_writes)
+    fill = None
+    if args.source == "fedora":
+        from core.utilities.crawler import Crawler
+        from core.utilities.fedora import FedoraClient
+        crawler = Crawler(
+            fedora=FedoraClient(args.fedora, pool_size=args.workers),
+            elastic_search=elastic_search,
+            workers=args.workers)
+        fill = crawler.filler(args.alias)
+    reindexer.reindex(fill)
+
+if __name__ == '__main__':
+    main()
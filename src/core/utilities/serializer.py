@@ -0,0 +1,247 @@
+"""
+Name:        serializer
+Purpose:     Serializes a subject's predicates and objects as Turtle or
+             SPARQL INSERT DATA rows in a single pass
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import functools
+import rdflib
+import re
+import time
+from core.utilities.namespaces import BF, CONTEXT, MADS, RDF
+
+URL_CHECK_RE = re.compile(
+    r'^(?:http|ftp)s?://' # http:// or https://
+    r'(?:(?:[A-Z0-9](?:[A-Z0-9-]{0,61}[A-Z0-9])?\.)+(?:[A-Z]{2,6}\.?|[A-Z0-9-]{2,}\.?)|' # domain...
+    r'localhost|' # localhost...
+    r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}|' # ...or ipv4
+    r'\[?[A-F0-9]*:[A-F0-9:]+\]?)' # ...or ipv6
+    r'(?::\d+)?' # optional port
+    r'(?:/?|[/?]\S+)$', re.IGNORECASE)
+
+# Conservative subset of Turtle's PN_LOCAL, other local names are written
+# as full IRIs
+LOCAL_NAME_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_\-]*$')
+
+PREFIXES = sorted(
+    [(namespace, prefix) for prefix, namespace in CONTEXT.items()],
+    key=lambda item: len(item[0]),
+    reverse=True)
+
+PREFIX_HEADER = "".join(
+    ["PREFIX {}: <{}>\n".format(prefix, namespace)
+     for prefix, namespace in sorted(CONTEXT.items())])
+
+LITERAL_ESCAPES = {
+    ord('\\'): '\\\\',
+    ord('"'): '\\"',
+    ord('\n'): '\\n',
+    ord('\r'): '\\r',
+    ord('\t'): '\\t'}
+
+@functools.lru_cache(maxsize=65536)
+def iri(value):
+    """Function returns a prefixed name for an IRI in one of the CONTEXT
+    namespaces or the IRI in angle brackets
+
+    Args:
+        value(str): IRI
+
+    Returns:
+        string
+    """
+    for namespace, prefix in PREFIXES:
+        if value.startswith(namespace):
+            local_name = value[len(namespace):]
+            if LOCAL_NAME_RE.match(local_name):
+                return "{}:{}".format(prefix, local_name)
+            break
+    return "<{}>".format(value)
+
+@functools.lru_cache(maxsize=262144)
+def is_url(value):
+    """Function caches whether a URIRef is written as an IRI or, when it
+    fails URL_CHECK_RE, as a string literal
+
+    Args:
+        value(str): URI
+
+    Returns:
+        boolean
+    """
+    return URL_CHECK_RE.search(value) is not None
+
+def literal(value):
+    """Function returns a quoted and escaped string literal
+
+    Args:
+        value(str): Lexical value
+
+    Returns:
+        string
+    """
+    return '"{}"'.format(str(value).translate(LITERAL_ESCAPES))
+
+def term(object_):
+    """Function serializes an object the way create_sparql_insert_row does,
+    URIRefs that are not URLs and BNodes become string literals, while
+    keeping a literal's language tag or datatype
+
+    Args:
+        object_(rdflib.Term): Object
+
+    Returns:
+        string
+    """
+    if isinstance(object_, rdflib.Literal):
+        value = literal(object_)
+        if object_.language:
+            return "{}@{}".format(value, object_.language)
+        if object_.datatype:
+            return "{}^^{}".format(value, iri(str(object_.datatype)))
+        return value
+    if isinstance(object_, rdflib.URIRef) and is_url(str(object_)):
+        return "<{}>".format(str(object_).replace(">", "%3E"))
+    return literal(object_)
+
+def serialize(predicate_objects, subject="<>"):
+    """Function serializes all of a subject's predicates and objects as
+    Turtle triples, also valid inside SPARQL INSERT DATA
+
+    Args:
+        predicate_objects(iterable): (predicate, object) tuples
+        subject(str): Serialized subject, defaults to the relative <>
+
+    Returns:
+        string
+    """
+    return "".join(
+        ["{} {} {} .\n".format(subject, iri(str(predicate)), term(object_))
+         for predicate, object_ in predicate_objects])
+
+def nt_term(term_):
+    """Function serializes a term as N-Triples
+
+    Args:
+        term_(rdflib.Term): Subject, predicate or object
+
+    Returns:
+        string
+    """
+    if isinstance(term_, rdflib.Literal):
+        value = literal(term_)
+        if term_.language:
+            return "{}@{}".format(value, term_.language)
+        if term_.datatype:
+            return "{}^^<{}>".format(value, term_.datatype)
+        return value
+    if isinstance(term_, rdflib.BNode):
+        return "_:{}".format(term_)
+    return "<{}>".format(str(term_).replace(">", "%3E"))
+
+def ntriples(triples):
+    """Function serializes triples as N-Triples lines
+
+    Args:
+        triples(iterable): (subject, predicate, object) tuples
+
+    Returns:
+        list: Lines ending with a newline
+    """
+    return ["{} {} {} .\n".format(nt_term(subject), nt_term(predicate),
+                                  nt_term(object_))
+            for subject, predicate, object_ in triples]
+
+def create_sparql_insert_row(predicate, object_):
+    """Function creates a SPARQL update row based on a predicate and object,
+    the row by row serializer the ingesters used before serialize. Kept
+    only as the baseline of benchmark
+
+    Args:
+        predicate(rdflib.Term): Predicate
+        object_(rdflib.Term): Object
+
+    Returns:
+        string
+    """
+    statement = "<> "
+    if str(predicate).startswith(str(RDF)):
+        statement += "rdf:" + predicate.split("#")[-1]
+    elif str(predicate).startswith(str(BF)):
+        statement += "bf:" + predicate.split("/")[-1]
+    elif str(predicate).startswith(str(MADS)):
+        statement += "mads:" + predicate.split("#")[-1]
+    else:
+        statement += "<" + str(predicate) + ">"
+    if type(object_) == rdflib.URIRef:
+        if URL_CHECK_RE.search(str(object_)):
+            statement += " <" + str(object_) + "> "
+        else:
+            statement += """ "{}" """.format(object_)
+    if type(object_) == rdflib.Literal:
+        if str(object_).find('"') > -1:
+            value = """ '''{}''' """.format(object_)
+        else:
+            value = """ "{}" """.format(object_)
+        statement += value
+    if type(object_) == rdflib.BNode:
+        statement += """ "{}" """.format(object_)
+    statement += ".\n"
+    return statement
+
+def benchmark(rows=10000, repeat=5):
+    """Function compares create_sparql_insert_row with serialize on a
+    synthetic subject and prints the best time of each
+
+    Args:
+        rows(int): Predicate, object pairs per run
+        repeat(int): Runs of each serializer
+
+    Returns:
+        dict: Best seconds per serializer
+    """
+    pairs = []
+    for i in range(rows):
+        if i % 4 == 0:
+            pairs.append((rdflib.RDF.type, BF.Work))
+        elif i % 4 == 1:
+            pairs.append((BF.label, rdflib.Literal('Title "{}"'.format(i))))
+        elif i % 4 == 2:
+            pairs.append((
+                BF.subject,
+                rdflib.URIRef("http://localhost:8080/rest/{}".format(i))))
+        else:
+            pairs.append((
+                rdflib.URIRef("http://id.loc.gov/vocabulary/relators/aut"),
+                rdflib.Literal(str(i), lang="en")))
+    def row_by_row():
+        statement = ""
+        for predicate, object_ in pairs:
+            statement += create_sparql_insert_row(predicate, object_)
+        return statement
+    results = {}
+    for name, function in [
+        ('create_sparql_insert_row', row_by_row),
+        ('serialize', lambda: serialize(pairs))]:
+        timings = []
+        for run in range(repeat):
+            start = time.time()
+            function()
+            timings.append(time.time() - start)
+        results[name] = min(timings)
+        print("{:<26} {:.4f}s for {} rows".format(name, results[name], rows))
+    return results
+
+def main():
+    """Main function"""
+    benchmark()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+"""
+Name:        triplestore
+Purpose:     Loads triples into the Fuseki triplestore with large N-Triples
+             SPARQL Graph Store Protocol requests
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import argparse
+import datetime
+import requests
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from requests.adapters import HTTPAdapter
+from core.utilities.fedora import build_retry
+from core.utilities.serializer import ntriples
+
+NTRIPLES = "application/n-triples; charset=utf-8"
+CONTENT_TYPES = {
+    "nt": NTRIPLES,
+    "ttl": "text/turtle; charset=utf-8"}
+
+class TripleStore(object):
+    """Sink that buffers triples and POSTs them to a Fuseki dataset's Graph
+    Store Protocol endpoint in batches, with several batches in flight
+
+    To use
+
+    >> triplestore = TripleStore("http://localhost:3030/bf")
+    >> triplestore.add(graph)
+    >> triplestore.close()
+    """
+
+    def __init__(self, url="http://localhost:3030/bf", **kwargs):
+        """Initializes a TripleStore
+
+        Args:
+            url(str): URL of the Fuseki dataset
+            graph(str): Named graph the triples are loaded into, defaults to
+                        the default graph
+            batch_size(int): Triples sent in each POST
+            workers(int): POSTs in flight at the same time
+            timeout(float or tuple): Connect and read timeouts in seconds
+            retries(int): Maximum retries of connection errors
+            quiet(boolean): If False, prints failed POSTs
+        """
+        self.url = url.rstrip("/")
+        self.data_url = "/".join([self.url, "data"])
+        graph = kwargs.get('graph')
+        self.params = {"graph": graph} if graph else {"default": ""}
+        self.batch_size = kwargs.get('batch_size', 50000)
+        self.workers = kwargs.get('workers', 4)
+        self.timeout = kwargs.get('timeout', (5, 300))
+        self.quiet = kwargs.get('quiet', False)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.workers,
+            pool_maxsize=self.workers,
+            max_retries=build_retry(kwargs.get('retries', 3), 0.5))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.pending = threading.BoundedSemaphore(self.workers * 2)
+        self.futures = set()
+        self.failures = []
+        self.lines = []
+        self.triples = 0
+        self.posts = 0
+        self.__lock__ = threading.Lock()
+
+    def add(self, triples):
+        """Method buffers triples, POSTing a batch once batch_size triples
+        are buffered
+
+        Args:
+            triples(iterable): (subject, predicate, object) tuples or an
+                               rdflib.Graph
+        """
+        lines = ntriples(triples)
+        with self.__lock__:
+            self.lines.extend(lines)
+            if len(self.lines) < self.batch_size:
+                return
+            batch, self.lines = self.lines, []
+        self.__submit__(batch)
+
+    def __submit__(self, lines):
+        self.pending.acquire()
+        future = self.executor.submit(self.post, "".join(lines))
+        future.lines = len(lines)
+        with self.__lock__:
+            self.futures.add(future)
+        future.add_done_callback(self.__done__)
+
+    def __done__(self, future):
+        self.pending.release()
+        with self.__lock__:
+            self.futures.discard(future)
+            if future.exception() is None:
+                self.triples += future.lines
+                self.posts += 1
+                return
+            self.failures.append((future.lines, str(future.exception())))
+        if self.quiet is False:
+            print("Could NOT load {} triples into {} Error={}".format(
+                future.lines,
+                self.url,
+                future.exception()))
+
+    def post(self, data, content_type=NTRIPLES, method="POST"):
+        """Method sends RDF to the Graph Store Protocol endpoint, POST adds
+        to and PUT replaces the graph
+
+        Args:
+            data(str, bytes or iterable of bytes): RDF, an iterable is sent
+                                                   with chunked encoding
+            content_type(str): Content type of the RDF
+            method(str): POST or PUT
+
+        Returns:
+            requests.Response
+        """
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        response = self.session.request(
+            method,
+            self.data_url,
+            params=self.params,
+            data=data,
+            headers={"Content-Type": content_type},
+            timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def flush(self):
+        """Method POSTs any buffered triples and waits for every POST in
+        flight to finish
+
+        Returns:
+            int: Number of failed POSTs
+        """
+        with self.__lock__:
+            batch, self.lines = self.lines, []
+        if len(batch) > 0:
+            self.__submit__(batch)
+        with self.__lock__:
+            futures = list(self.futures)
+        wait(futures)
+        return len(self.failures)
+
+    def clear(self):
+        """Method deletes every triple in the graph"""
+        response = self.session.delete(
+            self.data_url,
+            params=self.params,
+            timeout=self.timeout)
+        if response.status_code != 404:
+            response.raise_for_status()
+
+    def reload(self, source, rdf_format="nt", chunk_bytes=1024 * 1024,
+               split=False):
+        """Method rebuilds the graph from a dump, clearing it and streaming
+        the dump to Fuseki in one chunked POST, which keeps blank node
+        labels consistent across the whole dump. With split, N-Triples are
+        sent as concurrent batch_size POSTs instead, only use it for dumps
+        without blank nodes.
+
+        Args:
+            source(str or file): Path to, - for stdin, or binary file of the
+                                 dump
+            rdf_format(str): nt or ttl
+            chunk_bytes(int): Size of each chunk of the streamed POST
+            split(boolean): If True, POSTs N-Triples in concurrent batches
+
+        Returns:
+            float: Seconds taken
+        """
+        start = datetime.datetime.utcnow()
+        if source == "-":
+            dump = sys.stdin.buffer
+        elif isinstance(source, str):
+            dump = open(source, "rb")
+        else:
+            dump = source
+        try:
+            self.clear()
+            if split and rdf_format == "nt":
+                batch = []
+                for line in dump:
+                    if line.strip() and not line.startswith(b"#"):
+                        batch.append(line.decode("utf-8"))
+                    if len(batch) >= self.batch_size:
+                        self.__submit__(batch)
+                        batch = []
+                if len(batch) > 0:
+                    self.__submit__(batch)
+                self.flush()
+            else:
+                self.post(
+                    iter(lambda: dump.read(chunk_bytes), b""),
+                    CONTENT_TYPES[rdf_format])
+        finally:
+            if dump is not source and dump is not sys.stdin.buffer:
+                dump.close()
+        seconds = (datetime.datetime.utcnow() - start).total_seconds()
+        if self.quiet is False:
+            print("Reloaded {} from {} in {:.1f}s".format(
+                self.url,
+                source,
+                seconds))
+        return seconds
+
+    def close(self):
+        """Method flushes the buffered triples and stops the workers"""
+        self.flush()
+        self.executor.shutdown()
+
+def main():
+    """Main function, rebuilds a Fuseki dataset from a dump
+
+    python -m core.utilities.triplestore reload bf-dump.nt
+    """
+    parser = argparse.ArgumentParser(
+        description="Load triples into Fuseki")
+    parser.add_argument("command", choices=["reload"])
+    parser.add_argument("source", help="Dump path or - for stdin")
+    parser.add_argument("--url", default="http://localhost:3030/bf")
+    parser.add_argument("--graph", default=None)
+    parser.add_argument("--format", default="nt", choices=["nt", "ttl"])
+    parser.add_argument("--split", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    triplestore = TripleStore(
+        args.url,
+        graph=args.graph,
+        batch_size=args.batch_size,
+        workers=args.workers)
+    if args.command == "reload":
+        triplestore.reload(args.source, args.format, split=args.split)
+    triplestore.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,286 @@
+"""
+Name:        test_ingesters
+Purpose:     Checks GraphIngester and the Crawler against the in-process
+             Fedora and Elasticsearch fakes
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import pytest
+import rdflib
+import requests
+import threading
+
+pytest.importorskip("flask_fedora_commons")
+
+from core.benchmarks.fakes import FakeElasticsearch, FakeFedora
+from core.utilities.crawler import Crawler
+from core.utilities import ingesters
+from core.utilities.fedora import FedoraClient
+from core.utilities.ingesters import GraphIngester, fedora_id, legacy_ids
+from core.utilities.journal import INIT, PROCESS, replay
+from core.utilities.labels import LabelIndex
+from core.utilities.namespaces import BF
+
+BASE = "http://example.org/bf/"
+
+def small_graph():
+    """Function returns a Work, an Instance of it and its creator, with no
+    shared labels so every subject gets its own resource"""
+    graph = rdflib.Graph()
+    work = rdflib.URIRef(BASE + "work/1")
+    instance = rdflib.URIRef(BASE + "instance/1")
+    person = rdflib.URIRef(BASE + "person/1")
+    graph.add((work, rdflib.RDF.type, BF.Work))
+    graph.add((work, BF.label, rdflib.Literal("Northern Letters")))
+    graph.add((work, BF.creator, person))
+    graph.add((instance, rdflib.RDF.type, BF.Instance))
+    graph.add((instance, BF.instanceOf, work))
+    graph.add((instance, BF.extent, rdflib.Literal("212 p.")))
+    graph.add((person, rdflib.RDF.type, BF.Person))
+    graph.add((person, BF.authorizedAccessPoint, rdflib.Literal(
+        "River, Silver 1")))
+    return graph
+
+@pytest.fixture
+def fedora():
+    fake = FakeFedora()
+    yield fake
+    fake.stop()
+
+def ingester(fedora, elastic_search, **kwargs):
+    return GraphIngester(
+        graph=kwargs.pop('graph', None) or small_graph(),
+        elastic_search=elastic_search,
+        fedora=FedoraClient(fedora.base_url),
+        quiet=True,
+        **kwargs)
+
+def without_fcrepo(body):
+    return dict([(key, sorted(values)) for key, values in body.items()
+                 if not key.startswith("fcrepo")])
+
+def test_write_through_matches_fetched(fedora):
+    written = FakeElasticsearch()
+    write_through = ingester(fedora, written, write_through=True)
+    write_through.ingest()
+    fetched = FakeElasticsearch()
+    fetching = ingester(fedora, fetched)
+    for url in write_through.bf2uris.values():
+        fetching.index(rdflib.URIRef(url))
+    assert sorted(written.documents) == sorted(fetched.documents)
+    for key, (doc_type, body) in written.documents.items():
+        fetched_type, fetched_body = fetched.documents[key]
+        assert doc_type == fetched_type
+        assert without_fcrepo(body) == without_fcrepo(fetched_body)
+        assert key[1] == fedora_id(body["fcrepo:hasLocation"][0])
+
+def shared_graph():
+    """Function returns the small graph with a second Person that has the
+    same access point, so both are deduplicated to one resource"""
+    graph = small_graph()
+    person = rdflib.URIRef(BASE + "person/2")
+    graph.add((person, rdflib.RDF.type, BF.Person))
+    graph.add((person, BF.authorizedAccessPoint, rdflib.Literal(
+        "River, Silver 1")))
+    graph.add((person, BF.label, rdflib.Literal("Silver River")))
+    return graph
+
+def test_write_through_shared_resource_matches_fetched(fedora):
+    for mint in [False, True]:
+        written = FakeElasticsearch()
+        write_through = ingester(
+            fedora,
+            written,
+            graph=shared_graph(),
+            mint=mint,
+            write_through=True)
+        write_through.ingest()
+        person_url = write_through.bf2uris[BASE + "person/1"]
+        assert write_through.bf2uris[BASE + "person/2"] == person_url
+        fetched = FakeElasticsearch()
+        ingester(fedora, fetched).index(rdflib.URIRef(person_url))
+        key = list(fetched.documents)[0]
+        body = written.documents[key][1]
+        assert "Silver River" in body["bf:label"]
+        assert without_fcrepo(body) == \
+            without_fcrepo(fetched.documents[key][1])
+
+def test_ingest_refuses_index_with_uuid_ids(fedora):
+    elastic_search = FakeElasticsearch()
+    location = fedora.base_url + "/rest/ab/cd/ef/01/abcdef01"
+    elastic_search.index(
+        index='bibframe',
+        doc_type='Work',
+        id="0d5b2c3e-8b0e-4a8f-9d6a-2f0c4b7e1a11",
+        body={"fcrepo:hasLocation": [location]})
+    assert legacy_ids(elastic_search)
+    ingester(fedora, elastic_search).ingest()
+    assert sum(fedora.requests.values()) == 0
+    elastic_search.index(
+        index='marc',
+        doc_type='marc21',
+        id="abcdef01",
+        body={"owl:sameAs": [location + "/fcr:metadata"]})
+    assert not legacy_ids(elastic_search, 'marc')
+
+def test_resume_skips_finished_subjects(fedora, tmp_path):
+    journal = str(tmp_path / "ingest.journal")
+    first = ingester(fedora, FakeElasticsearch(), journal=journal)
+    first.ingest()
+    first.journal.close()
+    fedora.requests.clear()
+    second = ingester(
+        fedora,
+        FakeElasticsearch(),
+        journal=journal,
+        resume=True)
+    second.ingest()
+    assert fedora.requests["POST"] == 0
+    assert fedora.requests["PATCH"] == 0
+    assert dict(second.bf2uris.items()) == dict(first.bf2uris.items())
+
+def test_mint_puts_each_resource_once(fedora):
+    elastic_search = FakeElasticsearch()
+    minted = ingester(fedora, elastic_search, mint=True, write_through=True)
+    minted.ingest()
+    urls = set(minted.bf2uris.values())
+    assert fedora.requests["PUT"] == len(urls)
+    assert fedora.requests["POST"] == 0
+    assert fedora.requests["PATCH"] == 0
+    assert elastic_search.requests["index"] == len(urls)
+    work_url = minted.bf2uris[BASE + "work/1"]
+    person_url = minted.bf2uris[BASE + "person/1"]
+    graph = FedoraClient(fedora.base_url).graph(work_url)
+    assert (rdflib.URIRef(work_url), BF.creator, rdflib.URIRef(person_url)) \
+        in graph
+
+def test_crawl_matches_ingest(fedora):
+    ingested = FakeElasticsearch()
+    ingester(fedora, ingested).ingest()
+    crawled = FakeElasticsearch()
+    crawler = Crawler(
+        fedora=FedoraClient(fedora.base_url),
+        elastic_search=crawled,
+        indices={"bibframe": "bibframe"},
+        workers=2,
+        quiet=True)
+    crawler.crawl()
+    assert sorted(crawled.documents) == sorted(ingested.documents)
+    for key, (doc_type, body) in ingested.documents.items():
+        assert without_fcrepo(crawled.documents[key][1]) == \
+            without_fcrepo(body)
+
+class FailingPuts(FedoraClient):
+    """Fedora client whose PUTs with a body fail, and every PUT once
+    fail_all is set"""
+
+    def __init__(self, *args, **kwargs):
+        self.fail_all = kwargs.pop('fail_all', False)
+        super(FailingPuts, self).__init__(*args, **kwargs)
+
+    def put(self, url, **kwargs):
+        if self.fail_all or 'data' in kwargs:
+            raise requests.exceptions.HTTPError("500 Server Error")
+        return super(FailingPuts, self).put(url, **kwargs)
+
+def test_failed_mint_put_falls_back_to_placeholder(fedora):
+    minted = ingester(fedora, FakeElasticsearch(), mint=True)
+    minted.fedora = FailingPuts(fedora.base_url)
+    minted.ingest()
+    work_url = minted.bf2uris[BASE + "work/1"]
+    graph = FedoraClient(fedora.base_url).graph(work_url)
+    assert (rdflib.URIRef(work_url),
+            rdflib.OWL.sameAs,
+            rdflib.Literal(BASE + "work/1")) in graph
+    assert minted.label_index.get("Northern Letters") == work_url
+
+def test_failed_mint_put_drops_url(fedora):
+    minted = ingester(fedora, FakeElasticsearch(), mint=True)
+    minted.fedora = FailingPuts(fedora.base_url, fail_all=True)
+    minted.ingest()
+    assert not BASE + "work/1" in minted.bf2uris
+    assert len(minted.minted) == 0
+    assert len(minted.minted_labels) == 0
+    assert minted.label_index.get("Northern Letters") is None
+
+class FailingBulk(FakeElasticsearch):
+    """Elasticsearch whose bulk requests fail"""
+
+    def bulk(self, body, **kwargs):
+        raise ConnectionError("bulk refused")
+
+def journal_steps(journal):
+    steps = {}
+    for step, subject, url in replay(journal):
+        steps.setdefault(step, set()).add(subject)
+    return steps
+
+def test_bulk_journals_process_after_flush(fedora, tmp_path):
+    journal = str(tmp_path / "ingest.journal")
+    bulk = ingester(fedora, FakeElasticsearch(), journal=journal, bulk=True)
+    bulk.ingest()
+    bulk.journal.close()
+    steps = journal_steps(journal)
+    assert steps[PROCESS] == set(bulk.bf2uris)
+
+def test_bulk_failures_are_not_journaled(fedora, tmp_path):
+    journal = str(tmp_path / "ingest.journal")
+    bulk = ingester(fedora, FailingBulk(), journal=journal, bulk=True)
+    bulk.ingest()
+    bulk.journal.close()
+    steps = journal_steps(journal)
+    assert steps[INIT] == set(bulk.bf2uris)
+    assert not PROCESS in steps
+
+def test_stream_keeps_creation_times_with_memory_cap(fedora, tmp_path):
+    source = tmp_path / "small.nt"
+    source.write_text(small_graph().serialize(format='nt'))
+    written = FakeElasticsearch()
+    streaming = ingester(
+        fedora,
+        written,
+        write_through=True,
+        memory_cap=1,
+        map_path=str(tmp_path / "maps.db"))
+    streaming.ingest_stream(str(source))
+    assert len(streaming.timestamps) == 0
+    fetched = FakeElasticsearch()
+    fetching = ingester(fedora, fetched)
+    for url in streaming.bf2uris.values():
+        fetching.index(rdflib.URIRef(url))
+    assert sorted(written.documents) == sorted(fetched.documents)
+    for key, (doc_type, body) in written.documents.items():
+        assert body["fcrepo:created"] == \
+            fetched.documents[key][1]["fcrepo:created"]
+
+def timers():
+    return [thread for thread in threading.enumerate()
+            if "__run_timer__" in thread.name]
+
+def test_ingest_stops_bulk_flush_timer(fedora):
+    before = len(timers())
+    for run in range(3):
+        bulk = ingester(
+            fedora,
+            FakeElasticsearch(),
+            bulk=True,
+            flush_interval=0.05)
+        bulk.ingest()
+        assert len(timers()) == before
+    bulk.ingest()
+    assert len(timers()) == before
+
+def test_given_options_skip_defaults(fedora, monkeypatch):
+    def unused(*args, **kwargs):
+        raise AssertionError("default built for a given option")
+    label_index = LabelIndex()
+    monkeypatch.setattr(LabelIndex, "__init__", unused)
+    monkeypatch.setattr(ingesters, "default_client", unused)
+    given = ingester(fedora, FakeElasticsearch(), label_index=label_index)
+    assert given.label_index is label_index
@@ -0,0 +1,62 @@
+"""
+Name:        test_mapping
+Purpose:     Checks SubjectMap round trips subject URIs and Fedora URLs in
+             memory and after spilling to SQLite
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+from core.utilities.mapping import SubjectMap, pairtree_uuid
+
+REST = "http://localhost:8080/rest/"
+MINTED = REST + "ab/cd/ef/01/abcdef01-2345-4789-abcd-ef0123456789"
+
+VALUES = {
+    "http://example.org/bf/work/1": MINTED,
+    "http://example.org/bf/work/2": MINTED + "/fcr:metadata",
+    "http://example.org/bf/work/3": MINTED.replace("abcdef01", "ABCDEF01"),
+    "http://example.org/bf/work/4": REST + "ab/cd/ef/02/" + MINTED[-36:],
+    "N6f1c8e": "http://localhost:8080/rest/c5/2a/92/6e/c52a926e",
+}
+
+def test_pairtree_urls_are_stored_as_uuids():
+    bf2uris = SubjectMap()
+    bf2uris["http://example.org/bf/work/1"] = MINTED
+    encoded = list(bf2uris.__memory__.values())[0]
+    assert len(encoded) == 20
+    assert encoded[4:] == pairtree_uuid(MINTED[len(REST):])
+    assert bf2uris["http://example.org/bf/work/1"] == MINTED
+
+def test_round_trip_in_memory_and_spilled(tmp_path):
+    for memory_cap in [None, 2]:
+        bf2uris = SubjectMap(
+            memory_cap=memory_cap,
+            path=str(tmp_path / "map{}.db".format(memory_cap)))
+        for subject, url in VALUES.items():
+            bf2uris[subject] = url
+        assert dict(bf2uris.items()) == VALUES
+        del bf2uris["http://example.org/bf/work/1"]
+        assert not "http://example.org/bf/work/1" in bf2uris
+        assert bf2uris["N6f1c8e"] == VALUES["N6f1c8e"]
+        assert len(bf2uris) == len(VALUES) - 1
+        bf2uris.close()
+
+def test_reopened_path_starts_empty(tmp_path):
+    path = str(tmp_path / "map.db")
+    first = SubjectMap(memory_cap=2, path=path)
+    for subject, url in VALUES.items():
+        first[subject] = url
+    first.close()
+    second = SubjectMap(memory_cap=2, path=path)
+    second["N6f1c8e"] = VALUES["N6f1c8e"]
+    second["http://example.org/bf/work/1"] = MINTED
+    assert dict(second.items()) == {
+        "N6f1c8e": VALUES["N6f1c8e"],
+        "http://example.org/bf/work/1": MINTED}
+    assert len(second) == len(list(second)) == 2
+    second.close()
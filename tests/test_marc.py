@@ -0,0 +1,104 @@
+"""
+Name:        test_marc
+Purpose:     Checks MARC bib number deduplication against new and old marc
+             index mappings with the in-process Elasticsearch fake
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import io
+import pymarc
+import pytest
+
+pytest.importorskip("flask_fedora_commons")
+
+from core.benchmarks.fakes import FakeElasticsearch, FakeFedora
+from core.utilities.fedora import FedoraClient
+from core.utilities.marc import BatchIngester, RAW_LABEL, RecordIngester
+from core.utilities.marc import bib_number_field
+from core.utilities.marc import decode_chunk, marc21_chunks, marcxml_chunks
+
+OLD_MAPPING = {"marc21": {"properties": {
+    "rdfs:label": {"index": "analyzed", "type": "string"},
+    "owl:sameAs": {"index": "not_analyzed", "type": "string"}}}}
+
+def record_ingester(elastic_search):
+    elastic_search.index(
+        index='marc',
+        doc_type='marc21',
+        id="b1",
+        body={"rdfs:label": ["b1234567"],
+              "owl:sameAs": ["http://localhost:8080/rest/b1/fcr:metadata"]})
+    return RecordIngester(None, elastic_search=elastic_search, fedora=object())
+
+def test_new_index_uses_raw_label():
+    elastic_search = FakeElasticsearch()
+    ingester = record_ingester(elastic_search)
+    assert ingester.find_batch(["b1234567", "b7654321"]) == {
+        "b1234567": "http://localhost:8080/rest/b1/fcr:metadata"}
+    assert ingester.label_field == RAW_LABEL
+
+def test_old_index_falls_back_to_label():
+    elastic_search = FakeElasticsearch()
+    elastic_search.indices.create('marc', body={"mappings": OLD_MAPPING})
+    assert bib_number_field(elastic_search) == "rdfs:label"
+    ingester = record_ingester(elastic_search)
+    assert ingester.find_batch(["b1234567"]) == {
+        "b1234567": "http://localhost:8080/rest/b1/fcr:metadata"}
+    assert ingester.label_field == "rdfs:label"
+
+def marc_record(number):
+    record = pymarc.Record()
+    record.add_field(pymarc.Field(tag='001', data="ocm{}".format(number)))
+    record.add_field(pymarc.Field(
+        tag='907',
+        indicators=[' ', ' '],
+        subfields=[pymarc.Subfield('a', ".b{}x".format(number))]))
+    return record.as_marc()
+
+def test_bad_leader_counts_as_undecodable():
+    corrupt = b"abcde" + marc_record(2)[5:]
+    export = io.BytesIO(marc_record(1) + corrupt + marc_record(3))
+    chunks = list(marc21_chunks(export, chunk_size=10))
+    assert len(chunks[0]) == 3
+    decoded, errors = decode_chunk(chunks[0])
+    assert [bib_number for bib_number, marc21 in decoded] == ["b1", "b3"]
+    assert errors == 1
+
+def test_marcxml_chunks_stream_records():
+    collection = b"".join(
+        [b'<collection xmlns="http://www.loc.gov/MARC21/slim">'] +
+        [pymarc.record_to_xml(pymarc.Record(data=marc_record(number)),
+                              namespace=True)
+         for number in range(5)] +
+        [b"</collection>"])
+    sizes = []
+    for chunk in marcxml_chunks(io.BytesIO(collection), chunk_size=2):
+        sizes.append(len(chunk))
+    assert sizes == [2, 2, 1]
+    decoded, errors = decode_chunk(chunk, 'marcxml')
+    assert decoded[0][0] == "b4" and errors == 0
+
+def test_stats_are_per_file():
+    fedora = FakeFedora()
+    try:
+        ingester = BatchIngester(
+            elastic_search=FakeElasticsearch(),
+            fedora=FedoraClient(fedora.base_url),
+            processes=1,
+            workers=2,
+            quiet=True)
+        first = ingester.ingest(io.BytesIO(
+            marc_record(1) + marc_record(2)))
+        second = ingester.ingest(io.BytesIO(
+            marc_record(2) + marc_record(3)))
+    finally:
+        fedora.stop()
+    assert first["created"] == 2 and first["records"] == 2
+    assert second["created"] == 1 and second["existing"] == 1
+    assert second["records"] == 2
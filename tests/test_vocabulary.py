@@ -0,0 +1,57 @@
+"""
+Name:        test_vocabulary
+Purpose:     Checks the BIBFRAME vocabulary artifact is compiled from a
+             local copy and that the seed is only used when the vocabulary
+             cannot be fetched
+
+Author:      Jeremy Nelson
+
+Created:     2026/10/18
+Copyright:   (c) Jeremy Nelson 2014, 2015
+Licence:     GPLv3
+"""
+__author__ = "Jeremy Nelson"
+
+import hashlib
+import json
+import pytest
+import requests
+
+from core.resources import vocabulary
+
+VOCAB_RDF = b"""<?xml version="1.0"?>
+<rdf:RDF xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+         xmlns:rdfs="http://www.w3.org/2000/01/rdf-schema#">
+  <rdfs:Class rdf:about="http://bibframe.org/vocab/Work"/>
+  <rdfs:Class rdf:about="http://bibframe.org/vocab/Text">
+    <rdfs:subClassOf rdf:resource="http://bibframe.org/vocab/Work"/>
+  </rdfs:Class>
+</rdf:RDF>
+"""
+
+def test_compile_file(tmp_path):
+    source = tmp_path / "vocab.rdf"
+    source.write_bytes(VOCAB_RDF)
+    path = str(tmp_path / "bibframe-vocab.json")
+    vocabulary.compile_file(str(source), path)
+    with open(path) as raw_json:
+        artifact = json.load(raw_json)
+    assert artifact["sha1"] == hashlib.sha1(VOCAB_RDF).hexdigest()
+    assert artifact["seed"] is False
+    assert artifact["classes"] == {"Text": "Work", "Work": None}
+
+def test_load_never_fetches(tmp_path, monkeypatch):
+    path = str(tmp_path / "bibframe-vocab.json")
+    with open(vocabulary.CACHE_PATH) as raw_json:
+        seed = json.load(raw_json)
+    vocabulary.save(seed, path)
+    def online(*args, **kwargs):
+        raise AssertionError("load fetched the vocabulary")
+    monkeypatch.setattr(requests, "get", online)
+    assert vocabulary.load(path)["classes"] == seed["classes"]
+    assert vocabulary.load(str(tmp_path / "missing.json"))["classes"] == {}
+
+def test_html_is_not_compiled():
+    for data in [b"<html><body>Sign in</body></html>", b"not xml"]:
+        with pytest.raises(ValueError):
+            vocabulary.compile_vocabulary(data)